@@ -0,0 +1,99 @@
+from typing import Any, List
+import time
+
+def percentile(values : List[float], pct : float) -> float:
+    """Get the pct percentile of values interpolating between ranks"""
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * pct / 100.0
+    lo = int(rank)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (rank - lo)
+
+class Measurement:
+    """The timings of one operation on one entity
+
+    Each timed call is one sample of the latency distribution, and
+    the records it processed are added to the throughput.
+
+    Parameters
+    ----------
+    entityName : str
+        The entity the operation ran on
+    operation : str
+        The name of the operation, e.g. save
+    """
+
+    def __init__(self, entityName : str, operation : str):
+        self.entityName = entityName
+        self.operation = operation
+        self.latencies = []
+        self.records = 0
+        self.peakTracedBytes = None
+        self.maxRSS = None
+
+    @property
+    def key(self) -> str:
+        return "{}.{}".format(self.entityName, self.operation)
+
+    async def time(self, coro : Any) -> Any:
+        """Await coro as one sample, counting the records it returns"""
+        start = time.perf_counter()
+        rslt = await coro
+        self.latencies.append(time.perf_counter() - start)
+        if isinstance(rslt, list):
+            self.records += len(rslt)
+        return rslt
+
+    def summary(self) -> dict:
+        """Get the statistics saved in a baseline
+
+        The latencies are in milliseconds, peak_traced_bytes is the
+        peak of the memory allocated by Python during one run of the
+        operation, and max_rss_kb is the process high water mark once
+        the operation was done. The benchmarks of each entity run in a
+        process of their own unless --no-isolate is given, so this is
+        the peak of the entity's operations up to this one, otherwise
+        it includes the peaks of the entities run before. It is not
+        compared, as it also depends on the allocator.
+        """
+        seconds = sum(self.latencies)
+        return {
+            "samples": len(self.latencies),
+            "records": self.records,
+            "seconds": seconds,
+            "records_per_sec": self.records / seconds if seconds > 0 else None,
+            "p50_ms": _ms(percentile(self.latencies, 50)),
+            "p95_ms": _ms(percentile(self.latencies, 95)),
+            "p99_ms": _ms(percentile(self.latencies, 99)),
+            "peak_traced_bytes": self.peakTracedBytes,
+            "max_rss_kb": self.maxRSS
+        }
+
+def compare(baseline : dict, current : dict, tolerance : float = 0.25) -> List[str]:
+    """Get a description of each regression from baseline to current
+
+    An operation regresses when its throughput falls, or its p95
+    latency or traced memory peak grows, by more than tolerance, a
+    fraction of the baseline value. Operations missing from either
+    side are not compared.
+    """
+    regressions = []
+    for key, cur in sorted(current["results"].items()):
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        checks = [("records_per_sec", -1), ("p95_ms", 1), ("peak_traced_bytes", 1)]
+        for stat, sign in checks:
+            bv = base.get(stat)
+            cv = cur.get(stat)
+            if bv is None or cv is None or bv == 0:
+                continue
+            change = (cv - bv) / bv
+            if change * sign > tolerance:
+                regressions.append("{} {} {:.4g} -> {:.4g} ({:+.0%})".format(key, stat, bv, cv, change))
+    return regressions
+
+def _ms(seconds : float) -> float:
+    return None if seconds is None else seconds * 1000.0
@@ -0,0 +1,47 @@
+from typing import List
+import os
+import logging
+import argparse
+import tempfile
+from nflapidb.EntityManager import EntityManager
+from nflapidb.MemoryBackend import MemoryBackend
+from nflapidb.SQLiteBackend import SQLiteBackend
+import nflapidb.Utilities as util
+from nflapidb.ReplayApiClient import ReplayApiClient
+from benchmarks.Measurement import Measurement
+from benchmarks.Suite import Suite, FIXTURES
+
+# In a module of its own, rather than in __main__, so that the spawned
+# processes of an isolated run can import it
+
+def runSuite(opts : argparse.Namespace, entities : List[str], concurrencies : List[int]) -> List[Measurement]:
+    """Run the benchmarks of entities and the Client.sync at concurrencies"""
+    logging.basicConfig(level=logging.WARNING)
+    tmpdir = None
+    if opts.backend == "memory":
+        backend = MemoryBackend(opts.db_name)
+    elif opts.backend == "sqlite":
+        path = opts.sqlite_path
+        if path is None:
+            tmpdir = tempfile.TemporaryDirectory()
+            path = os.path.join(tmpdir.name, "{}.sqlite3".format(opts.db_name))
+        backend = SQLiteBackend(path)
+    else:
+        backend = None
+    entmgr = EntityManager(dbName=opts.db_name, backend=backend)
+    try:
+        apiClient = ReplayApiClient(opts.data_dir, files=FIXTURES, latency=opts.latency,
+                                    recordLatency=opts.record_latency, jitter=opts.jitter)
+        suite = Suite(entmgr, apiClient, repeat=opts.repeat, warmup=opts.warmup,
+                      batchSize=opts.batch_size, lookups=opts.lookups, traceMemory=not opts.no_memory,
+                      season=opts.season)
+        measurements = []
+        if len(entities) > 0:
+            measurements.extend(util.runCoroutine(suite.run(entities, opts.operations)))
+        for concurrency in concurrencies:
+            measurements.append(util.runCoroutine(suite.runClientSync(concurrency)))
+    finally:
+        entmgr.dispose()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return measurements
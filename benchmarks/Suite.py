@@ -0,0 +1,225 @@
+from typing import List
+import copy
+import datetime
+import tracemalloc
+from nflapidb.Client import Client
+from nflapidb.DataManagerFacade import DataManagerFacade
+from nflapidb.EntityManager import EntityManager
+from nflapidb.QueryModel import QueryModel
+from nflapidb.ReplayApiClient import ReplayApiClient
+from benchmarks.Measurement import Measurement
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+OPERATIONS = ["save", "find", "scan", "sync"]
+
+# The tests/data fixtures of each entity, the other files there are
+# variants made for particular tests. There is no team fixture, so the
+# teams are those of the schedules.
+FIXTURES = {
+    "schedule": ["schedule_2017.json", "schedule_2018.json", "schedule_2019.json"],
+    "roster": ["roster_{}.json".format(t) for t in ["ari", "hou", "kc", "la", "ne", "pit", "sea"]],
+    "player_profile": ["player_profile_kc.json", "player_profile_pit.json"],
+    "player_gamelog": ["player_gamelog_kc.json", "player_gamelog_pit.json"],
+    "game_summary": ["game_summary_2019_reg_13.json", "game_summary_2019_reg_14.json"],
+    "game_score": ["game_score_2019_reg_13.json", "game_score_2019_reg_14.json"],
+    "game_drive": ["game_drive_2019_reg_13.json", "game_drive_2019_reg_14.json"],
+    "game_play": ["game_play_2019_reg_13.json", "game_play_2019_reg_14.json"]
+}
+
+class EntityBenchmark:
+    """How an entity is benchmarked
+
+    Parameters
+    ----------
+    name : str
+        The entity name
+    facade : str
+        The Client property of the entity's facade
+    lookupKey : str
+        The field find looks the records up by
+    prerequisites : list of str
+        The entities saved from their fixtures before the benchmark,
+        as the entity's save and sync read them
+    dropEntities : list of str
+        Entities, besides this one, that sync writes to and that are
+        dropped before each sync so that it starts from scratch
+    """
+
+    def __init__(self, name : str, facade : str, lookupKey : str,
+                 prerequisites : List[str] = None, dropEntities : List[str] = None):
+        self.name = name
+        self.facade = facade
+        self.lookupKey = lookupKey
+        self.prerequisites = [] if prerequisites is None else prerequisites
+        self.dropEntities = [] if dropEntities is None else dropEntities
+
+ENTITIES = [
+    EntityBenchmark("team", "_teamManager", "team"),
+    EntityBenchmark("schedule", "_scheduleManager", "gsis_id"),
+    EntityBenchmark("roster", "_rosterManager", "profile_id", ["team"]),
+    EntityBenchmark("player_profile", "_playerProfileManager", "profile_id", ["team", "roster"]),
+    EntityBenchmark("player_gamelog", "_playerGamelogManager", "profile_id", ["team", "roster"],
+                    ["player_gamelog_process"]),
+    EntityBenchmark("game_summary", "_gameSummaryManager", "gsis_id", ["team", "roster", "schedule"]),
+    EntityBenchmark("game_score", "_gameScoreManager", "gsis_id", ["schedule"]),
+    EntityBenchmark("game_drive", "_gameDriveManager", "gsis_id", ["schedule"]),
+    EntityBenchmark("game_play", "_gamePlayManager", "gsis_id", ["team", "roster", "schedule"])
+]
+
+class Suite:
+    """Replay the fixtures through the facades and time them
+
+    For each entity the operations are:
+
+    save
+        Save the fixture records, batchSize at a time, into an empty
+        collection. Each batch is a latency sample.
+    find
+        Look up the saved records by up to lookups distinct values of
+        the entity's lookup key, one find per value.
+    scan
+        Find every saved record.
+    sync
+        Sync the entity into an empty collection from the fixtures.
+
+    Each operation is run warmup times untimed and then repeat times,
+    pooling the samples, and once more with tracemalloc to measure
+    its memory peak.
+
+    Parameters
+    ----------
+    entityManager : EntityManager
+        The manager of the database to benchmark, whose collections
+        of the benchmarked entities are dropped
+    apiClient : ReplayApiClient
+        Serves the sync requests and the fixture records
+    season : int
+        The season the syncs run at the end of, rather than today's,
+        so that the seasons requested do not change from year to year
+    """
+
+    def __init__(self, entityManager : EntityManager, apiClient : ReplayApiClient,
+                 repeat : int = 3, warmup : int = 1, batchSize : int = 500,
+                 lookups : int = 200, traceMemory : bool = True, season : int = 2019):
+        self._entmgr = entityManager
+        self._api = apiClient
+        self.repeat = repeat
+        self.warmup = warmup
+        self.batchSize = batchSize
+        self.lookups = lookups
+        self.traceMemory = traceMemory
+        self.season = season
+
+    async def run(self, entities : List[str] = None, operations : List[str] = None) -> List[Measurement]:
+        if operations is None:
+            operations = OPERATIONS
+        specs = [spec for spec in ENTITIES if entities is None or spec.name in entities]
+        measurements = []
+        for spec in specs:
+            await self._dropAll()
+            for name in spec.prerequisites:
+                await self._facade(name).save(self._records(name))
+            for op in operations:
+                measurements.append(await self._measure(spec, op))
+        await self._dropAll()
+        return measurements
+
+    async def runClientSync(self, concurrency : int) -> Measurement:
+        """Time Client.sync of every entity into an empty database
+
+        This is how a change to the sync concurrency is measured, with
+        the latency of the apiClient standing in for the NFL API.
+        """
+        m = Measurement("client", "sync_c{}".format(concurrency))
+        for i in range(0, self.warmup + self.repeat):
+            await self._dropAll()
+            client = self._client()
+            if i < self.warmup:
+                await client.sync(concurrency=concurrency)
+            else:
+                await m.time(client.sync(concurrency=concurrency))
+                for spec in ENTITIES:
+                    m.records += len(await self._entmgr.find(spec.name, projection={"_id": True}))
+        await self._dropAll()
+        if resource is not None:
+            m.maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return m
+
+    async def _measure(self, spec : EntityBenchmark, operation : str) -> Measurement:
+        run = getattr(self, "_" + operation)
+        for _ in range(0, self.warmup):
+            await run(spec, Measurement(spec.name, operation))
+        m = Measurement(spec.name, operation)
+        for _ in range(0, self.repeat):
+            await run(spec, m)
+        if self.traceMemory:
+            tracemalloc.start()
+            try:
+                await run(spec, Measurement(spec.name, operation))
+                m.peakTracedBytes = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        if resource is not None:
+            m.maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return m
+
+    async def _save(self, spec : EntityBenchmark, m : Measurement):
+        await self._drop(spec)
+        facade = self._facade(spec.name)
+        records = self._records(spec.name)
+        for i in range(0, len(records), self.batchSize):
+            await m.time(facade.save(records[i:i + self.batchSize]))
+
+    async def _find(self, spec : EntityBenchmark, m : Measurement):
+        await self._ensureSaved(spec)
+        facade = self._facade(spec.name)
+        values = []
+        for rec in self._api.records(spec.name):
+            if rec[spec.lookupKey] not in values:
+                values.append(rec[spec.lookupKey])
+        for v in values[:self.lookups]:
+            qm = QueryModel()
+            qm.cstart(spec.lookupKey, v)
+            await m.time(DataManagerFacade.find(facade, qm=qm))
+
+    async def _scan(self, spec : EntityBenchmark, m : Measurement):
+        await self._ensureSaved(spec)
+        await m.time(DataManagerFacade.find(self._facade(spec.name), qm=QueryModel()))
+
+    async def _sync(self, spec : EntityBenchmark, m : Measurement):
+        await self._drop(spec)
+        await m.time(self._facade(spec.name).sync())
+
+    async def _ensureSaved(self, spec : EntityBenchmark):
+        if len(await self._entmgr.find(spec.name, limit=1)) == 0:
+            await self._facade(spec.name).save(self._records(spec.name))
+
+    async def _drop(self, spec : EntityBenchmark):
+        for name in [spec.name] + spec.dropEntities:
+            await self._entmgr.drop(name)
+
+    async def _dropAll(self):
+        for spec in ENTITIES:
+            await self._drop(spec)
+
+    def _facade(self, entityName : str) -> DataManagerFacade:
+        # A new client each time so that no facade state carries over
+        spec = [spec for spec in ENTITIES if spec.name == entityName][0]
+        return getattr(self._client(), spec.facade)
+
+    def _client(self) -> Client:
+        client = Client(apiClient=self._api, entityManager=self._entmgr)
+        # the facades sync as of the process date, pinned after the
+        # Super Bowl of the season
+        pdate = datetime.datetime(self.season + 1, 2, 15)
+        client._scheduleManager._process_date = pdate
+        client._playerGamelogManager._process_date = pdate
+        return client
+
+    def _records(self, entityName : str) -> List[dict]:
+        # copies, as the facades add fields to the records they save
+        return copy.deepcopy(self._api.records(entityName))
@@ -0,0 +1,18 @@
+"""Throughput, latency and memory benchmarks of the nflapidb facades
+
+The tests/data fixtures are replayed through each facade's save, find
+and sync against a local database, with the NFL API served from the
+same fixtures by a ReplayApiClient. Run from the repository root with
+
+    python -m benchmarks --backend sqlite --output baseline.json
+
+and compare a later run with the saved baseline using
+
+    python -m benchmarks --backend sqlite --compare baseline.json
+
+which exits with status 1 if any operation regressed. Each entity is
+run in a process of its own so that its memory peak is its own. The effect of
+the sync concurrency is measured with NFL API latency injected, e.g.
+
+    python -m benchmarks --entities "" --client-sync 1,4 --latency 0.2
+"""
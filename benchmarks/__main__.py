@@ -0,0 +1,118 @@
+from typing import List
+import os
+import sys
+import json
+import argparse
+import datetime
+import platform
+import multiprocessing
+from benchmarks.Measurement import Measurement, compare
+from benchmarks.Suite import ENTITIES, OPERATIONS
+from benchmarks.Runner import runSuite
+
+def parseArgs(args : List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Benchmark the nflapidb facades with the test fixtures")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "mongodb"], default="memory",
+                        help="the database; mongodb uses the DB_* environment variables")
+    parser.add_argument("--db-name", default="nflapidb_bench",
+                        help="the database name, whose benchmarked collections are dropped")
+    parser.add_argument("--sqlite-path", help="the sqlite database file, a temporary file by default")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(__file__), "..", "tests", "data"),
+                        help="the directory of the fixtures")
+    parser.add_argument("--entities", type=_list, help="comma separated entities, all by default: " +
+                        ",".join([spec.name for spec in ENTITIES]))
+    parser.add_argument("--operations", type=_list, help="comma separated operations, all by default: " +
+                        ",".join(OPERATIONS))
+    parser.add_argument("--season", type=int, default=2019,
+                        help="the season the syncs run as of, the last of the fixtures by default")
+    parser.add_argument("--repeat", type=int, default=3, help="the timed runs of each operation")
+    parser.add_argument("--warmup", type=int, default=1, help="the untimed runs before them")
+    parser.add_argument("--batch-size", type=int, default=500, help="the records saved per save call")
+    parser.add_argument("--lookups", type=int, default=200, help="the most finds per entity")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run every entity in this process, so that max_rss_kb is cumulative")
+    parser.add_argument("--latency", type=float, default=0.0, help="the seconds each NFL API request takes")
+    parser.add_argument("--record-latency", type=float, default=0.0,
+                        help="the seconds added to an NFL API request per record returned")
+    parser.add_argument("--jitter", type=float, default=0.0, help="the fraction the latency varies by")
+    parser.add_argument("--client-sync", type=_list,
+                        help="also time Client.sync of all entities at these comma separated concurrencies")
+    parser.add_argument("--output", help="write the results as a json baseline to this file")
+    parser.add_argument("--compare", help="compare the results with this json baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="the relative change beyond which a compared statistic regressed")
+    return parser.parse_args(args)
+
+def report(measurements : List[Measurement]) -> str:
+    lines = ["{:<24} {:>8} {:>12} {:>10} {:>10} {:>10} {:>10}".format("operation", "records", "records/s",
+                                                                        "p50 ms", "p95 ms", "p99 ms", "peak MB")]
+    for m in measurements:
+        s = m.summary()
+        lines.append("{:<24} {:>8} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+            m.key, s["records"], _fmt(s["records_per_sec"], "{:.0f}"), _fmt(s["p50_ms"]), _fmt(s["p95_ms"]),
+            _fmt(s["p99_ms"]), _fmt(None if s["peak_traced_bytes"] is None else s["peak_traced_bytes"] / 2 ** 20)))
+    return "\n".join(lines)
+
+def main(args : List[str]) -> int:
+    opts = parseArgs(args)
+    entities = [spec.name for spec in ENTITIES] if opts.entities is None else opts.entities
+    concurrencies = [] if opts.client_sync is None else [int(c) for c in opts.client_sync]
+    if opts.no_isolate:
+        measurements = runSuite(opts, entities, concurrencies)
+    else:
+        measurements = []
+        for name in entities:
+            measurements.extend(_isolated(opts, [name], []))
+        for concurrency in concurrencies:
+            measurements.extend(_isolated(opts, [], [concurrency]))
+    print(report(measurements))
+    results = {
+        "meta": {
+            "backend": opts.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.datetime.utcnow().isoformat(),
+            "season": opts.season,
+            "repeat": opts.repeat,
+            "batch_size": opts.batch_size,
+            "latency": opts.latency,
+            "record_latency": opts.record_latency,
+            "jitter": opts.jitter,
+            "isolated": not opts.no_isolate
+        },
+        "results": dict([(m.key, m.summary()) for m in measurements])
+    }
+    if opts.output is not None:
+        with open(opts.output, "wt") as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    status = 0
+    if opts.compare is not None:
+        with open(opts.compare, "rt") as fp:
+            baseline = json.load(fp)
+        if baseline["meta"].get("backend") != opts.backend:
+            print("\nThe baseline was run on the {} backend".format(baseline["meta"].get("backend")))
+        regressions = compare(baseline, results, opts.tolerance)
+        if len(regressions) > 0:
+            print("\nRegressions from {}:".format(opts.compare))
+            print("\n".join(regressions))
+            status = 1
+        else:
+            print("\nNo regressions from {}".format(opts.compare))
+    return status
+
+def _isolated(opts : argparse.Namespace, entities : List[str], concurrencies : List[int]) -> List[Measurement]:
+    # A fresh process, so that the max_rss_kb of the run is its own
+    # peak rather than the high water mark of the earlier runs
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(runSuite, (opts, entities, concurrencies))
+
+def _list(v : str) -> List[str]:
+    return [i.strip() for i in v.split(",") if i.strip() != ""]
+
+def _fmt(v : float, fmt : str = "{:.2f}") -> str:
+    return "-" if v is None else fmt.format(v)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
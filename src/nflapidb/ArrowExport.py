@@ -0,0 +1,220 @@
+from typing import Any, List
+import datetime
+import os
+from nflapidb.Entity import Entity
+
+# pyarrow is an optional dependency, only needed for the columnar exports
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+def requireArrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow and Parquet export; install nflapidb[arrow]")
+
+def _dictionaryType():
+    return pa.dictionary(pa.int32(), pa.string())
+
+def _entityType(ctype : str):
+    return {
+        "str": _dictionaryType(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "datetime": pa.timestamp("us", tz="UTC")
+    }.get(ctype)
+
+class ArrowTableBuilder:
+    """Accumulate records as compact Arrow columns
+
+    Each chunk of records added is converted to Arrow arrays at
+    once, so only the current chunk is held as dicts. Column types
+    come from the entity column types where declared and are
+    otherwise inferred from the values, widening int to float, and
+    anything else that conflicts to string, as more chunks are seen.
+    Strings are dictionary encoded, which stores values repeated
+    across rows, e.g. stat_desc, only once per chunk.
+
+    Parameters
+    ----------
+    entity : Entity
+        The entity whose column types are used
+    exclude : list of str
+        Names of columns to leave out
+    """
+
+    def __init__(self, entity : Entity = None, exclude : List[str] = None):
+        requireArrow()
+        self._declared = {}
+        if entity is not None:
+            for cname, ctype in entity.schema.columns.items():
+                t = _entityType(ctype)
+                if t is not None:
+                    self._declared[cname] = t
+        self._exclude = set(exclude or [])
+        self._types = {}
+        self._batches = []
+
+    @property
+    def numRows(self) -> int:
+        return sum([n for n, _ in self._batches])
+
+    def add(self, records : List[dict]):
+        if len(records) == 0:
+            return
+        cnames = {}
+        for rec in records:
+            for cname in rec:
+                if cname not in self._exclude:
+                    cnames[cname] = None
+        arrays = {}
+        for cname in cnames:
+            values = [rec.get(cname) for rec in records]
+            arr = self._toArray(cname, values)
+            self._types[cname] = _widen(self._types.get(cname, pa.null()), arr.type)
+            arrays[cname] = arr
+        self._batches.append((len(records), arrays))
+
+    def build(self) -> "pa.Table":
+        """Get a table of all of the added records
+
+        Columns missing from a chunk are null for its rows.
+        """
+        schema = pa.schema([(cname, t) for cname, t in self._types.items()])
+        batches = []
+        for n, arrays in self._batches:
+            cols = []
+            for field in schema:
+                if field.name in arrays:
+                    cols.append(_conform(arrays[field.name], field.type))
+                else:
+                    cols.append(pa.nulls(n, type=field.type))
+            batches.append(pa.RecordBatch.from_arrays(cols, schema=schema))
+        return pa.Table.from_batches(batches, schema=schema)
+
+    def _toArray(self, cname : str, values : List[Any]) -> "pa.Array":
+        t = self._declared.get(cname)
+        if t is None:
+            t = _inferType(values)
+        try:
+            return _makeArray(values, t)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+            return _makeArray(values, _dictionaryType())
+
+def _inferType(values : List[Any]):
+    t = pa.null()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            vt = pa.bool_()
+        elif isinstance(v, int):
+            vt = pa.int64()
+        elif isinstance(v, float):
+            vt = pa.float64()
+        elif isinstance(v, str):
+            vt = _dictionaryType()
+        elif isinstance(v, datetime.datetime):
+            vt = pa.timestamp("us", tz="UTC")
+        else:
+            # e.g. lists; let Arrow work out the nested type
+            return None
+        t = _widen(t, vt)
+    return t
+
+def _makeArray(values : List[Any], t) -> "pa.Array":
+    if t is None:
+        return pa.array(values)
+    if pa.types.is_dictionary(t):
+        svalues = [v if v is None or isinstance(v, str) else str(v) for v in values]
+        return pa.array(svalues, type=pa.string()).dictionary_encode()
+    return pa.array(values, type=t)
+
+def _widen(t1, t2):
+    if t1 == t2 or pa.types.is_null(t2):
+        return t1
+    if pa.types.is_null(t1):
+        return t2
+    if pa.types.is_integer(t1) and pa.types.is_floating(t2) \
+       or pa.types.is_floating(t1) and pa.types.is_integer(t2):
+        return pa.float64()
+    return _dictionaryType()
+
+def _conform(arr : "pa.Array", t) -> "pa.Array":
+    if arr.type == t:
+        return arr
+    if pa.types.is_dictionary(t):
+        if pa.types.is_dictionary(arr.type):
+            arr = arr.dictionary_decode()
+        if pa.types.is_null(arr.type) or pa.types.is_string(arr.type):
+            arr = arr.cast(pa.string())
+        else:
+            arr = pa.array([None if v is None else str(v) for v in arr.to_pylist()], type=pa.string())
+        return arr.dictionary_encode()
+    return arr.cast(t)
+
+class ParquetPartitionWriter:
+    """Write records to a hive style partitioned Parquet dataset
+
+    Records are buffered per partition and a partition is written,
+    as path/season=2019/week=13/part-0.parquet for instance, once
+    a record of a different partition arrives, so memory is bounded
+    by one partition when the records are grouped by partition.
+    The partition columns are encoded in the path and not stored
+    in the files, as is the convention for hive partitioning.
+
+    Parameters
+    ----------
+    path : str
+        The dataset root directory
+    partitionBy : list of str
+        The partition column names
+    entity : Entity
+        The entity whose column types are used
+    """
+
+    def __init__(self, path : str, partitionBy : List[str], entity : Entity = None):
+        requireArrow()
+        self._path = path
+        self._partition_by = list(partitionBy)
+        self._entity = entity
+        self._key = None
+        self._builder = None
+        self._parts = {}
+        self._files = []
+
+    @property
+    def files(self) -> List[str]:
+        """The paths of the files written so far"""
+        return self._files
+
+    def add(self, records : List[dict]):
+        groups = []
+        for rec in records:
+            key = tuple([rec.get(c) for c in self._partition_by])
+            if len(groups) == 0 or groups[-1][0] != key:
+                groups.append((key, []))
+            groups[-1][1].append(rec)
+        for key, recs in groups:
+            if key != self._key:
+                self.flush()
+                self._key = key
+                self._builder = ArrowTableBuilder(self._entity, exclude=self._partition_by)
+            self._builder.add(recs)
+
+    def flush(self):
+        if self._builder is not None and self._builder.numRows > 0:
+            pdir = os.path.join(self._path, *["{}={}".format(c, v) for c, v in zip(self._partition_by, self._key)])
+            os.makedirs(pdir, exist_ok=True)
+            # a partition seen again gets another file rather than
+            # replacing the one already written
+            pnum = self._parts.get(pdir, 0)
+            self._parts[pdir] = pnum + 1
+            fpath = os.path.join(pdir, "part-{}.parquet".format(pnum))
+            pq.write_table(self._builder.build(), fpath)
+            self._files.append(fpath)
+        self._builder = None
+        self._key = None
@@ -0,0 +1,354 @@
+from typing import Any, Callable, List
+import abc
+from abc import abstractmethod
+import datetime
+import types
+from bson.objectid import ObjectId
+from pymongo import IndexModel, ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+import nflapidb.Utilities as util
+import nflapidb.QueryEvaluator as qe
+
+def encode(v : Any) -> Any:
+    """Copy v as it would be stored by a MongoDB server
+
+    Datetimes are stored as milliseconds since the epoch in UTC, and
+    are returned naive by collections without a tz_aware codec.
+    """
+    if isinstance(v, dict):
+        return dict([(k, encode(i)) for k, i in v.items()])
+    if isinstance(v, (list, tuple)):
+        return [encode(i) for i in v]
+    if isinstance(v, datetime.datetime):
+        if v.tzinfo is not None:
+            v = v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return v.replace(microsecond=v.microsecond // 1000 * 1000)
+    return v
+
+def _result(**kwargs) -> types.SimpleNamespace:
+    return types.SimpleNamespace(acknowledged=True, **kwargs)
+
+class BackendCursor:
+    """The storage backend counterpart of AsyncIOMotorCursor
+
+    The documents are selected when iteration begins.
+
+    Parameters
+    ----------
+    fetch : callable
+        Returns the documents to iterate over
+    projection : dict
+        The find projection applied to each document
+    export : callable
+        Applied to each document returned, e.g. to copy it
+    """
+
+    def __init__(self, fetch : Callable[[], List[dict]], projection : Any = None,
+                 export : Callable[[dict], dict] = None):
+        self._fetch = fetch
+        self._projection = projection
+        self._export = export
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._docs = None
+
+    def sort(self, keyOrList : Any, direction : int = None) -> "BackendCursor":
+        if isinstance(keyOrList, str):
+            keyOrList = [(keyOrList, 1 if direction is None else direction)]
+        self._sort = keyOrList
+        return self
+
+    def skip(self, skip : int) -> "BackendCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit : int) -> "BackendCursor":
+        self._limit = limit
+        return self
+
+    def batch_size(self, batchSize : int) -> "BackendCursor":
+        return self
+
+    async def to_list(self, length : int = None) -> List[dict]:
+        docs = [d async for d in self]
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if self._docs is None:
+            self._docs = iter(self._select())
+        try:
+            doc = next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+        if self._projection is not None:
+            doc = qe.project(doc, self._projection)
+        return doc if self._export is None else self._export(doc)
+
+    def _select(self) -> List[dict]:
+        docs = self._fetch()
+        if self._sort is not None:
+            docs = qe.sortDocuments(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:abs(self._limit)]
+        return docs
+
+class BackendCollection(abc.ABC):
+    """The storage backend counterpart of AsyncIOMotorCollection
+
+    This implements the collection methods in terms of a few storage
+    primitives, _select, _insert, _replace and _remove, along with
+    the index methods, which the backends implement. Documents are
+    passed to the primitives as encoded copies with an _id, and the
+    matching of queries is left to the backends so that they can
+    narrow the documents down with their indexes.
+
+    Parameters
+    ----------
+    database : Any
+        The database of the collection
+    name : str
+        The name of the collection
+    """
+
+    def __init__(self, database : Any, name : str):
+        self.database = database
+        self.name = name
+
+    def find(self, filter : dict = None, projection : Any = None, **kwargs) -> BackendCursor:
+        return BackendCursor(lambda: self._match(filter), projection, self._export)
+
+    async def find_one(self, filter : dict = None, projection : Any = None, **kwargs) -> dict:
+        docs = self._match(filter, 1)
+        return self._exportProjected(docs[0], projection) if len(docs) > 0 else None
+
+    async def count_documents(self, filter : dict, **kwargs) -> int:
+        return len(self._match(filter))
+
+    async def count(self, filter : dict = None, **kwargs) -> int:
+        return len(self._match(filter))
+
+    async def distinct(self, key : str, filter : dict = None, **kwargs) -> list:
+        values = {}
+        for doc in self._match(filter):
+            for v in qe.resolve(doc, key):
+                for e in (v if isinstance(v, list) else [v]):
+                    values.setdefault(util.freeze(e), e)
+        return [self._export(v) if isinstance(v, dict) else v for v in values.values()]
+
+    def aggregate(self, pipeline : List[dict], **kwargs) -> BackendCursor:
+        # a leading $match is a query, which the backend can answer
+        # from its indexes, so that only the matched documents are
+        # exported to the rest of the pipeline
+        filter = None
+        if len(pipeline) > 0 and list(pipeline[0].keys()) == ["$match"]:
+            filter = pipeline[0]["$match"]
+            pipeline = pipeline[1:]
+        return BackendCursor(lambda: qe.aggregate([self._export(d) for d in self._match(filter)], pipeline))
+
+    async def insert_one(self, document : dict, **kwargs) -> types.SimpleNamespace:
+        with self._batch():
+            self._insertOne(document)
+        return _result(inserted_id=document["_id"])
+
+    async def insert_many(self, documents : List[dict], ordered : bool = True, **kwargs) -> types.SimpleNamespace:
+        with self._batch():
+            for document in documents:
+                self._insertOne(document)
+        return _result(inserted_ids=[d["_id"] for d in documents])
+
+    async def replace_one(self, filter : dict, replacement : dict, upsert : bool = False, **kwargs) -> types.SimpleNamespace:
+        with self._batch():
+            return self._replaceOne(filter, replacement, upsert)
+
+    async def find_one_and_replace(self, filter : dict, replacement : dict, projection : Any = None,
+                                   sort : list = None, upsert : bool = False,
+                                   return_document : bool = False, **kwargs) -> dict:
+        with self._batch():
+            docs = self._match(filter)
+            if sort is not None:
+                docs = qe.sortDocuments(docs, sort)
+            before = docs[0] if len(docs) > 0 else None
+            if before is None and not upsert:
+                return None
+            if before is None:
+                after = self._insertNew(replacement, filter)
+            else:
+                after = encode(replacement)
+                after["_id"] = before["_id"]
+                self._replace(after)
+        doc = after if return_document else before
+        return None if doc is None else self._exportProjected(doc, projection)
+
+    async def update_one(self, filter : dict, update : dict, upsert : bool = False, **kwargs) -> types.SimpleNamespace:
+        """Apply the $set, $unset and $inc operators of update
+
+        Only top level fields may be updated.
+        """
+        with self._batch():
+            docs = self._match(filter, 1)
+            if len(docs) == 0:
+                if not upsert:
+                    return _result(matched_count=0, modified_count=0, upserted_id=None)
+                doc = dict([(k, v) for k, v in filter.items()
+                            if not k.startswith("$") and not (isinstance(v, dict) and qe.isOperatorDict(v))])
+                doc = self._insertNew(self._applyUpdate(encode(doc), update), filter)
+                return _result(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+            doc = self._applyUpdate(encode(docs[0]), update)
+            modified = doc != docs[0]
+            if modified:
+                self._replace(doc)
+        return _result(matched_count=1, modified_count=int(modified), upserted_id=None)
+
+    async def delete_one(self, filter : dict, **kwargs) -> types.SimpleNamespace:
+        with self._batch():
+            docs = self._match(filter, 1)
+            for doc in docs:
+                self._remove(doc["_id"])
+        return _result(deleted_count=len(docs))
+
+    async def delete_many(self, filter : dict, **kwargs) -> types.SimpleNamespace:
+        with self._batch():
+            docs = self._match(filter)
+            for doc in docs:
+                self._remove(doc["_id"])
+        return _result(deleted_count=len(docs))
+
+    async def bulk_write(self, requests : List[ReplaceOne], ordered : bool = True, **kwargs) -> types.SimpleNamespace:
+        """Apply ReplaceOne requests, the only kind EntityManager sends"""
+        counts = {"nMatched": 0, "nModified": 0, "nUpserted": 0, "upserted": [], "writeErrors": []}
+        with self._batch():
+            for i, req in enumerate(requests):
+                if not isinstance(req, ReplaceOne):
+                    raise TypeError("{} requests are not supported by storage backends".format(type(req).__name__))
+                try:
+                    r = self._replaceOne(req._filter, req._doc, req._upsert)
+                except DuplicateKeyError as e:
+                    counts["writeErrors"].append({"index": i, "code": e.code, "errmsg": str(e), "op": req._doc})
+                    if ordered:
+                        break
+                    continue
+                counts["nMatched"] += r.matched_count
+                counts["nModified"] += r.modified_count
+                if r.upserted_id is not None:
+                    counts["nUpserted"] += 1
+                    counts["upserted"].append({"index": i, "_id": r.upserted_id})
+        if len(counts["writeErrors"]) > 0:
+            raise BulkWriteError(counts)
+        return _result(matched_count=counts["nMatched"], modified_count=counts["nModified"],
+                       upserted_count=counts["nUpserted"], inserted_count=0, deleted_count=0,
+                       upserted_ids=dict([(u["index"], u["_id"]) for u in counts["upserted"]]))
+
+    async def create_index(self, keys : Any, **kwargs) -> str:
+        return (await self.create_indexes([IndexModel(keys, **kwargs)]))[0]
+
+    async def drop_index(self, indexOrName : Any, **kwargs):
+        name = indexOrName if isinstance(indexOrName, str) else IndexModel(indexOrName).document["name"]
+        if name not in await self.index_information() or name == "_id_":
+            raise OperationFailure("index not found with name [{}]".format(name))
+        self._dropIndex(name)
+
+    @abstractmethod
+    async def index_information(self) -> dict:
+        pass
+
+    @abstractmethod
+    async def create_indexes(self, indexes : List[IndexModel], **kwargs) -> List[str]:
+        pass
+
+    @abstractmethod
+    def _dropIndex(self, name : str):
+        pass
+
+    @abstractmethod
+    def _select(self, filter : dict, limit : int = None) -> List[dict]:
+        """Get the documents matching the encoded filter in insertion order"""
+        pass
+
+    @abstractmethod
+    def _insert(self, doc : dict):
+        """Store a new document, raising DuplicateKeyError if a unique index forbids it"""
+        pass
+
+    @abstractmethod
+    def _replace(self, doc : dict):
+        """Replace the stored document with the _id of doc"""
+        pass
+
+    @abstractmethod
+    def _remove(self, docId : Any):
+        pass
+
+    def _batch(self):
+        """Get a context manager grouping the writes made within it"""
+        return _NO_BATCH
+
+    def _export(self, doc : dict) -> dict:
+        """Get a document to return to the caller"""
+        return doc
+
+    def _exportProjected(self, doc : dict, projection : Any) -> dict:
+        if projection is not None:
+            doc = qe.project(doc, projection)
+        return self._export(doc)
+
+    def _match(self, filter : dict, limit : int = None) -> List[dict]:
+        if filter is not None and len(filter) > 0:
+            filter = encode(filter)
+        else:
+            filter = None
+        return self._select(filter, limit)
+
+    def _insertOne(self, document : dict):
+        # the _id is added to the document as pymongo does
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        self._insert(encode(document))
+
+    def _replaceOne(self, filter : dict, replacement : dict, upsert : bool) -> types.SimpleNamespace:
+        docs = self._match(filter, 1)
+        if len(docs) == 0:
+            if not upsert:
+                return _result(matched_count=0, modified_count=0, upserted_id=None)
+            doc = self._insertNew(replacement, filter)
+            return _result(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        doc = encode(replacement)
+        doc["_id"] = docs[0]["_id"]
+        modified = doc != docs[0]
+        if modified:
+            self._replace(doc)
+        return _result(matched_count=1, modified_count=int(modified), upserted_id=None)
+
+    def _insertNew(self, document : dict, filter : dict) -> dict:
+        doc = encode(document)
+        if "_id" not in doc:
+            fid = filter.get("_id") if filter is not None else None
+            doc["_id"] = fid if fid is not None and not isinstance(fid, dict) else ObjectId()
+        self._insert(doc)
+        return doc
+
+    def _applyUpdate(self, doc : dict, update : dict) -> dict:
+        for op, fields in update.items():
+            for k, v in fields.items():
+                if op == "$set":
+                    doc[k] = encode(v)
+                elif op == "$unset":
+                    doc.pop(k, None)
+                elif op == "$inc":
+                    doc[k] = doc.get(k, 0) + v
+                else:
+                    raise ValueError("update operator {} is not supported by storage backends".format(op))
+        return doc
+
+class _NoBatch:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_NO_BATCH = _NoBatch()
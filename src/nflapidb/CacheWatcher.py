@@ -0,0 +1,134 @@
+from typing import Callable, List
+import asyncio
+import logging
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+# The collection holding a version document per entity, incremented
+# on every write by EntityManagers with trackVersions enabled
+VERSION_COLLECTION = "_entity_version"
+
+class CacheWatcher:
+    """Invalidate cached entities when another process writes to them
+
+    The database change stream is watched for writes to the given
+    entity collections. Change streams require a replica set, so on
+    a standalone server the watcher instead polls the entity version
+    documents, which are only maintained by writers that have
+    trackVersions enabled. The entities are invalidated once as the
+    watcher starts, as the writes made before the stream opens, or
+    before the first poll, are not seen.
+
+    Parameters
+    ----------
+    database : AsyncIOMotorDatabase
+        The database to watch
+    onChange : callable
+        Called with the entity name when the entity may have changed
+    entityNames : list of str
+        The names of the entities to watch
+    pollInterval : float
+        The seconds between version polls, also the delay before a
+        failed change stream is reopened
+    usePolling : bool
+        If True poll without trying the change stream first
+    """
+
+    def __init__(self, database : AsyncIOMotorDatabase, onChange : Callable[[str], None],
+                 entityNames : List[str], pollInterval : float = 5.0, usePolling : bool = False):
+        self._db = database
+        self._on_change = onChange
+        self._entity_names = list(entityNames)
+        self._poll_interval = pollInterval
+        self._use_polling = usePolling
+        self._task = None
+
+    @property
+    def mode(self) -> str:
+        """changestream or polling, the method currently in use"""
+        return "polling" if self._use_polling else "changestream"
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+
+    def cancel(self):
+        """Cancel the watcher without waiting for it to stop
+
+        Use this where stop cannot be awaited, e.g. once the event loop
+        is no longer running.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        self._invalidateAll()
+        while not self._use_polling:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                logging.info("Change streams unavailable, polling entity versions instead: {}".format(e))
+                self._use_polling = True
+            except PyMongoError as e:
+                logging.warning("Change stream failed, reopening: {}".format(e))
+                await asyncio.sleep(self._poll_interval)
+                # Changes made while the stream was down were missed
+                self._invalidateAll()
+        await self._poll()
+
+    async def _watch(self):
+        # The events dropping the database, or invalidating the stream,
+        # concern every entity and have no collection
+        pipeline = [{"$match": {"$or": [{"ns.coll": {"$in": self._entity_names}},
+                                        {"operationType": {"$in": ["invalidate", "dropDatabase"]}}]}}]
+        async with self._db.watch(pipeline) as stream:
+            async for change in stream:
+                coll = change.get("ns", {}).get("coll")
+                if coll is None:
+                    self._invalidateAll()
+                else:
+                    self._on_change(coll)
+        # The stream ended, e.g. on an invalidate event, and the changes
+        # made before it is reopened are missed
+        self._invalidateAll()
+
+    async def _poll(self):
+        versions = None
+        while True:
+            try:
+                cversions = await self._readVersions()
+            except PyMongoError as e:
+                logging.warning("Entity version poll failed: {}".format(e))
+            else:
+                if versions is None and len(cversions) == 0:
+                    logging.warning("No entity versions found, writes are only seen by polling once "
+                                    "the writers enable trackVersions")
+                if versions is not None:
+                    for name in self._entity_names:
+                        if cversions.get(name, 0) != versions.get(name, 0):
+                            self._on_change(name)
+                versions = cversions
+            await asyncio.sleep(self._poll_interval)
+
+    async def _readVersions(self) -> dict:
+        col = self._db[VERSION_COLLECTION]
+        return dict([(d["_id"], d.get("version", 0))
+                     async for d in col.find({"_id": {"$in": self._entity_names}})])
+
+    def _invalidateAll(self):
+        for name in self._entity_names:
+            self._on_change(name)
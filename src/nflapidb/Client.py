@@ -1,8 +1,8 @@
-import os
 from typing import List
+import functools
 import nflapi.Client
 from nflapidb.EntityManager import EntityManager
-import nflapidb.Utilities as util
+from nflapidb.StorageBackend import StorageBackend
 from nflapidb.TeamManagerFacade import TeamManagerFacade
 from nflapidb.RosterManagerFacade import RosterManagerFacade
 from nflapidb.ScheduleManagerFacade import ScheduleManagerFacade
@@ -12,19 +12,31 @@ from nflapidb.GameSummaryManagerFacade import GameSummaryManagerFacade
 from nflapidb.GameScoreManagerFacade import GameScoreManagerFacade
 from nflapidb.GameDriveManagerFacade import GameDriveManagerFacade
 from nflapidb.GamePlayManagerFacade import GamePlayManagerFacade
+from nflapidb.SyncScheduler import SyncScheduler
 
 class Client:
 
-    def __init__(self, dbHost=os.environ["DB_HOST"], dbPort=int(os.environ["DB_PORT"]),
-                 dbAuthName=(os.environ["DB_AUTH_NAME"] if "DB_AUTH_NAME" in os.environ else ""),
-                 dbName=os.environ["DB_NAME"],
-                 dbUser=os.environ["DB_USER"], dbUserPwd=os.environ["DB_USER_PWD"],
-                 dbSSL=("DB_USE_SSL" in os.environ and util.str2bool(os.environ["DB_USE_SSL"])),
-                 dbReplicaSet=(os.environ["DB_REPL_SET"] if "DB_REPL_SET" in os.environ else ""),
-                 dbAppName=(os.environ["DB_APP_NAME"] if "DB_APP_NAME" in os.environ else "")):
-        self._entity_manager = EntityManager(dbHost, dbPort, dbAuthName, dbName, dbUser,
-                                             dbUserPwd, dbSSL, dbReplicaSet, dbAuthName)
-        self._nflapi = nflapi.Client.Client()
+    def __init__(self, dbHost : str = None, dbPort : int = None, dbAuthName : str = None,
+                 dbName : str = None, dbUser : str = None, dbUserPwd : str = None,
+                 dbSSL : bool = None, dbReplicaSet : str = None, dbAppName : str = None,
+                 apiClient : nflapi.Client.Client = None, entityManager : EntityManager = None,
+                 backend : StorageBackend = None):
+        """Create a new Client object
+
+        The database arguments default to the environment variables
+        read by EntityManager. An entityManager or a storage backend
+        may be given instead, and an apiClient to use in place of
+        the NFL API client.
+        """
+        if entityManager is None:
+            entityManager = EntityManager(dbHost=dbHost, dbPort=dbPort, dbAuthName=dbAuthName,
+                                          dbName=dbName, dbUser=dbUser, dbUserPwd=dbUserPwd,
+                                          dbSSL=dbSSL, dbReplicaSet=dbReplicaSet,
+                                          dbAppName=dbAppName, backend=backend)
+        if apiClient is None:
+            apiClient = nflapi.Client.Client()
+        self._entity_manager = entityManager
+        self._nflapi = apiClient
         self._team_mgr = None
         self._roster_mgr = None
         self._sched_mgr = None
@@ -35,14 +47,65 @@ class Client:
         self._gmdrv_mgr = None
         self._gmplay_mgr = None
 
-    async def sync(self):
-        dmgrs = [
-            self._teamManager, self._rosterManager, self._scheduleManager,
-            self._playerProfileManager, self._playerGamelogManager, self._gameSummaryManager,
-            self._gameScoreManager, self._gameDriveManager, self._gamePlayManager
-        ]
-        for mgr in dmgrs:
-            await mgr.sync()
+    async def sync(self, concurrency : int = 4, chunkBy : str = "game") -> dict:
+        """Sync all data from the NFL API
+
+        The data managers are run as a dependency graph so that
+        independent managers sync concurrently, e.g. the game data
+        only waits on the schedule (and the roster for profile ids)
+        and the player data only waits on the roster.
+
+        Parameters
+        ----------
+        concurrency : int
+            The maximum number of managers syncing at once
+        chunkBy : str
+            How the game data is requested and saved, game, week or
+            None for all at once; see ScheduleDependantManagerFacade.sync.
+            The saved records are not collected, so memory is bounded
+            by the chunk size.
+
+        Returns
+        -------
+        dict
+            The status and elapsed seconds of each manager sync
+        """
+        # so that the cache watchers of other processes see the sync
+        self._entityManager.trackVersions = True
+        sched = SyncScheduler(concurrency)
+        sched.add("team", self._teamManager.sync)
+        sched.add("roster", self._rosterManager.sync, ["team"])
+        sched.add("schedule", self._scheduleManager.sync)
+        sched.add("player_profile", self._playerProfileManager.sync, ["roster"])
+        sched.add("player_gamelog", self._playerGamelogManager.sync, ["roster"])
+        def gsync(mgr):
+            return functools.partial(mgr.sync, chunkBy=chunkBy, collect=False)
+        sched.add("game_summary", gsync(self._gameSummaryManager), ["schedule", "roster"])
+        sched.add("game_score", gsync(self._gameScoreManager), ["schedule"])
+        sched.add("game_drive", gsync(self._gameDriveManager), ["schedule"])
+        sched.add("game_play", gsync(self._gamePlayManager), ["schedule", "roster"])
+        return await sched.run()
+
+    def enableCache(self, maxSize : int = 1024, ttl : float = None):
+        """Cache the team, roster and schedule reads
+
+        The cached results are discarded whenever this client saves
+        the data, e.g. by sync, so they are current for this process.
+        Set ttl to bound how stale they get when other processes sync,
+        or start the entity manager's watcher. The entity versions are
+        tracked so that the watchers of other processes see the writes
+        of this one.
+        """
+        self._entityManager.trackVersions = True
+        for mgr in [self._teamManager, self._rosterManager, self._scheduleManager]:
+            mgr.enableCache(maxSize=maxSize, ttl=ttl)
+
+    async def ensureIndexes(self, dropStale : bool = False) -> dict:
+        """Create the declared indexes missing from existing collections
+
+        See EntityManager.ensureIndexes
+        """
+        return await self._entityManager.ensureIndexes(dropStale=dropStale)
 
     async def getTeams(self, teams : List[str] = None) -> List[dict]:
         return await self._teamManager.find(teams)
@@ -0,0 +1,94 @@
+from typing import Any, List
+from datetime import datetime, timezone, timedelta
+from time import struct_time
+from functools import lru_cache
+import re
+import dateutil.parser
+from nflapidb.Entity import Entity
+
+# The US timezone abbreviations from https://www.timetemperature.com/abbreviations/united_states_time_zone_abbreviations.shtml
+TZINFOS = {
+    "AST": -14400,
+    "EDT": -14400,
+    "EST": -18000,
+    "CDT": -18000,
+    "CST": -21600,
+    "MDT": -21600,
+    "MST": -25200,
+    "PDT": -25200,
+    "PST": -28800,
+    "AKDT": -28800,
+    "AKST": -32400,
+    "HADT": -32400,
+    "HAST": -36000,
+    "HST": -36000,
+    "SDT": -36000,
+    "SST": -39600,
+    "CHST": -36000
+}
+
+_MDY_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+@lru_cache(maxsize=4096)
+def parseDatetime(dtstr : str) -> datetime:
+    """Parse a datetime string, caching the result
+
+    Strings of the form M/D/YYYY, as used for roster birthdate,
+    are parsed directly; anything else goes through dateutil.
+    """
+    m = _MDY_RE.match(dtstr)
+    if m is not None:
+        return datetime(int(m.group(3)), int(m.group(1)), int(m.group(2)))
+    return dateutil.parser.parse(dtstr, tzinfos=TZINFOS)
+
+def toDatetime(dt : Any) -> datetime:
+    if isinstance(dt, str):
+        if dt == "":
+            dt = None
+        else:
+            dt = parseDatetime(dt)
+    elif isinstance(dt, struct_time):
+        tzkey = dt.tm_zone
+        if tzkey is None:
+            tzkey = "EST"
+            if dt.tm_mon > 7 and dt.tm_mon < 12:
+                tzkey = "EDT"
+        dt = datetime(dt.tm_year, dt.tm_mon, dt.tm_mday,
+                      dt.tm_hour, dt.tm_min, dt.tm_sec,
+                      tzinfo=timezone(timedelta(seconds=TZINFOS[tzkey]), tzkey))
+    return dt
+
+class CoercionPlan:
+    """The attribute type conversions for an entity
+
+    The plan is built once from the entity column types and
+    then applied to every record saved for that entity.
+    """
+
+    _converters = {
+        "int": int,
+        "float": float,
+        "datetime": toDatetime
+    }
+
+    def __init__(self, entity : Entity):
+        self._plan = []
+        for cname, ctype in entity.schema.columns.items():
+            if ctype in self._converters:
+                self._plan.append((cname, self._converters[ctype]))
+
+    def apply(self, datum : dict) -> dict:
+        for cname, conv in self._plan:
+            v = datum.get(cname)
+            if v is not None:
+                datum[cname] = conv(v)
+        return datum
+
+    def applyAll(self, data : List[dict]) -> List[dict]:
+        plan = self._plan
+        for datum in data:
+            for cname, conv in plan:
+                v = datum.get(cname)
+                if v is not None:
+                    datum[cname] = conv(v)
+        return data
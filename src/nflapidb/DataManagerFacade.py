@@ -1,8 +1,26 @@
-from typing import List, abc, abstractmethod
+from typing import Any, List, AsyncIterator, abc, abstractmethod
+import asyncio
+import functools
+import collections
 import logging
+from concurrent.futures import Executor, ThreadPoolExecutor
 import nflapi.Client
 from nflapidb.EntityManager import EntityManager
-from nflapidb.QueryModel import QueryModel
+from nflapidb.QueryModel import QueryModel, Operator
+import nflapidb.Utilities as util
+import nflapidb.Instrumentation as instr
+
+# The maximum number of NFL API requests in flight across all facades
+API_MAX_WORKERS = 4
+__api_executor__ = None
+
+def getApiExecutor() -> Executor:
+    """Get the executor shared by all facades for NFL API requests"""
+    global __api_executor__
+    if __api_executor__ is None:
+        __api_executor__ = ThreadPoolExecutor(max_workers=API_MAX_WORKERS,
+                                              thread_name_prefix="nflapi")
+    return __api_executor__
 
 class DataManagerFacade(abc.ABC):
 
@@ -12,6 +30,9 @@ class DataManagerFacade(abc.ABC):
         if apiClient is None:
             apiClient = nflapi.Client.Client()
         self._nflapi_client = apiClient
+        self._save_batch_size = 1000
+        self._api_executor = None
+        self._api_chunk_size = None
 
     @property
     def entityName(self) -> str:
@@ -23,14 +44,48 @@ class DataManagerFacade(abc.ABC):
 
     async def save(self, data : List[dict]) -> List[dict]:
         logging.info("Saving {} {}s...".format(len(data), self._entity_name))
-        return await self._entity_manager.save(self._entity_name, data)
+        rslt = await self._entity_manager.bulkSave(self._entity_name, data,
+                                                   batchSize=self._save_batch_size,
+                                                   reread=True)
+        return rslt["data"]
 
     async def find(self, qm : QueryModel = None, **kwargs) -> List[dict]:
         if qm is None:
             qm = self._getQueryModel(**kwargs)
         return await self._entity_manager.find(self._entity_name,
                                                query=qm.constraint,
-                                               projection=qm.select())
+                                               projection=qm.select(),
+                                               sort=qm.ordering,
+                                               limit=qm.limit)
+
+    async def distinct(self, key : str, qm : QueryModel = None) -> list:
+        """Get the distinct values of key, optionally constrained by qm"""
+        query = None
+        if qm is not None:
+            query = qm.constraint
+        return await self._entity_manager.distinct(self._entity_name, key, query=query)
+
+    async def aggregate(self, pipeline : List[dict]) -> List[dict]:
+        return await self._entity_manager.aggregate(self._entity_name, pipeline)
+
+    async def stream(self, qm : QueryModel = None, batchSize : int = None,
+                     chunkSize : int = None, **kwargs) -> AsyncIterator:
+        """Iterate over the matching records without loading them all
+
+        Takes the same query parameters as find. Records are yielded
+        one at a time, or as lists of at most chunkSize records, and
+        batchSize sets the number of records retrieved per round trip.
+        """
+        if qm is None:
+            qm = self._getQueryModel(**kwargs)
+        async for d in self._entity_manager.stream(self._entity_name,
+                                                   query=qm.constraint,
+                                                   projection=qm.select(),
+                                                   batchSize=batchSize,
+                                                   chunkSize=chunkSize,
+                                                   sort=qm.ordering,
+                                                   limit=qm.limit):
+            yield d
 
     async def delete(self, qm : QueryModel = None, **kwargs) -> int:
         if qm is None:
@@ -41,6 +96,21 @@ class DataManagerFacade(abc.ABC):
     async def drop(self):
         await self._entity_manager.drop(self._entity_name)
 
+    def enableCache(self, maxSize : int = 1024, ttl : float = None):
+        """Cache find results until the entity is next written to
+
+        See EntityManager.enableCache
+        """
+        self._entity_manager.enableCache(self._entity_name, maxSize=maxSize, ttl=ttl)
+
+    def disableCache(self):
+        self._entity_manager.disableCache(self._entity_name)
+
+    @property
+    def cacheStats(self) -> dict:
+        """The find cache hits, misses and size, None if not enabled"""
+        return self._entity_manager.cacheStats(self._entity_name)
+
     @property
     def _entityManager(self) -> EntityManager:
         return self._entity_manager
@@ -49,6 +119,89 @@ class DataManagerFacade(abc.ABC):
     def _apiClient(self) -> nflapi.Client.Client:
         return self._nflapi_client
     
+    @property
+    def apiExecutor(self) -> Executor:
+        """The executor the blocking NFL API requests are run in"""
+        if self._api_executor is None:
+            return getApiExecutor()
+        return self._api_executor
+
+    @apiExecutor.setter
+    def apiExecutor(self, executor : Executor):
+        self._api_executor = executor
+
+    @property
+    def apiChunkSize(self) -> int:
+        """The number of items sent per NFL API request, None for all"""
+        return self._api_chunk_size
+
+    @apiChunkSize.setter
+    def apiChunkSize(self, size : int):
+        self._api_chunk_size = size
+
+    async def _callAPI(self, func : callable, *args, **kwargs) -> Any:
+        """Call a blocking NFL API function without blocking the event loop"""
+        loop = asyncio.get_event_loop()
+        instr.count("api_requests", entity=self._entity_name)
+        if instr.enabled():
+            # timed in the executor so that the span excludes the wait for a worker
+            func = functools.partial(self._timeAPI, func)
+        return await loop.run_in_executor(self.apiExecutor, functools.partial(func, *args, **kwargs))
+
+    def _timeAPI(self, func : callable, *args, **kwargs) -> Any:
+        method = getattr(func, "__name__", type(func).__name__)
+        with instr.span("api.request", entity=self._entity_name, method=method):
+            return func(*args, **kwargs)
+
+    async def _iterAPI(self, func : callable, items : List[Any], chunkSize : int = None) -> AsyncIterator:
+        """Call a blocking NFL API function for each chunk of items
+
+        The request for the next chunk is started before the result
+        of the current chunk is yielded, so processing the current
+        chunk, e.g. saving it, overlaps with fetching the next one.
+
+        Yields
+        ------
+        tuple
+            The chunk of items and the func result for the chunk
+        """
+        async for rslt in self._iterAPIChunks(func, util.chunk(items, chunkSize)):
+            yield rslt
+
+    async def _iterAPIChunks(self, func : callable, chunks : List[Any], prefetch : int = 1) -> AsyncIterator:
+        """Call a blocking NFL API function for each of the given chunks
+
+        This is _iterAPI for items that are already split into chunks.
+        Up to prefetch requests are in flight while a result is being
+        processed; results are always yielded in chunk order.
+        """
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        pending = collections.deque()
+        nxtidx = 0
+        while nxtidx < len(chunks) and len(pending) < prefetch:
+            pending.append(asyncio.ensure_future(self._callAPI(func, chunks[nxtidx])))
+            nxtidx += 1
+        try:
+            for i in range(0, len(chunks)):
+                rslt = await pending.popleft()
+                if nxtidx < len(chunks):
+                    pending.append(asyncio.ensure_future(self._callAPI(func, chunks[nxtidx])))
+                    nxtidx += 1
+                yield chunks[i], rslt
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+    async def _findTeamHistory(self, profileIds : List[int]) -> List[dict]:
+        """Get the team and previous_teams of the given players' current records"""
+        if len(profileIds) == 0:
+            return []
+        qm = QueryModel()
+        qm.cstart("profile_id", profileIds, Operator.IN)
+        qm.sinclude(["profile_id", "team", "previous_teams"])
+        return await DataManagerFacade.find(self, qm=qm)
+
     @abstractmethod
     def _getQueryModel(self, **kwargs) -> QueryModel:
         """This is called by find and delete to get the query parameters"""
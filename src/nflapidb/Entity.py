@@ -1,71 +1,37 @@
-from typing import List, Set
-import inspect
+from typing import FrozenSet
 from functools import wraps
+from nflapidb.EntitySchema import EntitySchema
 
 class Entity:
+    # IndexSpec objects declaring indexes in addition to the primary
+    # key index and the single column index of each Index column
+    indexes = []
+
     def __init__(self):
-        self._clazz_attrs = getattr(self.__class__, "__dict__")
-        self._setPrimaryKey()
-        self._setColumns()
-        self._setIndices()
+        self._schema = self.__class__.__dict__.get("_entity_schema")
+        if self._schema is None:
+            # Compiled once per class; subclasses get their own
+            self._schema = EntitySchema.compile(self)
+            setattr(self.__class__, "_entity_schema", self._schema)
 
     @property
-    def primaryKey(self) -> Set[str]:
-        return set([f.__name__ for f in self._primary_key])
+    def schema(self) -> EntitySchema:
+        return self._schema
 
     @property
-    def columnNames(self) -> Set[str]:
-        return set(self._col_map.keys())
+    def primaryKey(self) -> FrozenSet[str]:
+        return self._schema.primaryKeySet
 
     @property
-    def indices(self) -> Set[str]:
-        return set([f.__name__ for f in self._indices])
-
-    def columnType(self, cname : str) -> str:
-        t = None
-        if cname in self._col_map.keys():
-            t = self._col_map[cname]
-        return t
-    
-    def _setPrimaryKey(self):
-        self._primary_key = set()
-        self._initDecoratorSet(self._primary_key, self._isPrimaryKey)
-    
-    def _setColumns(self):
-        self._col_map = {}
-        for col in self._initDecoratorSet(set(), self._isColumn):
-            self._col_map[col.__name__] = col(self)
-    
-    def _setIndices(self):
-        self._indices = set()
-        self._initDecoratorSet(self._indices, self._isIndex)
-        
-    def _initDecoratorSet(self, s : set, t : callable) -> set:
-        for k in self._clazz_attrs:
-            v = self._clazz_attrs[k]
-            if inspect.isfunction(v) and t(v):
-                s.add(v)
-        return s
-
-    def _isPrimaryKey(self, f : callable) -> bool:
-        return self._isDecorated(f, "PrimaryKey")
+    def columnNames(self) -> FrozenSet[str]:
+        return self._schema.columnNames
 
-    def _isColumn(self, f : callable) -> bool:
-        return self._isDecorated(f, "Column") \
-               or self._isDecorated(f, "PrimaryKey") \
-               or self._isDecorated(f, "Index")
-
-    def _isIndex(self, f : callable) -> bool:
-        return self._isDecorated(f, "Index")
-
-    def _decorators(self, f : callable) -> Set[str]:
-        d = set()
-        if hasattr(f, "decorators"):
-            d = set(getattr(f, "decorators").split(","))
-        return d
+    @property
+    def indices(self) -> FrozenSet[str]:
+        return self._schema.indexSet
 
-    def _isDecorated(self, f : callable, name : str) -> bool:
-        return name in self._decorators(f)
+    def columnType(self, cname : str) -> str:
+        return self._schema.columnType(cname)
 
 def PrimaryKey(attr : callable):
     return __decorate__(attr, "PrimaryKey")
@@ -1,28 +1,89 @@
 import os
-from typing import List, Any
+import math
+from typing import List, AsyncIterator
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
-from pymongo import ReturnDocument, IndexModel, ASCENDING
-from pymongo.errors import InvalidName
+from pymongo import ReturnDocument, IndexModel, ReplaceOne
+from pymongo.errors import InvalidName, PyMongoError
 from bson.codec_options import CodecOptions
-import importlib
-from datetime import datetime, timezone, timedelta
-from time import struct_time
-import dateutil.parser
+import importlib.util
 import logging
 import nflapidb.Utilities as util
+import nflapidb.Instrumentation as instr
 from nflapidb.Entity import Entity
+from nflapidb.EntitySchema import EntitySchema
+from nflapidb.IndexSpec import IndexSpec
+from nflapidb.CoercionPlan import CoercionPlan
+from nflapidb.QueryCache import QueryCache
+from nflapidb.CacheWatcher import CacheWatcher, VERSION_COLLECTION
+from nflapidb.StorageBackend import StorageBackend
+from nflapidb.MemoryBackend import MemoryBackend
+from nflapidb.SQLiteBackend import SQLiteBackend
+
+# The Entity objects keyed by entity directory path and entity name
+__entity_cache__ = {}
+
+def _loadEntity(entityDirPath : str, entityName : str) -> Entity:
+    ent = None
+    efpath = os.path.join(entityDirPath, f"{entityName}.py")
+    if os.path.exists(efpath):
+        spec = importlib.util.spec_from_file_location(f"nflapidb.entity.{entityName}", efpath)
+        entmod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(entmod)
+        ent = getattr(entmod, entityName)()
+    return ent
+
+def _environmentBackend(dbName : str) -> StorageBackend:
+    """Get the backend selected by the DB_BACKEND environment variable
+
+    None is returned for mongodb, the default. The sqlite database
+    file is given by DB_SQLITE_PATH and defaults to dbName.sqlite3.
+    """
+    name = os.environ.get("DB_BACKEND", "mongodb")
+    if name == "mongodb":
+        return None
+    if name == "memory":
+        return MemoryBackend.shared(dbName)
+    if name == "sqlite":
+        return SQLiteBackend(os.environ.get("DB_SQLITE_PATH", f"{dbName}.sqlite3"))
+    raise ValueError(f"DB_BACKEND {name} is not one of mongodb, memory or sqlite")
 
 class EntityManager:
 
-    def __init__(self, dbHost=os.environ["DB_HOST"], dbPort=int(os.environ["DB_PORT"]),
-                 dbAuthName=(os.environ["DB_AUTH_NAME"] if "DB_AUTH_NAME" in os.environ else ""),
-                 dbName=os.environ["DB_NAME"],
-                 dbUser=os.environ["DB_USER"], dbUserPwd=os.environ["DB_USER_PWD"],
-                 dbSSL=("DB_USE_SSL" in os.environ and util.str2bool(os.environ["DB_USE_SSL"])),
-                 dbReplicaSet=(os.environ["DB_REPL_SET"] if "DB_REPL_SET" in os.environ else ""),
-                 dbAppName=(os.environ["DB_APP_NAME"] if "DB_APP_NAME" in os.environ else ""),
-                 entityDirPath: str = None):
-        """Create a new EntityManager object"""
+    def __init__(self, dbHost: str = None, dbPort: int = None, dbAuthName: str = None,
+                 dbName: str = None, dbUser: str = None, dbUserPwd: str = None,
+                 dbSSL: bool = None, dbReplicaSet: str = None, dbAppName: str = None,
+                 entityDirPath: str = None, backend: StorageBackend = None):
+        """Create a new EntityManager object
+
+        The database arguments not given are read from the DB_HOST,
+        DB_PORT, DB_AUTH_NAME, DB_NAME, DB_USER, DB_USER_PWD,
+        DB_USE_SSL, DB_REPL_SET and DB_APP_NAME environment variables.
+        If backend is given, or the DB_BACKEND environment variable is
+        memory or sqlite, the entities are stored by that backend rather
+        than a MongoDB server and only dbName is used.
+        """
+        if dbName is None:
+            dbName = os.environ["DB_NAME"]
+        if backend is None:
+            backend = _environmentBackend(dbName)
+        self._backend = backend
+        if backend is None:
+            if dbHost is None:
+                dbHost = os.environ["DB_HOST"]
+            if dbPort is None:
+                dbPort = int(os.environ["DB_PORT"])
+            if dbAuthName is None:
+                dbAuthName = os.environ.get("DB_AUTH_NAME", "")
+            if dbUser is None:
+                dbUser = os.environ["DB_USER"]
+            if dbUserPwd is None:
+                dbUserPwd = os.environ["DB_USER_PWD"]
+            if dbSSL is None:
+                dbSSL = "DB_USE_SSL" in os.environ and util.str2bool(os.environ["DB_USE_SSL"])
+            if dbReplicaSet is None:
+                dbReplicaSet = os.environ.get("DB_REPL_SET", "")
+            if dbAppName is None:
+                dbAppName = os.environ.get("DB_APP_NAME", "")
         self._db_host = dbHost
         self._db_port = dbPort
         if not (dbAuthName is None or dbAuthName == ""):
@@ -40,51 +101,401 @@ class EntityManager:
         self._ssl = dbSSL
         self._repl_set = dbReplicaSet
         self._app_name = dbAppName
-        self._entityCache = {}
+        self._collection_cache = {}
+        self._primary_key_cache = {}
+        self._coercion_plans = {}
+        self._query_caches = {}
+        self._track_versions = False
+        self._watcher = None
         self._connect()
 
     def dispose(self):
         """Call this when you are done using the object"""
-        self._conn.close()
+        if self._watcher is not None:
+            self._watcher.cancel()
+        if self._backend is not None:
+            self._backend.close()
+        elif self._conn is not None:
+            self._conn.close()
+
+    @property
+    def backend(self) -> StorageBackend:
+        """The storage backend, None when stored by a MongoDB server"""
+        return self._backend
 
     def getEntity(self, entityName: str) -> Entity:
-        ent = None
-        if entityName in self._entityCache:
-            ent = self._entityCache[entityName]
-        else:
-            efpath = os.path.join(os.path.relpath(self._entity_dir_path), f"{entityName}.py")
-            if os.path.exists(efpath):
-                impath = efpath.replace("/", ".").replace(".py", "")
-                entmod = importlib.import_module(impath)
-                # There has to be a better way of instantiating the object then this
-                ent = eval(f"entmod.{entityName}()")
-                self._entityCache[entityName] = ent
-        return ent
+        key = (self._entity_dir_path, entityName)
+        if key not in __entity_cache__:
+            # Entities are immutable once created so they are shared
+            # by every EntityManager, and unknown names are cached too
+            __entity_cache__[key] = _loadEntity(self._entity_dir_path, entityName)
+        return __entity_cache__[key]
 
     async def save(self, entityName: str, data: List[dict]) -> List[dict]:
-        col = await self._getCollection(entityName)
-        pkeys = await self._primaryKey(col)
-        dlen = len(data)
-        for i in range(0, dlen):
-            datum = self._applyAttributeTypes(data[i], entityName)
-            q = self._buildQueryItem(datum, pkeys)
-            data[i] = await col.find_one_and_replace(q, datum, upsert=True, return_document=ReturnDocument.AFTER)
-            self._logProgress(i, dlen)
+        with instr.span("db.save", entity=entityName):
+            col = await self._getCollection(entityName)
+            pkeys = await self._getPrimaryKey(entityName, col)
+            self._applyAttributeTypesAll(data, entityName)
+            dlen = len(data)
+            nsaved = 0
+            try:
+                for i in range(0, dlen):
+                    datum = data[i]
+                    q = self._buildQueryItem(datum, pkeys)
+                    data[i] = await col.find_one_and_replace(q, datum, upsert=True, return_document=ReturnDocument.AFTER)
+                    nsaved += 1
+                    self._logProgress(i, dlen)
+            finally:
+                instr.count("round_trips", nsaved, entity=entityName, op="save")
+                instr.count("docs_written", nsaved, entity=entityName)
+                await self._entityWritten(entityName)
+        return data
+
+    async def bulkSave(self, entityName: str, data: List[dict], batchSize: int = 1000, reread: bool = False) -> dict:
+        """Upsert data using unordered bulk writes
+
+        The records are sent as ReplaceOne(upsert=True) requests in batches
+        of at most batchSize records. A batch is flushed early whenever a
+        record repeats a key already pending in it, so a later record with
+        the same key still replaces an earlier one as it does in save.
+
+        Parameters
+        ----------
+        entityName : str
+            The name of the entity to save the data to
+        data : list of dict
+            The records to save
+        batchSize : int
+            The maximum number of records sent in one bulk_write call
+        reread : bool
+            If True the saved documents are read back with one query per
+            batch, and replace the records of data as they do in save
+
+        Returns
+        -------
+        dict
+            A dict with the matched, modified and upserted counts and,
+            when reread is True, the saved documents under data
+        """
+        with instr.span("db.bulk_save", entity=entityName):
+            col = await self._getCollection(entityName)
+            pkeys = await self._getPrimaryKey(entityName, col)
+            rslt = {"matched": 0, "modified": 0, "upserted": 0, "data": [] if reread else None}
+            dlen = len(data)
+            batch = []
+            bkeys = set()
+            self._applyAttributeTypesAll(data, entityName)
+            try:
+                for i in range(0, dlen):
+                    datum = data[i]
+                    q = self._buildQueryItem(datum, pkeys)
+                    key = self._recordKey(q)
+                    if len(batch) >= batchSize or key in bkeys:
+                        await self._bulkWrite(col, batch, pkeys, rslt)
+                        batch = []
+                        bkeys = set()
+                    batch.append((datum, q))
+                    bkeys.add(key)
+                    self._logProgress(i, dlen)
+                if len(batch) > 0:
+                    await self._bulkWrite(col, batch, pkeys, rslt)
+                if reread:
+                    data[:] = rslt["data"]
+                    rslt["data"] = data
+            finally:
+                await self._entityWritten(entityName)
+        return rslt
+
+    async def find(self, entityName: str, query: dict=None, projection: dict=None, collection : AsyncIOMotorCollection=None,
+                   sort: list=None, limit: int=None) -> List[dict]:
+        cache = self._query_caches.get(entityName) if collection is None else None
+        if cache is not None:
+            key = QueryCache.makeKey(query, projection, sort, limit)
+            hit, data = cache.get(key)
+            if hit:
+                instr.count("cache_hits", entity=entityName)
+                return data
+            instr.count("cache_misses", entity=entityName)
+            generation = cache.generation
+        with instr.span("db.find", entity=entityName):
+            if collection is None:
+                collection = await self._getCollection(entityName)
+            data = [d async for d in self._cursor(collection, query, projection, sort, limit)]
+        instr.count("round_trips", entity=entityName, op="find")
+        instr.count("docs_read", len(data), entity=entityName)
+        if cache is not None:
+            cache.put(key, data, generation)
         return data
 
-    async def find(self, entityName: str, query: dict=None, projection: dict=None, collection : AsyncIOMotorCollection=None) -> List[dict]:
+    async def distinct(self, entityName: str, key: str, query: dict=None, collection : AsyncIOMotorCollection=None) -> list:
+        """Get the distinct values of key in the documents matching query"""
+        with instr.span("db.distinct", entity=entityName):
+            if collection is None:
+                collection = await self._getCollection(entityName)
+            values = await collection.distinct(key, query)
+        instr.count("round_trips", entity=entityName, op="distinct")
+        return values
+
+    async def aggregate(self, entityName: str, pipeline: List[dict], collection : AsyncIOMotorCollection=None) -> List[dict]:
+        """Run an aggregation pipeline and return the resulting documents"""
+        with instr.span("db.aggregate", entity=entityName):
+            if collection is None:
+                collection = await self._getCollection(entityName)
+            data = [d async for d in collection.aggregate(pipeline)]
+        instr.count("round_trips", entity=entityName, op="aggregate")
+        return data
+
+    async def stream(self, entityName: str, query: dict=None, projection: dict=None,
+                     batchSize: int=None, chunkSize: int=None,
+                     collection : AsyncIOMotorCollection=None,
+                     sort: list=None, limit: int=None) -> AsyncIterator:
+        """Iterate over the documents matching query without materializing them
+
+        Parameters
+        ----------
+        entityName : str
+            The name of the entity to query
+        query : dict
+            The query constraint
+        projection : dict
+            The columns to include or exclude
+        batchSize : int
+            The number of documents the cursor retrieves per round trip
+        chunkSize : int
+            If given lists of at most chunkSize documents are yielded
+            rather than individual documents
+
+        Yields
+        ------
+        dict or list of dict
+        """
         if collection is None:
             collection = await self._getCollection(entityName)
-        return [d async for d in collection.find(query, projection=projection)]
+        cursor = self._cursor(collection, query, projection, sort, limit)
+        if batchSize is not None:
+            cursor = cursor.batch_size(batchSize)
+        chunk = []
+        n = 0
+        try:
+            async for d in cursor:
+                n += 1
+                if chunkSize is None:
+                    yield d
+                else:
+                    chunk.append(d)
+                    if len(chunk) >= chunkSize:
+                        yield chunk
+                        chunk = []
+            if len(chunk) > 0:
+                yield chunk
+        finally:
+            # a cursor fetches batchSize documents per round trip, the
+            # size of the default batches is not known
+            ntrips = 1
+            if batchSize is not None and batchSize > 0:
+                ntrips = max(1, math.ceil(n / batchSize))
+            instr.count("round_trips", ntrips, entity=entityName, op="stream")
+            instr.count("docs_read", n, entity=entityName)
 
     async def delete(self, entityName: str, query: dict={}, collection : AsyncIOMotorCollection=None) -> int:
-        if collection is None:
-            collection = await self._getCollection(entityName)
-        rslt = await collection.delete_many(query)
+        with instr.span("db.delete", entity=entityName):
+            if collection is None:
+                collection = await self._getCollection(entityName)
+            try:
+                rslt = await collection.delete_many(query)
+            finally:
+                await self._entityWritten(entityName)
+        instr.count("round_trips", entity=entityName, op="delete")
+        instr.count("docs_deleted", rslt.deleted_count, entity=entityName)
         return rslt.deleted_count
 
     async def drop(self, entityName: str):
         await self._database.drop_collection(entityName)
+        self._invalidateMetadata(entityName)
+        await self._entityWritten(entityName)
+
+    def enableCache(self, entityName: str, maxSize: int = 1024, ttl: float = None) -> QueryCache:
+        """Cache the find results of an entity
+
+        Cached results are discarded whenever this object saves to,
+        deletes from or drops the entity. Writes made by other
+        processes are only seen once ttl seconds have passed.
+
+        Parameters
+        ----------
+        entityName : str
+            The name of the entity to cache
+        maxSize : int
+            The maximum number of distinct queries cached
+        ttl : float
+            The number of seconds a result is cached for, None to
+            cache results until the entity is written to
+        """
+        self._query_caches[entityName] = QueryCache(maxSize, ttl)
+        return self._query_caches[entityName]
+
+    def disableCache(self, entityName: str):
+        self._query_caches.pop(entityName, None)
+
+    @property
+    def trackVersions(self) -> bool:
+        """If True every write increments the entity version document
+
+        Enable this in every process writing to a standalone server
+        so that the polling watchers of other processes see changes.
+        It is enabled by startWatcher, and by Client.sync and
+        Client.enableCache.
+        """
+        return self._track_versions
+
+    @trackVersions.setter
+    def trackVersions(self, value: bool):
+        self._track_versions = value
+
+    def startWatcher(self, entityNames: List[str] = None, pollInterval: float = 5.0,
+                     usePolling: bool = False) -> CacheWatcher:
+        """Invalidate the caches when other processes write to the entities
+
+        Must be called with a running event loop. See CacheWatcher.
+
+        Parameters
+        ----------
+        entityNames : list of str
+            The entities to watch, all entities if None
+        pollInterval : float
+            The seconds between version polls when change streams
+            are not available
+        usePolling : bool
+            If True poll the entity versions without trying the
+            change stream first
+        """
+        # the watchers of other processes see this one's writes
+        self._track_versions = True
+        if self._watcher is None or not self._watcher.running:
+            if entityNames is None:
+                entityNames = self._entityNames()
+            self._watcher = CacheWatcher(self._database, self._invalidateCache, entityNames,
+                                         pollInterval=pollInterval, usePolling=usePolling)
+            self._watcher.start()
+        return self._watcher
+
+    async def stopWatcher(self):
+        if self._watcher is not None:
+            await self._watcher.stop()
+            self._watcher = None
+
+    def cacheStats(self, entityName: str) -> dict:
+        """The cache hits, misses and size, None if the entity is not cached"""
+        cache = self._query_caches.get(entityName)
+        return None if cache is None else cache.stats
+
+    async def refreshMetadata(self, entityName: str = None):
+        """Discard cached collection metadata
+
+        Collection handles and primary keys are cached on first use,
+        call this if a collection was changed outside of this object.
+        If entityName is given its metadata is reloaded immediately,
+        otherwise the metadata of all entities is reloaded on next use.
+        """
+        self._invalidateMetadata(entityName)
+        if entityName is not None:
+            col = await self._getCollection(entityName)
+            await self._getPrimaryKey(entityName, col)
+
+    async def ensureIndexes(self, entityName: str = None, dropStale: bool = False) -> dict:
+        """Bring the collection indexes in line with the entity definitions
+
+        The indexes declared by each entity are compared with those
+        of its collection. Missing indexes are built, which MongoDB 4.2
+        and later does online, without blocking reads and writes but
+        for a brief lock at the start and end of the build. Indexes
+        that are not declared are reported as stale, and dropped if
+        dropStale is True, after the missing indexes are built so that
+        a failed build leaves the stale ones in place. A declared index
+        whose name is taken by a different index can only be built
+        once the stale one is dropped and is otherwise reported in
+        conflicts. A unique index on the primary key columns matches
+        in any column order, as earlier versions built it in the
+        order of a set.
+
+        Parameters
+        ----------
+        entityName : str
+            The entity to reconcile, which has its collection created
+            if need be, or None for the entities whose collections
+            exist
+        dropStale : bool
+            If True drop the indexes that are not declared
+
+        Returns
+        -------
+        dict
+            A dict keyed by entity name with a dict value holding the
+            created, stale, dropped and conflicts lists of index names
+        """
+        if entityName is None:
+            cnames = set(await self._database.list_collection_names())
+            enames = [ename for ename in self._entityNames() if ename in cnames]
+        else:
+            enames = [entityName]
+        report = {}
+        for ename in enames:
+            ent = self.getEntity(ename)
+            if ent is None:
+                raise ValueError("{} is not a known entity".format(ename))
+            report[ename] = await self._ensureEntityIndexes(ename, ent.schema, dropStale)
+        return report
+
+    async def _ensureEntityIndexes(self, entityName: str, schema : EntitySchema, dropStale: bool) -> dict:
+        rslt = {"created": [], "stale": [], "dropped": [], "conflicts": []}
+        col = await self._getCollection(entityName)
+        current = await col.index_information()
+        pkey = frozenset(schema.primaryKey)
+        def isMatch(spec : IndexSpec, name : str) -> bool:
+            return self._isIndexMatch(spec, current[name], pkey)
+        specs = schema.indexSpecs
+        missing = [spec for spec in specs if not any([isMatch(spec, name) for name in current])]
+        for name in current:
+            if name != "_id_" and not any([isMatch(spec, name) for spec in specs]):
+                rslt["stale"].append(name)
+        # The indexes are built before the stale ones are dropped, so
+        # a failed build leaves the collection with its unique keys,
+        # only those whose name is taken wait for the drop
+        await self._createIndexes(entityName, col, [spec for spec in missing if spec.name not in current], rslt)
+        if dropStale:
+            for name in rslt["stale"]:
+                logging.info("Dropping stale index {} of {}".format(name, entityName))
+                await col.drop_index(name)
+                rslt["dropped"].append(name)
+                self._primary_key_cache.pop(entityName, None)
+        conflicts = [spec for spec in missing if spec.name in current]
+        rslt["conflicts"] = [spec.name for spec in conflicts if spec.name not in rslt["dropped"]]
+        await self._createIndexes(entityName, col, [spec for spec in conflicts if spec.name in rslt["dropped"]], rslt)
+        return rslt
+
+    async def _createIndexes(self, entityName : str, col : AsyncIOMotorCollection, specs : List[IndexSpec], rslt : dict):
+        if len(specs) > 0:
+            logging.info("Creating indexes {} of {}".format(", ".join([spec.name for spec in specs]), entityName))
+            rslt["created"].extend(await col.create_indexes([spec.toIndexModel() for spec in specs]))
+            self._primary_key_cache.pop(entityName, None)
+
+    def _isIndexMatch(self, spec : IndexSpec, info : dict, primaryKey : frozenset = frozenset()) -> bool:
+        # index_information reports directions as floats in some
+        # server versions, so they are compared as numbers
+        key = [(c, int(d)) if isinstance(d, (int, float)) else (c, d) for c, d in info["key"]]
+        if spec.unique and frozenset(spec.columnNames) == primaryKey:
+            # the primary key index was built from a set of columns,
+            # so it matches in any column order
+            keyMatch = sorted(key) == sorted(spec.key)
+        else:
+            keyMatch = key == list(spec.key)
+        return keyMatch \
+               and bool(info.get("unique", False)) == spec.unique \
+               and info.get("partialFilterExpression") == spec.partialFilterExpression
+
+    def _entityNames(self) -> List[str]:
+        return sorted([os.path.splitext(f)[0] for f in os.listdir(self._entity_dir_path)
+                       if f.endswith(".py") and not f.startswith("_")])
 
     @property
     def _entity_dir_path(self) -> str:
@@ -92,7 +503,7 @@ class EntityManager:
 
     @_entity_dir_path.setter
     def _entity_dir_path(self, path : str):
-        self._edpath = path
+        self._edpath = os.path.abspath(path)
 
     def _logProgress(self, recordIndex : int, recordCount : int):
         rnum = recordIndex + 1
@@ -101,59 +512,62 @@ class EntityManager:
             logging.info("{} of {} complete".format(rnum, recordCount))
 
     def _applyAttributeTypes(self, datum : dict, entityName : str) -> dict:
-        def dtparse(dt : Any) -> datetime:
-            # The US timezone abbreviations from https://www.timetemperature.com/abbreviations/united_states_time_zone_abbreviations.shtml
-            tzi = {
-                "AST": -14400,
-                "EDT": -14400,
-                "EST": -18000,
-                "CDT": -18000,
-                "CST": -21600,
-                "MDT": -21600,
-                "MST": -25200,
-                "PDT": -25200,
-                "PST": -28800,
-                "AKDT": -28800,
-                "AKST": -32400,
-                "HADT": -32400,
-                "HAST": -36000,
-                "HST": -36000,
-                "SDT": -36000,
-                "SST": -39600,
-                "CHST": -36000
-            }
-            if isinstance(dt, str):
-                if dt is not None:
-                    if dt == "":
-                        dt = None
-                    else:
-                        dt = dateutil.parser.parse(dt, tzinfos=tzi)
-            elif isinstance(dt, struct_time):
-                tzkey = dt.tm_zone
-                if tzkey is None:
-                    tzkey = "EST"
-                    if dt.tm_mon > 7 and dt.tm_mon < 12:
-                        tzkey = "EDT"
-                dt = datetime(dt.tm_year, dt.tm_mon, dt.tm_mday,
-                              dt.tm_hour, dt.tm_min, dt.tm_sec,
-                              tzinfo=timezone(timedelta(seconds=tzi[tzkey]), tzkey))
-            return dt
-        switch = {
-            "int": int,
-            "float": float,
-            "datetime": dtparse
-        }
-        ent = self.getEntity(entityName)
-        if ent is not None:
-            for cname in datum:
-                if datum[cname] is not None:
-                    ctype = ent.columnType(cname)
-                    if ctype is not None:
-                        if ctype in switch:
-                            datum[cname] = switch[ctype](datum[cname])
+        plan = self._getCoercionPlan(entityName)
+        if plan is not None:
+            datum = plan.apply(datum)
         return datum
 
+    def _applyAttributeTypesAll(self, data : List[dict], entityName : str) -> List[dict]:
+        plan = self._getCoercionPlan(entityName)
+        if plan is not None:
+            with instr.span("coerce", entity=entityName):
+                data = plan.applyAll(data)
+        return data
+
+    def _getCoercionPlan(self, entityName : str) -> CoercionPlan:
+        if entityName not in self._coercion_plans:
+            plan = None
+            ent = self.getEntity(entityName)
+            if ent is not None:
+                plan = CoercionPlan(ent)
+            self._coercion_plans[entityName] = plan
+        return self._coercion_plans[entityName]
+
+    def _cursor(self, collection : AsyncIOMotorCollection, query : dict, projection : dict,
+                sort : list, limit : int):
+        cursor = collection.find(query, projection=projection)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def _invalidateMetadata(self, entityName: str = None):
+        if entityName is None:
+            self._collection_cache.clear()
+            self._primary_key_cache.clear()
+        else:
+            self._collection_cache.pop(entityName, None)
+            self._primary_key_cache.pop(entityName, None)
+
+    def _invalidateCache(self, entityName: str):
+        cache = self._query_caches.get(entityName)
+        if cache is not None:
+            cache.clear()
+
+    async def _entityWritten(self, entityName: str):
+        self._invalidateCache(entityName)
+        if self._track_versions:
+            try:
+                await self._database[VERSION_COLLECTION].update_one({"_id": entityName},
+                                                                    {"$inc": {"version": 1}},
+                                                                    upsert=True)
+            except PyMongoError as e:
+                logging.warning("Failed to increment {} version: {}".format(entityName, e))
+
     async def _getCollection(self, entityName: str) -> AsyncIOMotorCollection:
+        if entityName in self._collection_cache:
+            return self._collection_cache[entityName]
         db = self._database
         if len(await db.list_collection_names(filter={"name": entityName})) > 0:
             col = db[entityName]
@@ -161,18 +575,14 @@ class EntityManager:
             db.create_collection(entityName, codec_options=CodecOptions(tz_aware=True))
             col = db[entityName]
             await self._createCollectionIndices(col)
+        self._collection_cache[entityName] = col
         return col
 
     def _getCollectionIndices(self, entityName: str) -> List[IndexModel]:
         ixl = None
         ent = self.getEntity(entityName)
-        if ent is not None:
-            if len(ent.primaryKey) > 0:
-                ixl = [IndexModel([(k, ASCENDING) for k in ent.primaryKey], unique=True)]
-            if len(ent.indices) > 0:
-                if ixl is None:
-                    ixl = []
-                ixl.extend([IndexModel([(k, ASCENDING) for k in ent.indices])])
+        if ent is not None and len(ent.schema.indexSpecs) > 0:
+            ixl = [spec.toIndexModel() for spec in ent.schema.indexSpecs]
         return ixl
 
     async def _createCollectionIndices(self, collection : AsyncIOMotorCollection):
@@ -180,6 +590,11 @@ class EntityManager:
         if indices is not None:
             await collection.create_indexes(indices)
 
+    async def _getPrimaryKey(self, entityName: str, collection : AsyncIOMotorCollection) -> list:
+        if entityName not in self._primary_key_cache:
+            self._primary_key_cache[entityName] = await self._primaryKey(collection)
+        return self._primary_key_cache[entityName]
+
     async def _primaryKey(self, collection : AsyncIOMotorCollection) -> list:
         cnames = ["_id"]
         allxcnames = []
@@ -200,6 +615,42 @@ class EntityManager:
             cnames = allxcnames[fi[0]]
         return cnames
 
+    async def _bulkWrite(self, collection : AsyncIOMotorCollection, batch : List[tuple], pkeys : List[str], rslt : dict):
+        reqs = [ReplaceOne(q, datum, upsert=True) for datum, q in batch]
+        with instr.span("db.bulk_write", entity=collection.name):
+            bwr = await collection.bulk_write(reqs, ordered=False)
+        instr.count("round_trips", entity=collection.name, op="bulk_write")
+        instr.count("docs_written", bwr.modified_count + bwr.upserted_count, entity=collection.name)
+        rslt["matched"] += bwr.matched_count
+        rslt["modified"] += bwr.modified_count
+        rslt["upserted"] += bwr.upserted_count
+        if rslt["data"] is not None:
+            instr.count("round_trips", entity=collection.name, op="reread")
+            # Key the re-read documents by every column set used to
+            # build the batch queries so each record finds its document
+            colsets = set([tuple(sorted(self._queryColumns(q))) for _, q in batch])
+            saved = {}
+            async for doc in collection.find(self._buildQuery([datum for datum, _ in batch], pkeys)):
+                for cols in colsets:
+                    if all([c in doc for c in cols]):
+                        saved[self._recordKey(self._buildQueryItem(doc, cols))] = doc
+            for datum, q in batch:
+                rslt["data"].append(saved.get(self._recordKey(q), datum))
+
+    def _queryColumns(self, q : dict) -> List[str]:
+        if "$and" in q:
+            return [list(c.keys())[0] for c in q["$and"]]
+        return list(q.keys())
+
+    def _recordKey(self, q : dict) -> tuple:
+        """Get a hashable key for a query built by _buildQueryItem"""
+        if "$and" in q:
+            items = [list(c.items())[0] for c in q["$and"]]
+        else:
+            items = list(q.items())
+        items.sort(key=lambda t: t[0])
+        return tuple([(k, util.freeze(v)) for k, v in items])
+
     def _buildQuery(self, data : List[dict], colnames : List[str]) -> List[dict]:
         q = [self._buildQueryItem(rec, colnames) for rec in data]
         if len(q) > 1:
@@ -225,6 +676,8 @@ class EntityManager:
     
     @property
     def _database(self) -> AsyncIOMotorDatabase:
+        if self._backend is not None:
+            return self._backend.database
         if self._db is None:
             try:
                 self._db = self._connection[self._db_name]
@@ -235,6 +688,8 @@ class EntityManager:
         return self._db
 
     def _connect(self):
+        if self._backend is not None:
+            return
         curi = f"mongodb://{self._db_user}:{self._db_user_pwd}@{self._db_host}:{self._db_port}/{self._db_auth_name}?retrywrites=false&maxIdleTimeMS=120000"
         if self._ssl:
             curi = f"{curi}&ssl=true"
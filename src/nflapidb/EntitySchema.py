@@ -0,0 +1,101 @@
+from typing import Dict, Tuple
+from types import MappingProxyType
+import inspect
+from nflapidb.IndexSpec import IndexSpec
+
+class EntitySchema:
+    """The column metadata of an Entity class
+
+    A schema is compiled once per Entity class from its decorated
+    column methods and is immutable, so it is shared by every
+    instance of the class and every EntityManager.
+    """
+
+    def __init__(self, primaryKey : Tuple[str], columns : Dict[str, str],
+                 indices : Tuple[str], indexSpecs : Tuple[IndexSpec]):
+        self._primary_key = tuple(primaryKey)
+        self._columns = MappingProxyType(dict(columns))
+        self._indices = tuple(indices)
+        self._index_specs = tuple(indexSpecs)
+        self._primary_key_set = frozenset(self._primary_key)
+        self._column_names = frozenset(self._columns.keys())
+        self._index_set = frozenset(self._indices)
+
+    @property
+    def primaryKey(self) -> Tuple[str]:
+        """The primary key column names in declaration order"""
+        return self._primary_key
+
+    @property
+    def primaryKeySet(self) -> frozenset:
+        return self._primary_key_set
+
+    @property
+    def columns(self) -> MappingProxyType:
+        """A read only column name to column type mapping"""
+        return self._columns
+
+    @property
+    def columnNames(self) -> frozenset:
+        return self._column_names
+
+    @property
+    def indices(self) -> Tuple[str]:
+        """The indexed column names in declaration order"""
+        return self._indices
+
+    @property
+    def indexSet(self) -> frozenset:
+        return self._index_set
+
+    @property
+    def indexSpecs(self) -> Tuple[IndexSpec]:
+        """All of the collection indexes
+
+        These are a unique index on the primary key, a single
+        column index for each Index column and the indexes
+        declared by the Entity class indexes attribute.
+        """
+        return self._index_specs
+
+    def columnType(self, cname : str) -> str:
+        return self._columns.get(cname)
+
+    @staticmethod
+    def compile(entity : object) -> "EntitySchema":
+        """Compile the schema of the class of entity
+
+        Only the methods defined by the class itself are considered,
+        as was always the case for Entity. The column methods are
+        called with entity to get the column types.
+        """
+        pkey = []
+        columns = {}
+        indices = []
+        for attr in getattr(entity.__class__, "__dict__").values():
+            if not inspect.isfunction(attr):
+                continue
+            decorators = _decorators(attr)
+            if "PrimaryKey" in decorators:
+                pkey.append(attr.__name__)
+            if "Index" in decorators:
+                indices.append(attr.__name__)
+            if len(decorators & _COLUMN_DECORATORS) > 0:
+                columns[attr.__name__] = attr(entity)
+        specs = []
+        if len(pkey) > 0:
+            specs.append(IndexSpec(pkey, unique=True))
+        specs.extend([IndexSpec([_]) for _ in indices])
+        specs.extend(getattr(entity, "indexes", []))
+        names = [_.name for _ in specs]
+        if len(set(names)) != len(names):
+            raise ValueError("{} declares duplicate index names".format(entity.__class__.__name__))
+        return EntitySchema(pkey, columns, indices, specs)
+
+_COLUMN_DECORATORS = frozenset(["Column", "PrimaryKey", "Index"])
+
+def _decorators(f : callable) -> frozenset:
+    d = frozenset()
+    if hasattr(f, "decorators"):
+        d = frozenset(getattr(f, "decorators").split(","))
+    return d
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import logging
 from nflapidb.ScheduleDependantManagerFacade import ScheduleDependantManagerFacade
 import nflapi.Client
@@ -20,6 +20,16 @@ class GameDriveManagerFacade(ScheduleDependantManagerFacade):
                                                               gsis_ids=gsis_ids,
                                                               drive_ids=drive_ids)
 
+    def stream(self, qm : QueryModel = None,
+               gsis_ids : List[str] = None,
+               drive_ids : List[str] = None,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(GameDriveManagerFacade, self).stream(qm=qm,
+                                                          gsis_ids=gsis_ids,
+                                                          drive_ids=drive_ids,
+                                                          batchSize=batchSize,
+                                                          chunkSize=chunkSize)
+
     async def delete(self, qm : QueryModel = None, gsis_ids : List[str] = None) -> List[dict]:
         return await super(GameDriveManagerFacade, self).delete(qm=qm, gsis_ids=gsis_ids)
 
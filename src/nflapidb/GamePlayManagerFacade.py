@@ -1,4 +1,5 @@
-from typing import List
+from typing import List, AsyncIterator
+import copy
 import logging
 import nflapi.Client
 from nflapidb.EntityManager import EntityManager
@@ -8,6 +9,7 @@ from nflapidb.RosterManagerFacade import RosterManagerFacade
 from nflapidb.TeamManagerFacade import TeamManagerFacade
 import nflapidb.Utilities as util
 from nflapidb.QueryModel import QueryModel
+from nflapidb.ArrowExport import ArrowTableBuilder, ParquetPartitionWriter, requireArrow
 
 class GamePlayManagerFacade(PlayerSchedDepManagerFacade):
 
@@ -31,6 +33,91 @@ class GamePlayManagerFacade(PlayerSchedDepManagerFacade):
                                                              stat_ids=stat_ids,
                                                              stat_cats=stat_cats)
 
+    def stream(self, qm : QueryModel = None,
+               gsis_ids : List[str] = None,
+               player_ids : List[str] = None,
+               profile_ids : List[str] = None,
+               stat_ids : List[int] = None,
+               stat_cats : List[str] = None,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(GamePlayManagerFacade, self).stream(qm=qm,
+                                                         gsis_ids=gsis_ids,
+                                                         player_ids=player_ids,
+                                                         profile_ids=profile_ids,
+                                                         stat_ids=stat_ids,
+                                                         stat_cats=stat_cats,
+                                                         batchSize=batchSize,
+                                                         chunkSize=chunkSize)
+
+    async def toArrow(self, qm : QueryModel = None, chunkSize : int = 10000):
+        """Get the plays as an Arrow table
+
+        The plays are streamed from the database chunkSize at a time
+        and converted to dictionary encoded Arrow columns, typed by
+        the game_play entity. The season, season_type and week of
+        each play's game are added as columns. Requires pyarrow.
+
+        Parameters
+        ----------
+        qm : QueryModel
+            The plays to get, all plays if None
+        chunkSize : int
+            The number of plays converted at a time
+
+        Returns
+        -------
+        pyarrow.Table
+        """
+        requireArrow()
+        smap = await self._getScheduleWeekMap()
+        builder = ArrowTableBuilder(self._entityManager.getEntity(self._entity_name))
+        async for chunk in self.stream(qm=qm, chunkSize=chunkSize):
+            builder.add(self._addScheduleWeek(chunk, smap))
+        return builder.build()
+
+    async def exportParquet(self, path : str, qm : QueryModel = None,
+                            partitionBy : List[str] = None, chunkSize : int = 10000) -> List[str]:
+        """Write the plays to a partitioned Parquet dataset
+
+        The dataset is hive partitioned, by season, season_type and
+        week unless partitionBy is given, e.g.
+        path/season=2019/season_type=regular_season/week=13, so it
+        can be read with pandas, pyarrow.dataset or DuckDB
+        read_parquet(..., hive_partitioning=1). Plays are read in
+        gsis_id order, unless qm is ordered, so only one week of
+        plays is held in memory at a time. Requires pyarrow.
+
+        Parameters
+        ----------
+        path : str
+            The dataset root directory
+        qm : QueryModel
+            The plays to export, all plays if None
+        partitionBy : list of str
+            Any of season, season_type and week
+        chunkSize : int
+            The number of plays converted at a time
+
+        Returns
+        -------
+        list of str
+            The paths of the files written
+        """
+        requireArrow()
+        if partitionBy is None:
+            # preseason and regular season weeks share their numbers
+            partitionBy = ["season", "season_type", "week"]
+        if qm is None:
+            qm = QueryModel()
+        if qm.ordering is None:
+            qm = copy.deepcopy(qm).orderBy("gsis_id")
+        smap = await self._getScheduleWeekMap()
+        writer = ParquetPartitionWriter(path, partitionBy, self._entityManager.getEntity(self._entity_name))
+        async for chunk in self.stream(qm=qm, chunkSize=chunkSize):
+            writer.add(self._addScheduleWeek(chunk, smap))
+        writer.flush()
+        return writer.files
+
     async def delete(self, gsis_ids : List[str] = None,
                      player_ids : List[str] = None,
                      profile_ids : List[str] = None) -> List[dict]:
@@ -38,6 +125,20 @@ class GamePlayManagerFacade(PlayerSchedDepManagerFacade):
                                                                player_ids=player_ids,
                                                                profile_ids=profile_ids)
 
+    async def _getScheduleWeekMap(self) -> dict:
+        smap = {}
+        for sch in await self._scheduleManager.find():
+            smap[sch["gsis_id"]] = {"season": sch.get("season"),
+                                    "season_type": sch.get("season_type"),
+                                    "week": sch.get("week")}
+        return smap
+
+    def _addScheduleWeek(self, plays : List[dict], smap : dict) -> List[dict]:
+        for play in plays:
+            if play["gsis_id"] in smap:
+                play.update(smap[play["gsis_id"]])
+        return plays
+
     def _queryAPI(self, schedules : List[dict]) -> List[dict]:
         logging.info("Retrieving {} data from NFL API...".format(self._entity_name))
         return self._apiClient.getGamePlay(schedules)
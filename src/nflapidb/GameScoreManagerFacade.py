@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import logging
 from nflapidb.ScheduleDependantManagerFacade import ScheduleDependantManagerFacade
 import nflapi.Client
@@ -18,6 +18,14 @@ class GameScoreManagerFacade(ScheduleDependantManagerFacade):
         return await super(GameScoreManagerFacade, self).find(qm=qm,
                                                               gsis_ids=gsis_ids)
 
+    def stream(self, qm : QueryModel = None,
+               gsis_ids : List[str] = None,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(GameScoreManagerFacade, self).stream(qm=qm,
+                                                          gsis_ids=gsis_ids,
+                                                          batchSize=batchSize,
+                                                          chunkSize=chunkSize)
+
     async def delete(self, qm : QueryModel = None, gsis_ids : List[str] = None) -> List[dict]:
         return await super(GameScoreManagerFacade, self).delete(qm=qm, gsis_ids=gsis_ids)
 
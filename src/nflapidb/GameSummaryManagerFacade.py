@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import logging
 import nflapi.Client
 from nflapidb.EntityManager import EntityManager
@@ -27,6 +27,18 @@ class GameSummaryManagerFacade(PlayerSchedDepManagerFacade):
                                                                 player_ids=player_ids,
                                                                 profile_ids=profile_ids)
 
+    def stream(self, qm : QueryModel = None,
+               gsis_ids : List[str] = None,
+               player_ids : List[str] = None,
+               profile_ids : List[str] = None,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(GameSummaryManagerFacade, self).stream(qm=qm,
+                                                            gsis_ids=gsis_ids,
+                                                            player_ids=player_ids,
+                                                            profile_ids=profile_ids,
+                                                            batchSize=batchSize,
+                                                            chunkSize=chunkSize)
+
     async def delete(self, gsis_ids : List[str] = None,
                      player_ids : List[str] = None,
                      profile_ids : List[str] = None) -> List[dict]:
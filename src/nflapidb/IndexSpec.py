@@ -0,0 +1,83 @@
+from typing import Any, List, Tuple
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+class IndexSpec:
+    """The declaration of an entity collection index
+
+    Parameters
+    ----------
+    columns : list
+        The indexed column names in order, each optionally given
+        as a (name, direction) tuple, the direction being
+        pymongo.ASCENDING (the default) or pymongo.DESCENDING.
+        Array valued columns, e.g. previous_teams, result in a
+        multikey index.
+    name : str
+        The index name, defaults to the MongoDB generated name,
+        e.g. team_1_gsis_id_1
+    unique : bool
+        If True the indexed values must be unique
+    partialFilterExpression : dict
+        Only index the documents matching this filter, e.g.
+        {"profile_id": {"$exists": True}}. MongoDB does not allow
+        a filter on a missing field, i.e. $exists False.
+    """
+
+    def __init__(self, columns : List[Any], name : str = None, unique : bool = False,
+                 partialFilterExpression : dict = None):
+        key = []
+        for col in columns:
+            if isinstance(col, str):
+                col = (col, ASCENDING)
+            if col[1] not in (ASCENDING, DESCENDING):
+                raise ValueError("index direction of {} must be ASCENDING or DESCENDING".format(col[0]))
+            key.append((col[0], col[1]))
+        if len(key) == 0:
+            raise ValueError("an index must have at least one column")
+        self._key = tuple(key)
+        if name is None:
+            name = "_".join(["{}_{}".format(c, d) for c, d in self._key])
+        self._name = name
+        self._unique = unique
+        self._partial_filter = partialFilterExpression
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def key(self) -> Tuple[Tuple[str, int]]:
+        return self._key
+
+    @property
+    def columnNames(self) -> Tuple[str]:
+        return tuple([c for c, _ in self._key])
+
+    @property
+    def unique(self) -> bool:
+        return self._unique
+
+    @property
+    def partialFilterExpression(self) -> dict:
+        return self._partial_filter
+
+    def toIndexModel(self, **kwargs) -> IndexModel:
+        """Get the pymongo IndexModel, kwargs are extra index options"""
+        kwargs["name"] = self._name
+        if self._unique:
+            kwargs["unique"] = True
+        if self._partial_filter is not None:
+            kwargs["partialFilterExpression"] = self._partial_filter
+        return IndexModel(list(self._key), **kwargs)
+
+    def __eq__(self, other : Any) -> bool:
+        return isinstance(other, IndexSpec) and self._key == other._key \
+               and self._name == other._name and self._unique == other._unique \
+               and self._partial_filter == other._partial_filter
+
+    def __hash__(self) -> int:
+        return hash((self._key, self._name))
+
+    def __repr__(self) -> str:
+        return "IndexSpec({}, name={}, unique={}, partialFilterExpression={})".format(
+            list(self._key), self._name, self._unique, self._partial_filter)
@@ -0,0 +1,244 @@
+"""Timing spans and counters of the nflapidb operations
+
+The EntityManager reads and writes, the NFL API requests, the type
+coercion and the profile id resolution record spans, the time taken
+by each call, and counters, e.g. docs_read, through the sink set by
+setSink. Nothing is recorded until a sink is set, and the calls made
+meanwhile only check that there is none.
+
+    registry = MetricsRegistry()
+    setSink(registry)
+    await client.sync()
+    print(toPrometheusText(registry))
+"""
+from typing import Any, Dict, List, Tuple
+import abc
+from abc import abstractmethod
+import re
+import json
+import time
+import logging
+import threading
+
+# The upper bounds in seconds of the span histogram buckets
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+__sink__ = None
+
+class MetricsSink(abc.ABC):
+    """Receives the spans and counters as they are recorded"""
+
+    @abstractmethod
+    def recordSpan(self, name : str, seconds : float, tags : Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def recordCount(self, name : str, value : float, tags : Dict[str, Any]):
+        pass
+
+def setSink(sink : MetricsSink):
+    """Send the spans and counters to sink, or stop recording them if None"""
+    global __sink__
+    __sink__ = sink
+
+def getSink() -> MetricsSink:
+    return __sink__
+
+def enabled() -> bool:
+    return __sink__ is not None
+
+def span(name : str, **tags) -> Any:
+    """Get a context manager recording the time spent within it
+
+    If it is left with an exception the span is tagged with
+    error set to the exception type name.
+    """
+    if __sink__ is None:
+        return _NO_SPAN
+    return _Span(__sink__, name, tags)
+
+def count(name : str, value : float = 1, **tags):
+    if __sink__ is not None:
+        __sink__.recordCount(name, value, tags)
+
+class _Span:
+    __slots__ = ("_sink", "_name", "_tags", "_start")
+
+    def __init__(self, sink : MetricsSink, name : str, tags : Dict[str, Any]):
+        self._sink = sink
+        self._name = name
+        self._tags = tags
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        seconds = time.perf_counter() - self._start
+        if excType is not None:
+            self._tags["error"] = excType.__name__
+        self._sink.recordSpan(self._name, seconds, self._tags)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def _tagsKey(tags : Dict[str, Any]) -> Tuple[tuple, ...]:
+    return tuple(sorted([(k, str(v)) for k, v in tags.items()]))
+
+class MetricsRegistry(MetricsSink):
+    """Aggregate the spans and counters in memory
+
+    The counters are summed and the spans are kept as histograms, per
+    name and set of tags, to be exported by toPrometheusText or read
+    with snapshot.
+
+    Parameters
+    ----------
+    buckets : tuple of float
+        The upper bounds in seconds of the span histogram buckets
+    """
+
+    def __init__(self, buckets : Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def recordSpan(self, name : str, seconds : float, tags : Dict[str, Any]):
+        key = (name, _tagsKey(tags))
+        with self._lock:
+            hist = self._spans.get(key)
+            if hist is None:
+                hist = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets)}
+                self._spans[key] = hist
+            hist["count"] += 1
+            hist["sum"] += seconds
+            hist["max"] = max(hist["max"], seconds)
+            for i, le in enumerate(self.buckets):
+                if seconds <= le:
+                    hist["buckets"][i] += 1
+                    break
+
+    def recordCount(self, name : str, value : float, tags : Dict[str, Any]):
+        key = (name, _tagsKey(tags))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def counter(self, name : str, **tags) -> float:
+        """Get the total of a counter, summed over its tags not given"""
+        want = set(_tagsKey(tags))
+        with self._lock:
+            return sum([v for (n, t), v in self._counters.items() if n == name and want.issubset(t)])
+
+    def snapshot(self) -> dict:
+        """Get copies of the counters and span histograms
+
+        Returns
+        -------
+        dict
+            counters and spans, lists of dicts with the name, tags and
+            the value or the count, sum, max and per bucket counts
+        """
+        with self._lock:
+            counters = [{"name": n, "tags": dict(t), "value": v} for (n, t), v in sorted(self._counters.items())]
+            spans = [dict(h, name=n, tags=dict(t), buckets=list(h["buckets"]))
+                     for (n, t), h in sorted(self._spans.items())]
+        return {"counters": counters, "spans": spans}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+
+class LogSink(MetricsSink):
+    """Log each span and counter as a json object
+
+    Parameters
+    ----------
+    logger : logging.Logger
+        The logger, nflapidb.metrics by default
+    level : int
+        The level the records are logged at
+    """
+
+    def __init__(self, logger : logging.Logger = None, level : int = logging.INFO):
+        self._logger = logging.getLogger("nflapidb.metrics") if logger is None else logger
+        self._level = level
+
+    def recordSpan(self, name : str, seconds : float, tags : Dict[str, Any]):
+        if self._logger.isEnabledFor(self._level):
+            self._log(dict(tags, metric=name, type="span", seconds=seconds))
+
+    def recordCount(self, name : str, value : float, tags : Dict[str, Any]):
+        if self._logger.isEnabledFor(self._level):
+            self._log(dict(tags, metric=name, type="count", value=value))
+
+    def _log(self, event : dict):
+        self._logger.log(self._level, json.dumps(event, sort_keys=True, default=str))
+
+class TeeSink(MetricsSink):
+    """Send the spans and counters to each of several sinks"""
+
+    def __init__(self, sinks : List[MetricsSink]):
+        self._sinks = list(sinks)
+
+    def recordSpan(self, name : str, seconds : float, tags : Dict[str, Any]):
+        for sink in self._sinks:
+            sink.recordSpan(name, seconds, tags)
+
+    def recordCount(self, name : str, value : float, tags : Dict[str, Any]):
+        for sink in self._sinks:
+            sink.recordCount(name, value, tags)
+
+def toPrometheusText(registry : MetricsRegistry, prefix : str = "nflapidb") -> str:
+    """Get the metrics of registry in the Prometheus text format
+
+    A counter is exported as <prefix>_<name>_total and a span as the
+    histogram <prefix>_<name>_seconds, with the tags as labels.
+    """
+    snap = registry.snapshot()
+    lines = []
+    typed = set()
+    for c in snap["counters"]:
+        mname = _metricName(prefix, c["name"]) + "_total"
+        if mname not in typed:
+            lines.append(f"# TYPE {mname} counter")
+            typed.add(mname)
+        lines.append(f"{mname}{_labels(c['tags'])} {_number(c['value'])}")
+    for s in snap["spans"]:
+        mname = _metricName(prefix, s["name"]) + "_seconds"
+        if mname not in typed:
+            lines.append(f"# TYPE {mname} histogram")
+            typed.add(mname)
+        cum = 0
+        for le, n in zip(registry.buckets, s["buckets"]):
+            cum += n
+            lines.append(f"{mname}_bucket{_labels(s['tags'], le=_number(le))} {cum}")
+        lines.append(f"{mname}_bucket{_labels(s['tags'], le='+Inf')} {s['count']}")
+        lines.append(f"{mname}_sum{_labels(s['tags'])} {_number(s['sum'])}")
+        lines.append(f"{mname}_count{_labels(s['tags'])} {s['count']}")
+    return "\n".join(lines) + "\n" if len(lines) > 0 else ""
+
+def _metricName(prefix : str, name : str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}_{name}" if prefix else name)
+
+def _labels(tags : Dict[str, Any], **extra) -> str:
+    items = sorted(tags.items()) + list(extra.items())
+    if len(items) == 0:
+        return ""
+    def escape(v : Any) -> str:
+        return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join([f'{re.sub(r"[^a-zA-Z0-9_]", "_", k)}="{escape(v)}"' for k, v in items]) + "}"
+
+def _number(v : float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
@@ -0,0 +1,316 @@
+from typing import Any, List, Set
+import itertools
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+import nflapidb.Utilities as util
+import nflapidb.QueryEvaluator as qe
+from nflapidb.StorageBackend import StorageBackend
+from nflapidb.BackendCollection import BackendCollection
+
+# The most index keys a query may expand to before the planner
+# prefers scanning the collection over looking each one up
+_MAX_LOOKUP_KEYS = 1000
+
+# The databases shared by MemoryBackend.shared keyed by name
+__shared_databases__ = {}
+
+def _copy(v : Any) -> Any:
+    # Documents only nest dicts and lists, everything else stored in
+    # them is immutable, so this is much cheaper than deepcopy
+    if isinstance(v, dict):
+        return dict([(k, _copy(i)) for k, i in v.items()])
+    if isinstance(v, list):
+        return [_copy(i) for i in v]
+    return v
+
+class MemoryBackend(StorageBackend):
+    """Keep the entities in process memory
+
+    Queries are evaluated by QueryEvaluator and the indexes declared
+    by the entities are kept as hash indexes, which are used to find
+    the documents matching equality and $in constraints, including
+    those of each branch of an $or. Unique indexes are enforced.
+    Nothing is persisted, so this is meant for tests, benchmarks and
+    profiling the facades without a server.
+
+    Parameters
+    ----------
+    dbName : str
+        The name of the database
+    """
+
+    def __init__(self, dbName : str = "nflapidb"):
+        self._db = MemoryDatabase(dbName)
+
+    @staticmethod
+    def shared(dbName : str = "nflapidb") -> "MemoryBackend":
+        """Get a backend on the database of this name shared by the process
+
+        Like databases on a server, the data saved through one
+        EntityManager is then seen by every other using the name.
+        """
+        if dbName not in __shared_databases__:
+            __shared_databases__[dbName] = MemoryDatabase(dbName)
+        backend = MemoryBackend(dbName)
+        backend._db = __shared_databases__[dbName]
+        return backend
+
+    @property
+    def database(self) -> "MemoryDatabase":
+        return self._db
+
+class MemoryDatabase:
+    """The in memory counterpart of AsyncIOMotorDatabase"""
+
+    def __init__(self, name : str):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name : str) -> "MemoryCollection":
+        return self.get_collection(name)
+
+    def get_collection(self, name : str, **kwargs) -> "MemoryCollection":
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def create_collection(self, name : str, **kwargs) -> "MemoryCollection":
+        col = self.get_collection(name)
+        col._created = True
+        return col
+
+    async def list_collection_names(self, filter : dict = None, **kwargs) -> List[str]:
+        names = [name for name, col in self._collections.items() if col._exists]
+        if filter is not None:
+            pred = qe.compileFilter(filter)
+            names = [name for name in names if pred({"name": name})]
+        return names
+
+    async def drop_collection(self, nameOrCollection : Any):
+        name = nameOrCollection if isinstance(nameOrCollection, str) else nameOrCollection.name
+        col = self._collections.pop(name, None)
+        if col is not None:
+            col._reset()
+
+    def watch(self, pipeline : List[dict] = None, **kwargs):
+        # as on a standalone server, so that CacheWatcher polls
+        raise OperationFailure("change streams are not supported by the memory backend")
+
+class _HashIndex:
+    """A hash index of a MemoryCollection
+
+    Array values are indexed by each element, as in MongoDB multikey
+    indexes, and also as a whole so that equality with an array can
+    be looked up. A missing field is indexed as None.
+    """
+
+    def __init__(self, model : IndexModel):
+        doc = model.document
+        self.name = doc["name"]
+        self.key = list(doc["key"].items())
+        self.fields = [f for f, _ in self.key]
+        self.unique = bool(doc.get("unique", False))
+        self.partialFilterExpression = doc.get("partialFilterExpression")
+        self._partial = None if self.partialFilterExpression is None \
+                        else qe.compileFilter(self.partialFilterExpression)
+        self._entries = {}
+        self._doc_keys = {}
+
+    @property
+    def info(self) -> dict:
+        info = {"v": 2, "key": list(self.key)}
+        if self.unique:
+            info["unique"] = True
+        if self.partialFilterExpression is not None:
+            info["partialFilterExpression"] = self.partialFilterExpression
+        return info
+
+    def add(self, docKey : Any, doc : dict):
+        keys = self._keys(doc, True)
+        self._doc_keys[docKey] = keys
+        for k in keys:
+            self._entries.setdefault(k, set()).add(docKey)
+
+    def remove(self, docKey : Any):
+        for k in self._doc_keys.pop(docKey, []):
+            ids = self._entries[k]
+            ids.discard(docKey)
+            if len(ids) == 0:
+                del self._entries[k]
+
+    def conflicts(self, docKey : Any, doc : dict) -> bool:
+        """True if doc would violate the uniqueness of this index"""
+        if not self.unique:
+            return False
+        for k in self._keys(doc, False):
+            ids = self._entries.get(k)
+            if ids is not None and len(ids - {docKey}) > 0:
+                return True
+        return False
+
+    def lookup(self, constraints : dict) -> Set[Any]:
+        """Get the keys of the documents that may match constraints
+
+        None is returned if the index cannot be used, i.e. a field of
+        the index is not constrained, the constraints expand to too
+        many keys, or the index is partial and so may not hold every
+        matching document.
+        """
+        if self._partial is not None or not all([f in constraints for f in self.fields]):
+            return None
+        values = [constraints[f] for f in self.fields]
+        n = 1
+        for v in values:
+            n *= len(v)
+        if n > _MAX_LOOKUP_KEYS:
+            return None
+        ids = set()
+        for k in itertools.product(*values):
+            ids.update(self._entries.get(tuple([util.freeze(v) for v in k]), ()))
+        return ids
+
+    def _keys(self, doc : dict, whole : bool) -> List[tuple]:
+        if self._partial is not None and not self._partial(doc):
+            return []
+        fkeys = []
+        for f in self.fields:
+            keys = set()
+            values = qe.resolve(doc, f)
+            if len(values) == 0:
+                keys.add(None)
+            for v in values:
+                if isinstance(v, list):
+                    keys.update([util.freeze(e) for e in v])
+                    if whole or len(v) == 0:
+                        keys.add(util.freeze(v))
+                else:
+                    keys.add(util.freeze(v))
+            fkeys.append(keys)
+        return [tuple(k) for k in itertools.product(*fkeys)]
+
+class MemoryCollection(BackendCollection):
+    """The in memory counterpart of AsyncIOMotorCollection"""
+
+    def __init__(self, database : MemoryDatabase, name : str):
+        super(MemoryCollection, self).__init__(database, name)
+        self._created = False
+        self._reset()
+
+    @property
+    def _exists(self) -> bool:
+        return self._created or len(self._docs) > 0 or len(self._indexes) > 0
+
+    def _reset(self):
+        self._docs = {}
+        self._seq = {}
+        self._next_seq = 0
+        self._indexes = {}
+
+    async def index_information(self) -> dict:
+        info = {"_id_": {"v": 2, "key": [("_id", 1)]}}
+        for name, ix in self._indexes.items():
+            info[name] = ix.info
+        return info
+
+    async def create_indexes(self, indexes : List[IndexModel], **kwargs) -> List[str]:
+        names = []
+        for model in indexes:
+            ix = _HashIndex(model)
+            current = self._indexes.get(ix.name)
+            if current is not None:
+                if current.info != ix.info:
+                    raise OperationFailure("Index with name: {} already exists with different options".format(ix.name))
+            else:
+                for key, doc in self._docs.items():
+                    if ix.conflicts(key, doc):
+                        raise DuplicateKeyError("E11000 duplicate key error building index {}".format(ix.name), 11000)
+                    ix.add(key, doc)
+                self._indexes[ix.name] = ix
+            names.append(ix.name)
+        return names
+
+    def _dropIndex(self, name : str):
+        del self._indexes[name]
+
+    def _export(self, doc : dict) -> dict:
+        # the stored documents must not be changed by the caller
+        return _copy(doc)
+
+    def _select(self, filter : dict, limit : int = None) -> List[dict]:
+        keys = None if filter is None else self._matchKeys(filter)
+        if keys is not None:
+            # present the documents in insertion order, as a scan would
+            docs = [self._docs[k] for k in sorted(keys, key=self._seq.__getitem__)]
+            return docs if limit is None else docs[:limit]
+        pred = qe.compileFilter(filter)
+        docs = []
+        for doc in self._docs.values():
+            if pred(doc):
+                docs.append(doc)
+                if limit is not None and len(docs) >= limit:
+                    break
+        return docs
+
+    def _matchKeys(self, filter : dict) -> Set[Any]:
+        """Get the keys of the documents matching filter using the indexes
+
+        None is returned if no index can narrow the documents down, in
+        which case every document has to be checked. An $or can use
+        the indexes when each of its branches can, and each branch is
+        then only checked against the documents found for it.
+        """
+        keys = self._lookup(qe.equalityConstraints(filter))
+        if keys is not None:
+            pred = qe.compileFilter(filter)
+            return set([k for k in keys if pred(self._docs[k])])
+        if "$or" in filter:
+            pred = qe.compileFilter(dict([(k, v) for k, v in filter.items() if k != "$or"]))
+            matched = set()
+            for branch in filter["$or"]:
+                bkeys = self._matchKeys(branch)
+                if bkeys is None:
+                    return None
+                matched.update([k for k in bkeys if k not in matched and pred(self._docs[k])])
+            return matched
+        return None
+
+    def _lookup(self, constraints : dict) -> Set[Any]:
+        if "_id" in constraints:
+            return set([k for k in [util.freeze(v) for v in constraints["_id"]] if k in self._docs])
+        best = None
+        for ix in self._indexes.values():
+            keys = ix.lookup(constraints)
+            if keys is not None and (best is None or len(keys) < len(best)):
+                best = keys
+        return best
+
+    def _insert(self, doc : dict):
+        key = util.freeze(doc["_id"])
+        if key in self._docs:
+            raise DuplicateKeyError("E11000 duplicate key error collection: {} index: _id_".format(self.name), 11000)
+        self._checkUnique(key, doc)
+        self._docs[key] = doc
+        self._seq[key] = self._next_seq
+        self._next_seq += 1
+        for ix in self._indexes.values():
+            ix.add(key, doc)
+
+    def _replace(self, doc : dict):
+        key = util.freeze(doc["_id"])
+        self._checkUnique(key, doc)
+        for ix in self._indexes.values():
+            ix.remove(key)
+            ix.add(key, doc)
+        self._docs[key] = doc
+
+    def _remove(self, docId : Any):
+        key = util.freeze(docId)
+        for ix in self._indexes.values():
+            ix.remove(key)
+        del self._docs[key]
+        del self._seq[key]
+
+    def _checkUnique(self, key : Any, doc : dict):
+        for ix in self._indexes.values():
+            if ix.conflicts(key, doc):
+                raise DuplicateKeyError("E11000 duplicate key error collection: {} index: {}".format(self.name, ix.name), 11000)
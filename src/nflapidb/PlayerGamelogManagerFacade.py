@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import datetime
 import logging
 import nflapi.Client
@@ -21,8 +21,29 @@ class PlayerGamelogManagerFacade(DataManagerFacade):
         self._min_sync_season = None
         self._current_season = None
         self._last_process_date = None
+        self._season_concurrency = 3
 
-    async def sync(self, all : bool = False) -> List[dict]:
+    async def sync(self, all : bool = False, collect : bool = True) -> List[dict]:
+        """Retrieve and save the player gamelogs
+
+        The seasons are requested concurrently, at most
+        seasonConcurrency at a time, and each season is saved, in
+        season order, as soon as it is retrieved.
+
+        Parameters
+        ----------
+        all : bool
+            If True retrieve every season for every roster
+        collect : bool
+            If False the saved records are not accumulated and an
+            empty list is returned, keeping memory bounded by the
+            number of seasons in flight
+
+        Returns
+        -------
+        list of dict
+            The saved records
+        """
         logging.info("Syncing player gamelog data...")
         rmgr = self._rosterManager
         recs = await rmgr.find()
@@ -36,17 +57,29 @@ class PlayerGamelogManagerFacade(DataManagerFacade):
             else:
                 mnseason = await self._minSyncSeason()
             mxseason = self._currentSeason
-            for season in range(mnseason, mxseason + 1):
+            def getSeasonGameLog(season : int) -> List[dict]:
                 logging.info("Retrieving player gamelogs for {rcnt} rosters for {ssn} season from NFL API...".format(rcnt=len(recs), ssn=season))
-                gl.extend(self._addRosterData(self._apiClient.getPlayerGameLog(rosters=recs, season=season), recs))
-            await self.save(gl)
+                return self._apiClient.getPlayerGameLog(rosters=recs, season=season)
+            seasons = list(range(mnseason, mxseason + 1))
+            # The team history is read before any season is saved so
+            # that the later seasons are not compared with the teams
+            # this sync has already saved
+            history = await self._findTeamHistory(list(__makeProfileIdMap__(recs).keys()))
+            async for season, gmlogs in self._iterAPIChunks(getSeasonGameLog, seasons, self._season_concurrency):
+                gmlogs = await self._save(self._addRosterData(gmlogs, recs), history)
+                if collect:
+                    gl.extend(gmlogs)
+                logging.info("Player gamelogs saved for {ssn} season".format(ssn=season))
             await self._updateDataExpired()
         return gl
 
     async def save(self, data : List[dict]) -> List[dict]:
+        return await self._save(data)
+
+    async def _save(self, data : List[dict], history : List[dict] = None) -> List[dict]:
         logging.info("Saving player gamelog data...")
         if len(data) > 0:
-            cdata = await self._setPreviousTeams(data)
+            cdata = await self._setPreviousTeams(data, history)
             data = await super(PlayerGamelogManagerFacade, self).save(cdata)
         return data
 
@@ -61,6 +94,20 @@ class PlayerGamelogManagerFacade(DataManagerFacade):
                                                                   profile_ids=profile_ids,
                                                                   include_previous_teams=include_previous_teams)
 
+    def stream(self, teams : List[str] = None,
+               last_names : List[str] = None,
+               first_names : List[str] = None,
+               profile_ids : List[int] = None,
+               include_previous_teams : bool = False,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(PlayerGamelogManagerFacade, self).stream(teams=teams,
+                                                              last_names=last_names,
+                                                              first_names=first_names,
+                                                              profile_ids=profile_ids,
+                                                              include_previous_teams=include_previous_teams,
+                                                              batchSize=batchSize,
+                                                              chunkSize=chunkSize)
+
     async def delete(self, teams : List[str] = None,
                      profile_ids : List[int] = None) -> List[dict]:
         return await super(PlayerGamelogManagerFacade, self).delete(teams=teams,
@@ -77,6 +124,17 @@ class PlayerGamelogManagerFacade(DataManagerFacade):
                         pp["previous_teams"] = r["previous_teams"]
         return gmldata
 
+    @property
+    def seasonConcurrency(self) -> int:
+        """The maximum number of seasons requested from the NFL API at once"""
+        return self._season_concurrency
+
+    @seasonConcurrency.setter
+    def seasonConcurrency(self, value : int):
+        if value < 1:
+            raise ValueError("seasonConcurrency must be at least 1")
+        self._season_concurrency = value
+
     @property
     def _rosterManager(self) -> RosterManagerFacade:
         if self._rmgr is None:
@@ -99,11 +157,12 @@ class PlayerGamelogManagerFacade(DataManagerFacade):
                 qm.cand(name, cmap[name], Operator.IN)
         return qm
 
-    async def _setPreviousTeams(self, gmlogs : List[dict]) -> List[dict]:
-        # Get the current game logs
-        cgmlogs = await self.find()
+    async def _setPreviousTeams(self, gmlogs : List[dict], cgmlogs : List[dict] = None) -> List[dict]:
+        npmap = __makeProfileIdMap__(gmlogs)
+        if cgmlogs is None:
+            # Get the current game logs of the incoming players only
+            cgmlogs = await self._findTeamHistory(list(npmap.keys()))
         if len(cgmlogs) > 0:
-            npmap = __makeProfileIdMap__(gmlogs)
             cpmap = __makeProfileIdMap__(cgmlogs)
             for pid in npmap:
                 if pid in cpmap:
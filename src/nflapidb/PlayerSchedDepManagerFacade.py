@@ -8,6 +8,8 @@ from nflapidb.ScheduleManagerFacade import ScheduleManagerFacade
 from nflapidb.RosterManagerFacade import RosterManagerFacade
 from nflapidb.TeamManagerFacade import TeamManagerFacade
 from nflapidb.QueryModel import QueryModel, Operator
+from nflapidb.RosterIndex import RosterIndex
+import nflapidb.Instrumentation as instr
 
 class PlayerSchedDepManagerFacade(ScheduleDependantManagerFacade):
 
@@ -21,9 +23,18 @@ class PlayerSchedDepManagerFacade(ScheduleDependantManagerFacade):
         self._tmgr = teamManager
         self._abbr_amb = {}
         self._abbr_miss = {}
+        self._roster_index = None
 
-    async def sync(self) -> List[dict]:
+    async def sync(self, chunkBy : str = None, collect : bool = True) -> List[dict]:
         logging.info("Syncing {} data...".format(self._entity_name))
+        # The roster data is read once for the whole sync
+        self._roster_index = await self._buildRosterIndex()
+        try:
+            return await self._syncData(chunkBy, collect)
+        finally:
+            self._roster_index = None
+
+    async def _syncData(self, chunkBy : str, collect : bool) -> List[dict]:
         pidqm = QueryModel()
         pidqm.cstart("profile_id", False, Operator.EXISTS)
         udata = await self.find(qm=pidqm)
@@ -32,7 +43,7 @@ class PlayerSchedDepManagerFacade(ScheduleDependantManagerFacade):
             udata = [d for d in udata if "profile_id" in d]
         if len(udata) > 0:
             udata = await self.save(udata)
-        data = await super(PlayerSchedDepManagerFacade, self).sync()
+        data = await super(PlayerSchedDepManagerFacade, self).sync(chunkBy, collect)
         if len(udata) > 0:
             if len(data) > 0:
                 data = udata + data
@@ -53,6 +64,19 @@ class PlayerSchedDepManagerFacade(ScheduleDependantManagerFacade):
             self._rostmgr = RosterManagerFacade(self._entityManager, self._apiClient, self._tmgr)
         return self._rostmgr
 
+    async def _buildRosterIndex(self, teams : List[str] = None) -> RosterIndex:
+        """Index the roster records, only those of teams if given
+
+        The records of a team are those with the team as their team or
+        in their previous_teams, as RosterIndex.find may match either.
+        """
+        qm = QueryModel()
+        if teams is not None:
+            qm.cstart("team", teams, Operator.IN)
+            qm.cor("previous_teams", teams, Operator.IN)
+        qm.sinclude(["profile_id", "team", "previous_teams", "first_name", "last_name"])
+        return RosterIndex(await self._rosterManager.find(qm=qm))
+
     def _getPlayerAbbrevFailKey(self, gmrec : dict) -> str:
         pabbr = gmrec["player_abrv_name"]
         pteam = gmrec["team"]
@@ -79,29 +103,38 @@ class PlayerSchedDepManagerFacade(ScheduleDependantManagerFacade):
 
     async def _setProfileIds(self, gsdata : List[dict]):
         logging.info("Adding profile ids to data...")
-        rpcnt = len(gsdata) // 20
-        rmgr = self._rosterManager
+        rpcnt = max(len(gsdata) // 20, 1)
+        rindex = self._roster_index
+        if rindex is None:
+            # Outside of a sync only the rosters of the teams saved are read
+            rindex = await self._buildRosterIndex(sorted(set([gsr["team"] for gsr in gsdata if "team" in gsr])))
         i = 0
-        for gsr in gsdata:
-            if "profile_id" not in gsr and "player_abrv_name" in gsr and gsr["player_abrv_name"] is not None and gsr["player_abrv_name"] != "":
-                rdata = await rmgr.find(teams=[gsr["team"]],
-                                        player_abbreviations=[gsr["player_abrv_name"]])
-                if len(rdata) == 0:
-                    rdata = await rmgr.find(teams=[gsr["team"]],
-                                            player_abbreviations=[gsr["player_abrv_name"]],
+        nres = nmiss = namb = 0
+        with instr.span("profile_ids.resolve", entity=self._entity_name):
+            for gsr in gsdata:
+                if "profile_id" not in gsr and "player_abrv_name" in gsr and gsr["player_abrv_name"] is not None and gsr["player_abrv_name"] != "":
+                    rdata = rindex.find(gsr["team"], gsr["player_abrv_name"])
+                    if len(rdata) == 0:
+                        rdata = rindex.find(gsr["team"], gsr["player_abrv_name"],
                                             include_previous_teams=True)
-                if len(rdata) == 0:
-                    ln = re.sub(r"^[^. ]+[. ]", "", gsr["player_abrv_name"])
-                    rdata = await rmgr.find(teams=[gsr["team"]], player_abbreviations=[ln])
-                if len(rdata) == 1:
-                    gsr["profile_id"] = rdata[0]["profile_id"]
-                elif len(rdata) == 0:
-                    self._addMissingPlayerAbbrev(gsr)
-                    # logging.info("Profile id retrieval failed; no records matching player abbreviation {} [{}]".format(gsr["player_abrv_name"], gsr["team"]))
-                else:
-                    self._addAmbiguousPlayerAbbrev(gsr)
-                    # logging.info("Profile id retrieval failed; player abbreviation {} [{}] is ambiguous".format(gsr["player_abrv_name"], gsr["team"]))
-            i += 1
-            if i % rpcnt == 0:
-                logging.info("{}% complete".format(5 * i // rpcnt))
-        logging.info("Profile id addition complete")
\ No newline at end of file
+                    if len(rdata) == 0:
+                        ln = re.sub(r"^[^. ]+[. ]", "", gsr["player_abrv_name"])
+                        rdata = rindex.find(gsr["team"], ln)
+                    if len(rdata) == 1:
+                        gsr["profile_id"] = rdata[0]["profile_id"]
+                        nres += 1
+                    elif len(rdata) == 0:
+                        self._addMissingPlayerAbbrev(gsr)
+                        nmiss += 1
+                        # logging.info("Profile id retrieval failed; no records matching player abbreviation {} [{}]".format(gsr["player_abrv_name"], gsr["team"]))
+                    else:
+                        self._addAmbiguousPlayerAbbrev(gsr)
+                        namb += 1
+                        # logging.info("Profile id retrieval failed; player abbreviation {} [{}] is ambiguous".format(gsr["player_abrv_name"], gsr["team"]))
+                i += 1
+                if i % rpcnt == 0:
+                    logging.info("{}% complete".format(5 * i // rpcnt))
+        instr.count("profile_ids_resolved", nres, entity=self._entity_name)
+        instr.count("unresolved_abbreviations", nmiss, entity=self._entity_name, reason="missing")
+        instr.count("unresolved_abbreviations", namb, entity=self._entity_name, reason="ambiguous")
+        logging.info("Profile id addition complete")
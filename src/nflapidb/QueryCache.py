@@ -0,0 +1,84 @@
+from typing import Any, Tuple
+from collections import OrderedDict
+import copy
+import json
+import time
+
+class QueryCache:
+    """A least recently used cache of query results
+
+    Parameters
+    ----------
+    maxSize : int
+        The maximum number of results held
+    ttl : float
+        The number of seconds a result is valid for, None for
+        results that are valid until the cache is cleared
+
+    The results are copied on the way in and on the way out so
+    callers are free to modify what they get back. Clearing the
+    cache starts a new generation; a result computed before the
+    cache was cleared is not stored, so a query that raced with
+    a write can not repopulate the cache with stale data.
+    """
+
+    def __init__(self, maxSize : int = 1024, ttl : float = None):
+        if maxSize < 1:
+            raise ValueError("maxSize must be at least 1")
+        self._max_size = maxSize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def makeKey(query : dict = None, projection : dict = None, sort : list = None, limit : int = None) -> str:
+        """Get the canonical cache key of a query"""
+        return json.dumps([query, projection, sort, limit], sort_keys=True, default=str)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def stats(self) -> dict:
+        """The hits, misses and current size of the cache"""
+        return {"hits": self._hits, "misses": self._misses, "size": len(self._entries)}
+
+    def get(self, key : str) -> Tuple[bool, Any]:
+        """Get a result
+
+        Returns
+        -------
+        tuple
+            True and a copy of the result if key is cached,
+            otherwise False and None
+        """
+        entry = self._entries.get(key)
+        if entry is not None and self._ttl is not None and time.monotonic() - entry[0] > self._ttl:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return False, None
+        self._hits += 1
+        self._entries.move_to_end(key)
+        return True, copy.deepcopy(entry[1])
+
+    def put(self, key : str, value : Any, generation : int = None):
+        """Store a result
+
+        If generation is given and the cache has been cleared since
+        it was read, the result is discarded.
+        """
+        if generation is not None and generation != self._generation:
+            return
+        self._entries[key] = (time.monotonic(), copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._generation += 1
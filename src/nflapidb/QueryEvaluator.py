@@ -0,0 +1,437 @@
+"""Evaluate MongoDB queries against documents held in memory
+
+This supports the query operators used by QueryModel and the
+facades, i.e. $eq, $ne, $in, $nin, $regex, $gt, $gte, $lt, $lte,
+$exists, $not, $and, $or and $nor, with MongoDB array semantics
+and dotted field paths, along with find projections and sorts and
+the aggregation stages $match, $group, $sort, $limit, $skip,
+$count, $project, $unwind and $facet.
+"""
+from typing import Any, Callable, List
+import datetime
+import functools
+import re
+import nflapidb.Utilities as util
+
+_MISSING = object()
+_PATTERN = type(re.compile(""))
+
+def compileFilter(query : dict) -> Callable[[dict], bool]:
+    """Get a function returning True for the documents matching query"""
+    if query is None or len(query) == 0:
+        return lambda doc: True
+    preds = [_compileItem(k, v) for k, v in query.items()]
+    if len(preds) == 1:
+        return preds[0]
+    return _all(preds)
+
+def resolve(doc : Any, path : str) -> List[Any]:
+    """Get the values at a dotted path, traversing arrays of documents
+
+    An empty list is returned if the path does not exist.
+    """
+    if "." not in path and isinstance(doc, dict):
+        return [doc[path]] if path in doc else []
+    values = [doc]
+    for part in path.split("."):
+        nvalues = []
+        for v in values:
+            if isinstance(v, dict):
+                if part in v:
+                    nvalues.append(v[part])
+            elif isinstance(v, list):
+                if part.isdigit() and int(part) < len(v):
+                    nvalues.append(v[int(part)])
+                else:
+                    for e in v:
+                        if isinstance(e, dict) and part in e:
+                            nvalues.append(e[part])
+        values = nvalues
+    return values
+
+def equalityConstraints(query : dict) -> dict:
+    """Get the field values query requires by equality or $in
+
+    Only the top level fields and those of a top level $and are
+    considered. The result maps a field name to the list of values
+    it may take; fields compared with regular expressions or
+    unhashable values are left out.
+    """
+    cons = {}
+    if query is None:
+        return cons
+    items = list(query.items())
+    for k, v in items:
+        if k == "$and":
+            for sq in v:
+                for sk, sv in equalityConstraints(sq).items():
+                    if sk not in cons:
+                        cons[sk] = sv
+            continue
+        if k.startswith("$"):
+            continue
+        vals = None
+        if isinstance(v, dict) and isOperatorDict(v):
+            if "$eq" in v:
+                vals = [v["$eq"]]
+            elif "$in" in v:
+                vals = list(v["$in"])
+        else:
+            vals = [v]
+        if vals is not None and all([_isHashable(x) for x in vals]) and k not in cons:
+            cons[k] = vals
+    return cons
+
+def project(doc : dict, projection : Any) -> dict:
+    """Apply a find projection to doc, returning a new document"""
+    if projection is None or len(projection) == 0:
+        return dict(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = dict([(k, True) for k in projection])
+    incid = bool(projection.get("_id", True))
+    fields = dict([(k, v) for k, v in projection.items() if k != "_id"])
+    if any([bool(v) for v in fields.values()]):
+        rdoc = {}
+        if incid and "_id" in doc:
+            rdoc["_id"] = doc["_id"]
+        for k in fields:
+            if fields[k] and k in doc:
+                rdoc[k] = doc[k]
+        return rdoc
+    rdoc = dict([(k, v) for k, v in doc.items() if not (k in fields and not fields[k])])
+    if not incid:
+        rdoc.pop("_id", None)
+    return rdoc
+
+def sortDocuments(docs : List[dict], sort : Any) -> List[dict]:
+    """Sort docs by a list of (field, direction) or a dict"""
+    if sort is None:
+        return docs
+    if isinstance(sort, dict):
+        sort = list(sort.items())
+    elif isinstance(sort, str):
+        sort = [(sort, 1)]
+    docs = list(docs)
+    # Python sorts are stable so sorting on the keys in reverse
+    # order gives the multi key ordering
+    for field, direction in reversed(list(sort)):
+        asc = direction >= 0
+        docs.sort(key=lambda d: _sortKey(resolve(d, field), asc), reverse=not asc)
+    return docs
+
+def aggregate(docs : List[dict], pipeline : List[dict]) -> List[dict]:
+    """Run an aggregation pipeline over docs"""
+    for stage in pipeline:
+        if len(stage) != 1:
+            raise ValueError("aggregation stage must have exactly one key: {}".format(stage))
+        name, spec = list(stage.items())[0]
+        if name == "$match":
+            pred = compileFilter(spec)
+            docs = [d for d in docs if pred(d)]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$sort":
+            docs = sortDocuments(docs, spec)
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if len(docs) > 0 else []
+        elif name == "$project":
+            docs = [_projectStage(d, spec) for d in docs]
+        elif name == "$unwind":
+            docs = _unwind(docs, spec)
+        elif name == "$facet":
+            docs = [dict([(k, aggregate(list(docs), p)) for k, p in spec.items()])]
+        else:
+            raise ValueError("aggregation stage {} is not supported".format(name))
+    return docs
+
+def _compileItem(key : str, value : Any) -> Callable[[dict], bool]:
+    if key == "$and":
+        return _all([compileFilter(q) for q in value])
+    if key == "$or":
+        return _any([compileFilter(q) for q in value])
+    if key == "$nor":
+        return _negate(_any([compileFilter(q) for q in value]))
+    if key.startswith("$"):
+        raise ValueError("query operator {} is not supported".format(key))
+    if isinstance(value, dict) and isOperatorDict(value):
+        test = _compileOperators(value)
+    elif isinstance(value, _PATTERN):
+        test = _compileRegex(value, None)
+    else:
+        test = _compileEq(value)
+    return lambda doc: test(resolve(doc, key))
+
+def _compileOperators(ops : dict) -> Callable[[List[Any]], bool]:
+    tests = []
+    for op, cv in ops.items():
+        if op == "$eq":
+            tests.append(_compileEq(cv))
+        elif op == "$ne":
+            tests.append(_negate(_compileEq(cv)))
+        elif op == "$in":
+            tests.append(_compileIn(cv))
+        elif op == "$nin":
+            tests.append(_negate(_compileIn(cv)))
+        elif op == "$regex":
+            tests.append(_compileRegex(cv, ops.get("$options")))
+        elif op == "$options":
+            if "$regex" not in ops:
+                raise ValueError("$options without $regex")
+        elif op in _COMPARATORS:
+            tests.append(_compileCompare(op, cv))
+        elif op == "$exists":
+            tests.append(_compileExists(cv))
+        elif op == "$not":
+            if isinstance(cv, _PATTERN):
+                tests.append(_negate(_compileRegex(cv, None)))
+            else:
+                tests.append(_negate(_compileOperators(cv)))
+        else:
+            raise ValueError("query operator {} is not supported".format(op))
+    if len(tests) == 1:
+        return tests[0]
+    return _all(tests)
+
+def _all(preds : List[Callable[[Any], bool]]) -> Callable[[Any], bool]:
+    # These are called for every document scanned, so they stop
+    # at the first predicate deciding the result
+    def test(v : Any) -> bool:
+        for p in preds:
+            if not p(v):
+                return False
+        return True
+    return test
+
+def _any(preds : List[Callable[[Any], bool]]) -> Callable[[Any], bool]:
+    def test(v : Any) -> bool:
+        for p in preds:
+            if p(v):
+                return True
+        return False
+    return test
+
+def _negate(test : Callable[[Any], bool]) -> Callable[[Any], bool]:
+    return lambda values: not test(values)
+
+def _compileEq(cv : Any) -> Callable[[List[Any]], bool]:
+    def test(values : List[Any]) -> bool:
+        if len(values) == 0:
+            return cv is None
+        for v in values:
+            if _eq(v, cv):
+                return True
+            if isinstance(v, list) and any([_eq(e, cv) for e in v]):
+                return True
+        return False
+    return test
+
+def _compileIn(cvs : List[Any]) -> Callable[[List[Any]], bool]:
+    tests = []
+    for cv in cvs:
+        if isinstance(cv, _PATTERN):
+            tests.append(_compileRegex(cv, None))
+        else:
+            tests.append(_compileEq(cv))
+    return _any(tests)
+
+def _compileRegex(pattern : Any, options : str) -> Callable[[List[Any]], bool]:
+    if not isinstance(pattern, _PATTERN):
+        flags = 0
+        for o in (options or ""):
+            flags |= {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}.get(o, 0)
+        pattern = re.compile(pattern, flags)
+    def test(values : List[Any]) -> bool:
+        for v in _flatten(values):
+            if isinstance(v, str) and pattern.search(v) is not None:
+                return True
+        return False
+    return test
+
+_COMPARATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b
+}
+
+def _compileCompare(op : str, cv : Any) -> Callable[[List[Any]], bool]:
+    cmp = _COMPARATORS[op]
+    bracket = _typeBracket(cv)
+    def test(values : List[Any]) -> bool:
+        for v in _flatten(values):
+            if _typeBracket(v) == bracket:
+                try:
+                    if cmp(v, cv):
+                        return True
+                except TypeError:
+                    pass
+        return False
+    return test
+
+def _compileExists(cv : Any) -> Callable[[List[Any]], bool]:
+    exists = bool(cv)
+    return lambda values: (len(values) > 0) == exists
+
+def _flatten(values : List[Any]) -> List[Any]:
+    fv = []
+    for v in values:
+        if isinstance(v, list):
+            fv.extend(v)
+        else:
+            fv.append(v)
+    return fv
+
+def _eq(a : Any, b : Any) -> bool:
+    # MongoDB does not consider booleans equal to numbers
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    try:
+        return a == b
+    except TypeError:
+        return False
+
+def isOperatorDict(v : dict) -> bool:
+    """True if v is a dict of query operators rather than a document"""
+    return len(v) > 0 and all([isinstance(k, str) and k.startswith("$") for k in v])
+
+def _isHashable(v : Any) -> bool:
+    if isinstance(v, _PATTERN):
+        return False
+    try:
+        hash(util.freeze(v))
+        return True
+    except TypeError:
+        return False
+
+def _typeBracket(v : Any) -> int:
+    # The MongoDB comparison order of the BSON types
+    if v is None:
+        return 1
+    if isinstance(v, bool):
+        return 8
+    if isinstance(v, (int, float)):
+        return 2
+    if isinstance(v, str):
+        return 3
+    if isinstance(v, dict):
+        return 4
+    if isinstance(v, list):
+        return 5
+    if isinstance(v, bytes):
+        return 6
+    if isinstance(v, datetime.datetime):
+        return 9
+    return 7
+
+@functools.total_ordering
+class _SortValue:
+    def __init__(self, v : Any):
+        self.bracket = _typeBracket(v)
+        self.v = v
+
+    def __eq__(self, other):
+        return self.bracket == other.bracket and _eq(self.v, other.v)
+
+    def __lt__(self, other):
+        if self.bracket != other.bracket:
+            return self.bracket < other.bracket
+        try:
+            return self.v < other.v
+        except TypeError:
+            return str(self.v) < str(other.v)
+
+def _sortKey(values : List[Any], asc : bool) -> _SortValue:
+    # Arrays sort by their smallest element ascending and by their
+    # largest element descending, and a missing field sorts as null
+    fv = _flatten(values)
+    if len(fv) == 0:
+        return _SortValue(None)
+    svs = [_SortValue(v) for v in fv]
+    return min(svs) if asc else max(svs)
+
+def _evalExpr(doc : dict, expr : Any) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        values = resolve(doc, expr[1:])
+        return values[0] if len(values) == 1 else (values if len(values) > 1 else None)
+    if isinstance(expr, dict):
+        return dict([(k, _evalExpr(doc, v)) for k, v in expr.items()])
+    return expr
+
+def _group(docs : List[dict], spec : dict) -> List[dict]:
+    groups = {}
+    for doc in docs:
+        gid = _evalExpr(doc, spec["_id"])
+        key = util.freeze(gid)
+        if key not in groups:
+            groups[key] = (gid, [])
+        groups[key][1].append(doc)
+    rslt = []
+    for gid, gdocs in groups.values():
+        gdoc = {"_id": gid}
+        for name, acc in spec.items():
+            if name == "_id":
+                continue
+            op, expr = list(acc.items())[0]
+            gdoc[name] = _accumulate(op, [_evalExpr(d, expr) for d in gdocs])
+        rslt.append(gdoc)
+    return rslt
+
+def _accumulate(op : str, values : List[Any]) -> Any:
+    if op == "$sum":
+        return sum([v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)])
+    if op == "$avg":
+        nums = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        return sum(nums) / len(nums) if len(nums) > 0 else None
+    present = [v for v in values if v is not None]
+    if op == "$min":
+        return min([_SortValue(v) for v in present]).v if len(present) > 0 else None
+    if op == "$max":
+        return max([_SortValue(v) for v in present]).v if len(present) > 0 else None
+    if op == "$first":
+        return values[0] if len(values) > 0 else None
+    if op == "$last":
+        return values[-1] if len(values) > 0 else None
+    if op == "$push":
+        return values
+    if op == "$addToSet":
+        seen = {}
+        for v in values:
+            seen.setdefault(util.freeze(v), v)
+        return list(seen.values())
+    raise ValueError("group accumulator {} is not supported".format(op))
+
+def _projectStage(doc : dict, spec : dict) -> dict:
+    if all([v in (0, 1, True, False) for v in spec.values()]):
+        return project(doc, spec)
+    rdoc = {}
+    if spec.get("_id", True) and "_id" in doc:
+        rdoc["_id"] = doc["_id"]
+    for k, v in spec.items():
+        if k == "_id":
+            if v not in (0, 1, True, False):
+                rdoc["_id"] = _evalExpr(doc, v)
+        elif v is True or v == 1:
+            if k in doc:
+                rdoc[k] = doc[k]
+        elif v is not False and v != 0:
+            rdoc[k] = _evalExpr(doc, v)
+    return rdoc
+
+def _unwind(docs : List[dict], spec : Any) -> List[dict]:
+    path = spec if isinstance(spec, str) else spec["path"]
+    field = path[1:]
+    rslt = []
+    for doc in docs:
+        v = doc.get(field, _MISSING)
+        if isinstance(v, list):
+            for e in v:
+                ndoc = dict(doc)
+                ndoc[field] = e
+                rslt.append(ndoc)
+        elif v is not _MISSING and v is not None:
+            rslt.append(doc)
+    return rslt
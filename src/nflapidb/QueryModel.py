@@ -65,6 +65,8 @@ class QueryModel:
     def __init__(self):
         self._select : dict = {"_id": False}
         self._constraint : dict = None
+        self._ordering : list = None
+        self._limit : int = None
 
     def select(self, withId : bool = False, **kwargs) -> dict:
         sd = self._select.copy()
@@ -87,6 +89,27 @@ class QueryModel:
     def sexclude(self, columnNames : List[str]):
         self._select.update(dict(zip(columnNames, [False for _ in columnNames])))
 
+    def orderBy(self, name : str, ascending : bool = True):
+        """Add a sort column, the first one added is the primary sort"""
+        if self._ordering is None:
+            self._ordering = []
+        self._ordering.append((name, 1 if ascending else -1))
+        return self
+
+    @property
+    def ordering(self) -> list:
+        """The list of (name, direction) sort tuples or None"""
+        return self._ordering
+
+    @property
+    def limit(self) -> int:
+        """The maximum number of records to return or None for all"""
+        return self._limit
+
+    @limit.setter
+    def limit(self, value : int):
+        self._limit = value
+
     @property
     def constraint(self) -> dict:
         c = {}
@@ -0,0 +1,246 @@
+from typing import Any, Callable, Dict, List
+import os
+import copy
+import json
+import time
+import random
+import threading
+import nflapi.Client
+import nflapidb.Utilities as util
+
+# The entity of the records returned by each NFL API method the facades
+# call, which names the files the records are recorded to
+API_ENTITIES = {
+    "getTeams": "team",
+    "getRoster": "roster",
+    "getSchedule": "schedule",
+    "getPlayerProfile": "player_profile",
+    "getPlayerGameLog": "player_gamelog",
+    "getGameSummary": "game_summary",
+    "getGameScore": "game_score",
+    "getGameDrive": "game_drive",
+    "getGamePlay": "game_play"
+}
+
+class ReplayApiClient(nflapi.Client.Client):
+    """Serve the NFL API requests of the facades from recorded records
+
+    The records of each entity are read from json files of records as
+    written by RecordingApiClient, by default <entity>.json in
+    dataDirPath, or from the files given for it, e.g. the tests/data
+    fixtures. A request returns copies of the records matching its
+    arguments, as the API would, e.g. getRoster returns the records
+    of the requested teams, whichever requests they were recorded by.
+    If there are no team records the teams are those of the schedule
+    records.
+
+    Each request sleeps for latency seconds, plus recordLatency
+    seconds per record returned, varied by up to jitter times that
+    at random, to stand in for the API response time. The requests
+    are blocking like those of nflapi.Client, so this shows how well
+    a sync overlaps them. The jitter is reproducible for a given seed.
+
+    Parameters
+    ----------
+    dataDirPath : str
+        The directory of the record files
+    files : dict
+        Lists of record file names in dataDirPath keyed by entity,
+        for the entities not recorded to <entity>.json
+    latency : float
+        The seconds each request takes
+    recordLatency : float
+        The seconds added to a request per record returned
+    jitter : float
+        The fraction by which the latency varies at random
+    seed : int
+        The seed of the latency jitter
+    """
+
+    def __init__(self, dataDirPath : str, files : Dict[str, List[str]] = None,
+                 latency : float = 0.0, recordLatency : float = 0.0,
+                 jitter : float = 0.0, seed : int = 0):
+        self._data_dir_path = dataDirPath
+        self._files = {} if files is None else files
+        self.latency = latency
+        self.recordLatency = recordLatency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._data = {}
+        self._requests = []
+        self._lock = threading.RLock()
+
+    @property
+    def requests(self) -> List[tuple]:
+        """The (method name, arguments) of the requests made so far"""
+        return list(self._requests)
+
+    def records(self, entityName : str) -> List[dict]:
+        """Get the recorded records of an entity
+
+        These are the records served, so they must not be changed.
+        """
+        with self._lock:
+            if entityName not in self._data:
+                self._data[entityName] = self._read(entityName)
+            return self._data[entityName]
+
+    def getTeams(self, active_only : bool = True) -> List[dict]:
+        return self._serve("getTeams", {"active_only": active_only}, lambda rec: True)
+
+    def getRoster(self, teams : List[str]) -> List[dict]:
+        return self._serve("getRoster", {"teams": teams}, lambda rec: rec["team"] in teams)
+
+    def getSchedule(self, season : int = None, season_type : str = None, week : int = None) -> List[dict]:
+        # the API takes postseason weeks 1-4 but returns the nfl.com
+        # weeks, 18-22 with 21 missing, as the records are recorded
+        rwk = week
+        if week is not None and season_type == "postseason":
+            rwk = week + 17
+            if rwk == 21:
+                rwk += 1
+        def keep(rec : dict) -> bool:
+            return (season is None or rec["season"] == season) and \
+                   (season_type is None or rec["season_type"] == season_type) and \
+                   (rwk is None or rec["week"] == rwk)
+        return self._serve("getSchedule", {"season": season, "season_type": season_type, "week": week}, keep)
+
+    def getPlayerProfile(self, rosters : List[dict]) -> List[dict]:
+        pids = set([rec["profile_id"] for rec in rosters])
+        return self._serve("getPlayerProfile", {"rosters": rosters}, lambda rec: rec["profile_id"] in pids)
+
+    def getPlayerGameLog(self, rosters : List[dict], season : int) -> List[dict]:
+        pids = set([rec["profile_id"] for rec in rosters])
+        return self._serve("getPlayerGameLog", {"rosters": rosters, "season": season},
+                           lambda rec: rec["profile_id"] in pids and rec["season"] == season)
+
+    def getGameSummary(self, schedules : List[dict]) -> List[dict]:
+        return self._serveGames("getGameSummary", schedules)
+
+    def getGameScore(self, schedules : List[dict]) -> List[dict]:
+        return self._serveGames("getGameScore", schedules)
+
+    def getGameDrive(self, schedules : List[dict]) -> List[dict]:
+        return self._serveGames("getGameDrive", schedules)
+
+    def getGamePlay(self, schedules : List[dict]) -> List[dict]:
+        return self._serveGames("getGamePlay", schedules)
+
+    def _serveGames(self, method : str, schedules : List[dict]) -> List[dict]:
+        gsids = set([rec["gsis_id"] for rec in schedules])
+        return self._serve(method, {"schedules": schedules}, lambda rec: rec["gsis_id"] in gsids)
+
+    def _serve(self, method : str, args : dict, keep : Callable[[dict], bool]) -> List[dict]:
+        start = time.perf_counter()
+        self._requests.append((method, args))
+        # copies, as the facades add fields to the records they save
+        data = copy.deepcopy([rec for rec in self.records(API_ENTITIES[method]) if keep(rec)])
+        delay = self.latency + self.recordLatency * len(data)
+        if self.jitter > 0:
+            with self._lock:
+                delay *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        delay -= time.perf_counter() - start
+        if delay > 0:
+            time.sleep(delay)
+        return data
+
+    def _read(self, entityName : str) -> List[dict]:
+        fnames = self._files.get(entityName, [f"{entityName}.json"])
+        fpaths = [os.path.join(self._data_dir_path, f) for f in fnames]
+        fpaths = [f for f in fpaths if os.path.exists(f)]
+        if len(fpaths) == 0 and entityName == "team":
+            teams = set()
+            for rec in self.records("schedule"):
+                teams.update([rec["home_team"], rec["away_team"]])
+            return [{"team": t} for t in sorted(teams)]
+        data = []
+        for fpath in fpaths:
+            with open(fpath, "rt") as fp:
+                data.extend(json.load(fp))
+        return data
+
+class RecordingApiClient(nflapi.Client.Client):
+    """Record the responses of an NFL API client for ReplayApiClient
+
+    The requests are passed to apiClient, and the records returned
+    are collected by entity, without duplicates, and written by save
+    to <entity>.json in dataDirPath, adding to the records already
+    recorded there. A sync through this client therefore records what
+    a ReplayApiClient needs to replay it offline.
+
+    Parameters
+    ----------
+    apiClient : nflapi.Client.Client
+        The client the requests are passed to
+    dataDirPath : str
+        The directory the records are written to
+    """
+
+    def __init__(self, apiClient : nflapi.Client.Client, dataDirPath : str):
+        self._api_client = apiClient
+        self._data_dir_path = dataDirPath
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def getTeams(self, active_only : bool = True) -> List[dict]:
+        return self._record("getTeams", active_only=active_only)
+
+    def getRoster(self, teams : List[str]) -> List[dict]:
+        return self._record("getRoster", teams)
+
+    def getSchedule(self, season : int = None, season_type : str = None, week : int = None) -> List[dict]:
+        kwargs = dict([(k, v) for k, v in [("season", season), ("season_type", season_type), ("week", week)]
+                       if v is not None])
+        return self._record("getSchedule", **kwargs)
+
+    def getPlayerProfile(self, rosters : List[dict]) -> List[dict]:
+        return self._record("getPlayerProfile", rosters)
+
+    def getPlayerGameLog(self, rosters : List[dict], season : int) -> List[dict]:
+        return self._record("getPlayerGameLog", rosters=rosters, season=season)
+
+    def getGameSummary(self, schedules : List[dict]) -> List[dict]:
+        return self._record("getGameSummary", schedules)
+
+    def getGameScore(self, schedules : List[dict]) -> List[dict]:
+        return self._record("getGameScore", schedules)
+
+    def getGameDrive(self, schedules : List[dict]) -> List[dict]:
+        return self._record("getGameDrive", schedules)
+
+    def getGamePlay(self, schedules : List[dict]) -> List[dict]:
+        return self._record("getGamePlay", schedules)
+
+    def save(self) -> Dict[str, int]:
+        """Write the records collected so far
+
+        Returns
+        -------
+        dict
+            The number of records in each file written keyed by entity
+        """
+        counts = {}
+        with self._lock:
+            for entityName, recs in self._data.items():
+                fpath = os.path.join(self._data_dir_path, f"{entityName}.json")
+                data = {}
+                if os.path.exists(fpath):
+                    with open(fpath, "rt") as fp:
+                        for rec in json.load(fp):
+                            data[util.freeze(rec)] = rec
+                data.update(recs)
+                with open(fpath, "wt") as fp:
+                    json.dump(list(data.values()), fp, default=str)
+                counts[entityName] = len(data)
+        return counts
+
+    def _record(self, method : str, *args, **kwargs) -> Any:
+        data = getattr(self._api_client, method)(*args, **kwargs)
+        # the records are recorded as returned, before the facades
+        # add fields to them
+        recs = json.loads(json.dumps(data, default=str))
+        with self._lock:
+            erecs = self._data.setdefault(API_ENTITIES[method], {})
+            for rec in recs:
+                erecs.setdefault(util.freeze(rec), rec)
+        return data
@@ -0,0 +1,75 @@
+from typing import List, Pattern
+import re
+import nflapidb.Utilities as util
+
+class RosterIndex:
+    """In memory lookup of roster records by team and player abbreviation
+
+    The matching rules are the same as those of the
+    RosterManagerFacade.find player_abbreviations query, but
+    the roster data is read once and the results for each
+    team and abbreviation are remembered.
+    """
+
+    def __init__(self, rosters : List[dict]):
+        self._team_recs = {}
+        self._prev_team_recs = {}
+        for rec in rosters:
+            team = rec.get("team")
+            if team not in self._team_recs:
+                self._team_recs[team] = []
+            self._team_recs[team].append(rec)
+            pteams = rec.get("previous_teams")
+            if isinstance(pteams, list):
+                for pteam in set(pteams):
+                    if pteam != team:
+                        if pteam not in self._prev_team_recs:
+                            self._prev_team_recs[pteam] = []
+                        self._prev_team_recs[pteam].append(rec)
+        self._matches = {}
+        self._patterns = {}
+
+    def find(self, team : str, abbreviation : str, include_previous_teams : bool = False) -> List[dict]:
+        """Find the roster records matching a player abbreviation
+
+        Parameters
+        ----------
+        team : str
+            The team the player played for
+        abbreviation : str
+            The player name abbreviation, e.g. C.Wollam
+        include_previous_teams : bool
+            If True also match records with team in previous_teams
+
+        Returns
+        -------
+        list of dict
+        """
+        fi, ln = self._parse(abbreviation)
+        key = (team, fi, ln, include_previous_teams)
+        if key not in self._matches:
+            recs = self._team_recs.get(team, [])
+            if include_previous_teams:
+                recs = recs + self._prev_team_recs.get(team, [])
+            if not (fi is None and ln is None):
+                recs = [r for r in recs if self._isMatch(r, fi, ln)]
+            self._matches[key] = recs
+        return self._matches[key]
+
+    def _parse(self, abbreviation : str) -> tuple:
+        if abbreviation not in self._patterns:
+            fi, ln = util.parseNameAbbreviation(abbreviation)
+            if fi is not None:
+                fi = re.compile(fi, re.IGNORECASE)
+            if ln is not None:
+                ln = re.compile(ln, re.IGNORECASE)
+            self._patterns[abbreviation] = (fi, ln)
+        return self._patterns[abbreviation]
+
+    def _isMatch(self, rec : dict, fi : Pattern, ln : Pattern) -> bool:
+        if fi is not None:
+            fn = rec.get("first_name")
+            if not isinstance(fn, str) or fi.search(fn) is None:
+                return False
+        lnv = rec.get("last_name")
+        return isinstance(lnv, str) and ln.search(lnv) is not None
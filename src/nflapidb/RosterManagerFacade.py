@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import re
 import os
 import json
@@ -35,7 +35,8 @@ class RosterManagerFacade(DataManagerFacade):
                 logging.info("Saving historic roster data...")
                 data.extend(await self.save(hrdata))
         logging.info("Retrieving rosters from NFL API...")
-        data.extend(await self.save(self._apiClient.getRoster(teams)))
+        async for _, rdata in self._iterAPI(self._apiClient.getRoster, teams, self.apiChunkSize):
+            data.extend(await self.save(rdata))
         return data
 
     async def save(self, data : List[dict]) -> List[dict]:
@@ -51,14 +52,32 @@ class RosterManagerFacade(DataManagerFacade):
                    first_names : List[str] = None,
                    profile_ids : List[int] = None,
                    player_abbreviations : List[str] = None,
-                   include_previous_teams : bool = False) -> List[dict]:
-        return await super(RosterManagerFacade, self).find(teams=teams, positions=positions,
+                   include_previous_teams : bool = False,
+                   qm : QueryModel = None) -> List[dict]:
+        return await super(RosterManagerFacade, self).find(qm=qm, teams=teams, positions=positions,
                                                            last_names=last_names,
                                                            first_names=first_names,
                                                            profile_ids=profile_ids,
                                                            player_abbreviations=player_abbreviations,
                                                            include_previous_teams=include_previous_teams)
 
+    def stream(self, teams : List[str] = None,
+               positions : List[str] = None,
+               last_names : List[str] = None,
+               first_names : List[str] = None,
+               profile_ids : List[int] = None,
+               player_abbreviations : List[str] = None,
+               include_previous_teams : bool = False,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(RosterManagerFacade, self).stream(teams=teams, positions=positions,
+                                                       last_names=last_names,
+                                                       first_names=first_names,
+                                                       profile_ids=profile_ids,
+                                                       player_abbreviations=player_abbreviations,
+                                                       include_previous_teams=include_previous_teams,
+                                                       batchSize=batchSize,
+                                                       chunkSize=chunkSize)
+
     async def delete(self, teams : List[str] = None,
                      profile_ids : List[int] = None) -> List[dict]:
         return await super(RosterManagerFacade, self).delete(teams=teams,
@@ -100,23 +119,25 @@ class RosterManagerFacade(DataManagerFacade):
         return qm
 
     async def _setPreviousTeams(self, rosters : List[dict]) -> List[dict]:
-        # Get the current rosters
-        crosters = await self.find()
+        npmap = __makeProfileIdMap__(rosters)
+        # Get the current records of the incoming players only
+        crosters = await self._findTeamHistory(list(npmap.keys()))
         if len(crosters) > 0:
-            npmap = __makeProfileIdMap__(rosters)
             cpmap = __makeProfileIdMap__(crosters)
             for pid in npmap:
                 if pid in cpmap:
                     # profile_id is in the current data
-                    if cpmap[pid]["team"] != npmap[pid]["team"]:
+                    crec = cpmap[pid]
+                    nrec = npmap[pid]
+                    pteams = set(nrec.get("previous_teams") or [])
+                    pteams.update(crec.get("previous_teams") or [])
+                    if crec["team"] != nrec["team"]:
                         # The team value for the new data is different than
                         # the current data, therefore, we need to add the
                         # current data team as a previous_team for this player
-                        pteams = [cpmap[pid]["team"]]
-                        if "previous_teams" in cpmap[pid]["team"]:
-                            pteams.extend(cpmap[pid]["team"]["previous_teams"])
-                            pteams = list(set(pteams))
-                        npmap[pid]["previous_teams"] = pteams
+                        pteams.add(crec["team"])
+                    if len(pteams) > 0:
+                        nrec["previous_teams"] = sorted(pteams)
         return rosters
 
     def _getHistoricData(self) -> List[dict]:
@@ -0,0 +1,498 @@
+from typing import Any, Callable, Iterator, List, Tuple
+import datetime
+import itertools
+import json
+import sqlite3
+from bson import BSON
+from bson.objectid import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+import nflapidb.Utilities as util
+import nflapidb.QueryEvaluator as qe
+from nflapidb.StorageBackend import StorageBackend
+from nflapidb.BackendCollection import BackendCollection
+
+# Collection names cannot contain $ so it marks the tables that are
+# not collections: the collection and index catalogs, and the table
+# of the array elements of the indexed fields of each collection
+_COLLECTIONS_TABLE = '"$collections"'
+_INDEXES_TABLE = '"$indexes"'
+
+# The most _id values looked up by a query, which keeps it under the
+# SQLITE_MAX_VARIABLE_NUMBER of older SQLite builds
+_MAX_PARAMS = 900
+
+_NOT_SCALAR = object()
+
+# The index column value of a null or missing field. It is not NULL so
+# that SQLite unique indexes treat every null key as the same value, as
+# MongoDB does, and is a blob so it differs from every stored scalar.
+_NULL = b"\x00"
+
+# The multikey table row marking a document whose field is not scalar,
+# whatever its elements, so that such documents are found for the
+# unique index checks
+_NON_SCALAR = b"\x01"
+
+def _quote(name : str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+def _column(field : str) -> str:
+    return _quote("f${}".format(field))
+
+def _sqlValue(v : Any) -> Any:
+    """Get the value stored in an index column for v
+
+    Values that have no SQL equivalent, such as arrays and documents,
+    give _NOT_SCALAR. Distinct values may share an SQL value, e.g. a
+    string and a datetime, as the documents are matched again after
+    the SQL query narrows them down.
+    """
+    if v is None:
+        return _NULL
+    if isinstance(v, (str, float)):
+        return v
+    if isinstance(v, bool):
+        return int(v)
+    if isinstance(v, int):
+        return v if -2 ** 63 <= v < 2 ** 63 else _NOT_SCALAR
+    if isinstance(v, datetime.datetime):
+        return v.isoformat()
+    if isinstance(v, ObjectId):
+        return str(v)
+    return _NOT_SCALAR
+
+def _idKey(docId : Any) -> bytes:
+    return BSON.encode({"_id": docId})
+
+def _uniqueKeys(doc : dict, fields : List[str]) -> Iterator[tuple]:
+    """Get the keys doc has in a unique index of fields
+
+    As in MongoDB an array gives a key for each of its elements and a
+    missing field the key None.
+    """
+    fkeys = []
+    for f in fields:
+        keys = []
+        values = qe.resolve(doc, f)
+        if len(values) == 0:
+            keys.append(None)
+        for v in values:
+            if isinstance(v, list) and len(v) > 0:
+                keys.extend(v)
+            else:
+                keys.append(v)
+        fkeys.append(keys)
+    return itertools.product(*fkeys)
+
+class SQLiteBackend(StorageBackend):
+    """Keep the entities in a SQLite database file
+
+    Each collection is a table of BSON encoded documents. The fields
+    of the entity indexes are also stored in columns of their own,
+    with SQL indexes over them, unique for the unique indexes such as
+    the primary key, and the array elements of those fields are kept
+    in a companion table. The equality and $in constraints of a query,
+    including those of each branch of an $or, are run as an SQL query
+    on those indexes, and the documents it selects are then matched
+    with QueryEvaluator, so any query the facades make is supported.
+    Unique indexes are enforced as in MongoDB: by SQLite for scalar
+    values, and by looking the keys of a document up before it is
+    written when its indexed fields, or those of a stored document,
+    hold arrays or documents, or when the index is partial.
+
+    SQLite is called synchronously, which suits local files where a
+    statement takes well under a millisecond. The database is opened
+    in WAL mode so that other processes can read it while it is being
+    written to.
+
+    Parameters
+    ----------
+    path : str
+        The path of the database file, or :memory:
+    """
+
+    def __init__(self, path : str):
+        self._path = path
+        self._conn = sqlite3.connect(path)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._db = SQLiteDatabase(self._conn, path)
+
+    @property
+    def database(self) -> "SQLiteDatabase":
+        return self._db
+
+    def close(self):
+        self._conn.close()
+
+class SQLiteDatabase:
+    """The SQLite counterpart of AsyncIOMotorDatabase"""
+
+    def __init__(self, connection : sqlite3.Connection, name : str):
+        self.name = name
+        self._conn = connection
+        self._collections = {}
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS {} (name TEXT PRIMARY KEY)".format(_COLLECTIONS_TABLE))
+            self._conn.execute("CREATE TABLE IF NOT EXISTS {} (collection TEXT NOT NULL, name TEXT NOT NULL, "
+                               "info BLOB NOT NULL, PRIMARY KEY (collection, name))".format(_INDEXES_TABLE))
+
+    def __getitem__(self, name : str) -> "SQLiteCollection":
+        return self.get_collection(name)
+
+    def get_collection(self, name : str, **kwargs) -> "SQLiteCollection":
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+
+    def create_collection(self, name : str, **kwargs) -> "SQLiteCollection":
+        col = self.get_collection(name)
+        with self._conn:
+            col._create()
+        return col
+
+    async def list_collection_names(self, filter : dict = None, **kwargs) -> List[str]:
+        names = [r[0] for r in self._conn.execute("SELECT name FROM {} ORDER BY name".format(_COLLECTIONS_TABLE))]
+        if filter is not None:
+            pred = qe.compileFilter(filter)
+            names = [name for name in names if pred({"name": name})]
+        return names
+
+    async def drop_collection(self, nameOrCollection : Any):
+        name = nameOrCollection if isinstance(nameOrCollection, str) else nameOrCollection.name
+        col = self.get_collection(name)
+        with self._conn:
+            col._drop()
+        del self._collections[name]
+
+    def watch(self, pipeline : List[dict] = None, **kwargs):
+        # as on a standalone server, so that CacheWatcher polls
+        raise OperationFailure("change streams are not supported by the SQLite backend")
+
+class SQLiteCollection(BackendCollection):
+    """The SQLite counterpart of AsyncIOMotorCollection"""
+
+    def __init__(self, database : SQLiteDatabase, name : str):
+        super(SQLiteCollection, self).__init__(database, name)
+        self._conn = database._conn
+        self._table = _quote(name)
+        self._mktable = _quote("{}$multikey".format(name))
+        self._schema_version = None
+        self._indexes = None
+        self._fields = None
+        self._exists = None
+
+    async def index_information(self) -> dict:
+        info = {"_id_": {"v": 2, "key": [("_id", 1)]}}
+        info.update(self._getIndexes())
+        return info
+
+    async def create_indexes(self, indexes : List[IndexModel], **kwargs) -> List[str]:
+        names = []
+        with self._conn:
+            self._create()
+            current = self._getIndexes()
+            for model in indexes:
+                doc = model.document
+                info = {"v": 2, "key": list(doc["key"].items())}
+                if doc.get("unique", False):
+                    info["unique"] = True
+                if doc.get("partialFilterExpression") is not None:
+                    info["partialFilterExpression"] = doc["partialFilterExpression"]
+                name = doc["name"]
+                if name in current:
+                    if current[name] != info:
+                        raise OperationFailure("Index with name: {} already exists with different options".format(name))
+                else:
+                    self._createIndex(name, info)
+                    current[name] = info
+                names.append(name)
+        return names
+
+    def _dropIndex(self, name : str):
+        with self._conn:
+            self._conn.execute("DROP INDEX IF EXISTS {}".format(_quote("{}${}".format(self.name, name))))
+            self._conn.execute("DELETE FROM {} WHERE collection = ? AND name = ?".format(_INDEXES_TABLE), (self.name, name))
+        self._indexes = None
+        self._fields = None
+
+    def _batch(self):
+        return self._conn
+
+    def _select(self, filter : dict, limit : int = None) -> List[dict]:
+        if not self._isCreated():
+            return []
+        plans = None if filter is None else self._plan(filter)
+        if plans is None:
+            pred = qe.compileFilter(filter)
+            docs = []
+            for doc, in self._conn.execute("SELECT doc FROM {} ORDER BY _seq".format(self._table)):
+                doc = BSON(doc).decode()
+                if pred(doc):
+                    docs.append(doc)
+                    if limit is not None and len(docs) >= limit:
+                        break
+            return docs
+        matched = {}
+        for where, params, pred in plans:
+            for seq, doc in self._conn.execute("SELECT _seq, doc FROM {} WHERE {}".format(self._table, where), params):
+                if seq not in matched:
+                    doc = BSON(doc).decode()
+                    if pred(doc):
+                        matched[seq] = doc
+        docs = [doc for _, doc in sorted(matched.items())]
+        return docs if limit is None else docs[:limit]
+
+    def _insert(self, doc : dict):
+        self._create()
+        self._checkUnique(doc)
+        fields = self._getFields()
+        cols, mkvalues = self._columnValues(doc, fields)
+        sql = "INSERT INTO {} (_id, doc{}) VALUES (?, ?{})".format(self._table,
+                                                                  "".join([", " + _column(f) for f in fields]),
+                                                                  ", ?" * len(fields))
+        try:
+            seq = self._conn.execute(sql, [_idKey(doc["_id"]), BSON.encode(doc)] + cols).lastrowid
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError("E11000 duplicate key error collection: {}: {}".format(self.name, e), 11000)
+        self._insertMultikeys(seq, mkvalues)
+
+    def _replace(self, doc : dict):
+        self._checkUnique(doc)
+        fields = self._getFields()
+        cols, mkvalues = self._columnValues(doc, fields)
+        idkey = _idKey(doc["_id"])
+        seq = self._conn.execute("SELECT _seq FROM {} WHERE _id = ?".format(self._table), (idkey,)).fetchone()[0]
+        sql = "UPDATE {} SET doc = ?{} WHERE _seq = ?".format(self._table,
+                                                             "".join([", {} = ?".format(_column(f)) for f in fields]))
+        try:
+            self._conn.execute(sql, [BSON.encode(doc)] + cols + [seq])
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError("E11000 duplicate key error collection: {}: {}".format(self.name, e), 11000)
+        self._conn.execute("DELETE FROM {} WHERE seq = ?".format(self._mktable), (seq,))
+        self._insertMultikeys(seq, mkvalues)
+
+    def _remove(self, docId : Any):
+        seq = self._conn.execute("SELECT _seq FROM {} WHERE _id = ?".format(self._table), (_idKey(docId),)).fetchone()[0]
+        self._conn.execute("DELETE FROM {} WHERE seq = ?".format(self._mktable), (seq,))
+        self._conn.execute("DELETE FROM {} WHERE _seq = ?".format(self._table), (seq,))
+
+    def _refresh(self):
+        # The catalog is cached until the schema changes, which other
+        # processes writing to the database file may also do
+        version = self._conn.execute("PRAGMA schema_version").fetchone()[0]
+        if version != self._schema_version:
+            self._schema_version = version
+            self._indexes = None
+            self._fields = None
+            self._exists = None
+
+    def _isCreated(self) -> bool:
+        self._refresh()
+        if not self._exists:
+            self._exists = self._conn.execute("SELECT 1 FROM {} WHERE name = ?".format(_COLLECTIONS_TABLE),
+                                              (self.name,)).fetchone() is not None
+        return self._exists
+
+    def _create(self):
+        if self._isCreated():
+            return
+        self._conn.execute("CREATE TABLE IF NOT EXISTS {} (_seq INTEGER PRIMARY KEY, _id BLOB NOT NULL UNIQUE, "
+                           "doc BLOB NOT NULL)".format(self._table))
+        self._conn.execute("CREATE TABLE IF NOT EXISTS {} (field TEXT NOT NULL, value, seq INTEGER NOT NULL)".format(self._mktable))
+        self._conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} (field, value)".format(_quote("{}$multikey$value".format(self.name)), self._mktable))
+        self._conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} (seq)".format(_quote("{}$multikey$seq".format(self.name)), self._mktable))
+        self._conn.execute("INSERT OR IGNORE INTO {} (name) VALUES (?)".format(_COLLECTIONS_TABLE), (self.name,))
+        self._exists = True
+
+    def _drop(self):
+        self._conn.execute("DROP TABLE IF EXISTS {}".format(self._table))
+        self._conn.execute("DROP TABLE IF EXISTS {}".format(self._mktable))
+        self._conn.execute("DELETE FROM {} WHERE name = ?".format(_COLLECTIONS_TABLE), (self.name,))
+        self._conn.execute("DELETE FROM {} WHERE collection = ?".format(_INDEXES_TABLE), (self.name,))
+        self._indexes = None
+        self._fields = None
+        self._exists = False
+
+    def _getIndexes(self) -> dict:
+        self._refresh()
+        if self._indexes is None:
+            self._indexes = {}
+            for name, info in self._conn.execute("SELECT name, info FROM {} WHERE collection = ? ORDER BY rowid".format(_INDEXES_TABLE),
+                                                 (self.name,)):
+                info = BSON(info).decode()
+                info["key"] = [tuple(k) for k in info["key"]]
+                self._indexes[name] = info
+        return self._indexes
+
+    def _getFields(self) -> List[str]:
+        """The names of the fields with index columns"""
+        if self._fields is None:
+            fields = []
+            for info in self._getIndexes().values():
+                for f, _ in info["key"]:
+                    if f != "_id" and f not in fields:
+                        fields.append(f)
+            self._fields = fields
+        return self._fields
+
+    def _createIndex(self, name : str, info : dict):
+        fields = [f for f, _ in info["key"]]
+        current = self._getFields()
+        columns = [r[1] for r in self._conn.execute("PRAGMA table_info({})".format(self._table))]
+        nfields = [f for f in fields if f != "_id" and f not in current]
+        for f in nfields:
+            if "f${}".format(f) not in columns:
+                self._conn.execute("ALTER TABLE {} ADD COLUMN {}".format(self._table, _column(f)))
+        if len(nfields) > 0:
+            self._fill(nfields)
+        if info.get("unique", False):
+            self._checkUniqueAll(name, info)
+        # a partial unique index is enforced by _checkUnique alone, as
+        # SQLite cannot evaluate its filter on the documents
+        unique = "UNIQUE " if info.get("unique", False) and "partialFilterExpression" not in info else ""
+        sql = "CREATE {}INDEX {} ON {} ({})".format(unique, _quote("{}${}".format(self.name, name)), self._table,
+                                                   ", ".join(["_id" if f == "_id" else _column(f) for f in fields]))
+        try:
+            self._conn.execute(sql)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError("E11000 duplicate key error building index {}: {}".format(name, e), 11000)
+        self._conn.execute("INSERT INTO {} (collection, name, info) VALUES (?, ?, ?)".format(_INDEXES_TABLE),
+                           (self.name, name, BSON.encode(dict(info, key=[list(k) for k in info["key"]]))))
+        self._indexes = None
+        self._fields = None
+
+    def _checkUnique(self, doc : dict):
+        """Raise DuplicateKeyError if doc has the key of another document
+        in a unique index SQLite does not enforce for it"""
+        for name, info in self._getIndexes().items():
+            if not info.get("unique", False):
+                continue
+            fields = [f for f, _ in info["key"] if f != "_id"]
+            partial = info.get("partialFilterExpression")
+            if len(fields) == 0 or (partial is None and not self._hasNonScalars(doc, fields)):
+                continue
+            if partial is not None and not qe.compileFilter(partial)(doc):
+                continue
+            for key in _uniqueKeys(doc, fields):
+                kfilter = dict(zip(fields, key))
+                if partial is not None:
+                    kfilter = {"$and": [kfilter, partial]}
+                if any([d["_id"] != doc["_id"] for d in self._select(kfilter)]):
+                    raise DuplicateKeyError("E11000 duplicate key error collection: {} index: {}".format(self.name, name), 11000)
+
+    def _hasNonScalars(self, doc : dict, fields : List[str]) -> bool:
+        for f in fields:
+            values = qe.resolve(doc, f)
+            if len(values) > 1 or (len(values) == 1 and _sqlValue(values[0]) is _NOT_SCALAR):
+                return True
+        sql = "SELECT 1 FROM {} WHERE field IN ({}) AND value = ? LIMIT 1".format(self._mktable,
+                                                                              ", ".join(["?"] * len(fields)))
+        return self._conn.execute(sql, fields + [_NON_SCALAR]).fetchone() is not None
+
+    def _checkUniqueAll(self, name : str, info : dict):
+        # The stored documents are checked before the index is created
+        # for the keys SQLite would not see
+        fields = [f for f, _ in info["key"] if f != "_id"]
+        if len(fields) == 0:
+            return
+        partial = info.get("partialFilterExpression")
+        pred = None if partial is None else qe.compileFilter(partial)
+        seen = {}
+        for doc, in self._conn.execute("SELECT doc FROM {}".format(self._table)):
+            doc = BSON(doc).decode()
+            if pred is not None and not pred(doc):
+                continue
+            docKey = util.freeze(doc["_id"])
+            for key in _uniqueKeys(doc, fields):
+                if seen.setdefault(util.freeze(key), docKey) != docKey:
+                    raise DuplicateKeyError("E11000 duplicate key error building index {}".format(name), 11000)
+
+    def _fill(self, fields : List[str]):
+        # Set the columns of fields newly indexed from the stored documents
+        rows = self._conn.execute("SELECT _seq, doc FROM {}".format(self._table)).fetchall()
+        sql = "UPDATE {} SET {} WHERE _seq = ?".format(self._table, ", ".join(["{} = ?".format(_column(f)) for f in fields]))
+        self._conn.execute("DELETE FROM {} WHERE field IN ({})".format(self._mktable, ", ".join(["?"] * len(fields))), fields)
+        for seq, doc in rows:
+            cols, mkvalues = self._columnValues(BSON(doc).decode(), fields)
+            self._conn.execute(sql, cols + [seq])
+            self._insertMultikeys(seq, mkvalues)
+
+    def _columnValues(self, doc : dict, fields : List[str]) -> Tuple[list, list]:
+        """Get the index column values of doc and its array elements
+
+        A field holding a scalar is stored in its column, _NULL if it
+        is null or missing. Otherwise the column is NULL and the scalar
+        elements of an array are returned as (field, value) pairs for
+        the multikey table, along with a _NON_SCALAR pair.
+        """
+        cols = []
+        mkvalues = []
+        for f in fields:
+            values = qe.resolve(doc, f)
+            v = _sqlValue(values[0]) if len(values) == 1 else _NOT_SCALAR
+            if len(values) == 0:
+                v = _NULL
+            if v is _NOT_SCALAR:
+                v = None
+                mkvalues.append((f, _NON_SCALAR))
+                for e in values:
+                    for ee in (e if isinstance(e, list) else [e]):
+                        sv = _sqlValue(ee)
+                        if sv is not _NOT_SCALAR:
+                            mkvalues.append((f, sv))
+            cols.append(v)
+        return cols, mkvalues
+
+    def _insertMultikeys(self, seq : int, mkvalues : list):
+        if len(mkvalues) > 0:
+            self._conn.executemany("INSERT INTO {} (field, value, seq) VALUES (?, ?, ?)".format(self._mktable),
+                                   [(f, v, seq) for f, v in set(mkvalues)])
+
+    def _plan(self, filter : dict) -> List[Tuple[str, list, Callable[[dict], bool]]]:
+        """Get SQL conditions selecting the documents that may match filter
+
+        The result is a list of (condition, parameters, predicate), one
+        for each branch of an $or, and a document matches filter if it
+        is selected by a condition and passes its predicate. None is
+        returned if the indexes cannot narrow the documents down.
+        """
+        cons = qe.equalityConstraints(filter)
+        conds = []
+        params = []
+        if "_id" in cons and len(cons["_id"]) <= _MAX_PARAMS:
+            conds.append("_id IN ({})".format(", ".join(["?"] * len(cons["_id"]))))
+            params.extend([_idKey(v) for v in cons["_id"]])
+        for f in self._getFields():
+            if f not in cons:
+                continue
+            values = [_sqlValue(v) for v in cons[f]]
+            if any([v is _NOT_SCALAR for v in values]):
+                continue
+            # the values are passed as one JSON array parameter so that
+            # long $in lists do not run into the parameter limit
+            jvalues = json.dumps([v for v in values if v != _NULL])
+            cond = "{col} IN (SELECT value FROM json_each(?)) OR _seq IN (SELECT seq FROM {mk} WHERE field = ? " \
+                   "AND value IN (SELECT value FROM json_each(?)))".format(col=_column(f), mk=self._mktable)
+            params.extend([jvalues, f, jvalues])
+            if _NULL in values:
+                # null also matches the arrays, whose column is NULL
+                cond = "{col} OR {c} = ? OR {c} IS NULL".format(col=cond, c=_column(f))
+                params.append(_NULL)
+            conds.append("({})".format(cond))
+        if len(conds) > 0:
+            return [(" AND ".join(conds), params, qe.compileFilter(filter))]
+        if "$or" in filter:
+            pred = qe.compileFilter(dict([(k, v) for k, v in filter.items() if k != "$or"]))
+            plans = []
+            for branch in filter["$or"]:
+                bplans = self._plan(branch)
+                if bplans is None:
+                    return None
+                plans.extend([(bwhere, bparams, _both(pred, bpred)) for bwhere, bparams, bpred in bplans])
+            return plans
+        return None
+
+def _both(pred1 : Callable[[dict], bool], pred2 : Callable[[dict], bool]) -> Callable[[dict], bool]:
+    return lambda doc: pred1(doc) and pred2(doc)
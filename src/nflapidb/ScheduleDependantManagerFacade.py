@@ -1,10 +1,15 @@
 from typing import List, abstractmethod
 import logging
+import datetime
 import nflapi.Client
 from nflapidb.EntityManager import EntityManager
 from nflapidb.DataManagerFacade import DataManagerFacade
 from nflapidb.ScheduleManagerFacade import ScheduleManagerFacade
 from nflapidb.QueryModel import QueryModel, Operator
+import nflapidb.Utilities as util
+
+# The entity of the markers of the games whose data is fully saved
+SYNC_ENTITY_NAME = "game_sync"
 
 class ScheduleDependantManagerFacade(DataManagerFacade):
 
@@ -14,22 +19,85 @@ class ScheduleDependantManagerFacade(DataManagerFacade):
         super(ScheduleDependantManagerFacade, self).__init__(entityName, entityManager, apiClient)
         self._schmgr = scheduleManager
 
-    async def sync(self) -> List[dict]:
+    async def sync(self, chunkBy : str = None, collect : bool = True) -> List[dict]:
+        """Retrieve and save the data for the finished games not yet saved
+
+        Parameters
+        ----------
+        chunkBy : str
+            None to request all games at once, or game or week to
+            request and save the data one game or one week at a time.
+            When chunked, the next chunk is fetched while the current
+            one is saved. Once a chunk is fully saved its finished
+            games are marked as synced, so an interrupted sync resumes
+            with the games not yet marked.
+        collect : bool
+            If False the saved records are not accumulated and an
+            empty list is returned, keeping memory bounded by the
+            chunk size
+
+        Returns
+        -------
+        list of dict
+            The saved records
+        """
         logging.info("Syncing {} data...".format(self._entity_name))
-        cur = await self.find()
-        if len(cur) > 0:
-            gsidqm = QueryModel()
-            gsidqm.sinclude(["gsis_id"])
-            cgsidd = await self.find(qm=gsidqm)
-            cgsids = list(set([r["gsis_id"] for r in cgsidd]))
-            schqm = QueryModel()
-            schqm.cstart("finished", True)
-            if len(cgsids) > 0:
-                schqm.cand("gsis_id", cgsids, Operator.NIN)
-            sch = await self._scheduleManager.find(qm=schqm)
+        sch = await self._findUnsyncedSchedules()
+        chunks = self._chunkSchedules(sch, chunkBy)
+        data = []
+        gcnt = 0
+        async for schunk, sdata in self._iterAPIChunks(self._queryAPI, chunks):
+            sdata = await self.save(sdata)
+            await self._markSynced([s["gsis_id"] for s in schunk if s.get("finished")])
+            if collect:
+                data.extend(sdata)
+            gcnt += len(schunk)
+            if len(chunks) > 1:
+                logging.info("{} data saved for {} of {} games".format(self._entity_name, gcnt, len(sch)))
+        return data
+
+    async def _findUnsyncedSchedules(self) -> List[dict]:
+        # A game is synced once it is marked and has saved records, so
+        # the games of a partly saved chunk, and those of a dropped
+        # collection whose markers remain, are requested again. The
+        # games are found on the server so the cost scales with the
+        # number of games rather than records.
+        cgsids = await self.distinct("gsis_id")
+        if len(cgsids) == 0:
+            return await self._scheduleManager.find()
+        mgsids = await self._entityManager.distinct(SYNC_ENTITY_NAME, "gsis_id",
+                                                    {"entity_name": self._entity_name})
+        if len(mgsids) == 0:
+            # the data was saved before games were marked, so its games
+            # are taken as synced, as they were then, and marked once
+            await self._markSynced(cgsids)
+            sgsids = cgsids
+        else:
+            sgsids = list(set(mgsids).intersection(cgsids))
+        schqm = QueryModel()
+        schqm.cstart("finished", True)
+        schqm.cand("gsis_id", sgsids, Operator.NIN)
+        return await self._scheduleManager.find(qm=schqm)
+
+    async def _markSynced(self, gsids : List[str]):
+        sdate = datetime.datetime.utcnow()
+        markers = [{"entity_name": self._entity_name, "gsis_id": gsid, "sync_date": sdate} for gsid in gsids]
+        if len(markers) > 0:
+            await self._entityManager.bulkSave(SYNC_ENTITY_NAME, markers)
+
+    def _chunkSchedules(self, schedules : List[dict], chunkBy : str = None) -> List[List[dict]]:
+        if chunkBy is None:
+            chunks = util.chunk(schedules)
+        elif chunkBy == "game":
+            chunks = util.chunk(schedules, 1)
+        elif chunkBy == "week":
+            chunks = []
+            if len(schedules) > 0:
+                wkmap = util.getleafs(util.todict(schedules, ["season", "season_type", "week"]))
+                chunks = list(wkmap.values())
         else:
-            sch = await self._scheduleManager.find()
-        return await self.save(self._queryAPI(sch))
+            raise ValueError("chunkBy must be None, game or week, not {}".format(chunkBy))
+        return chunks
 
     @abstractmethod
     def _queryAPI(self, schedules : List[dict]) -> List[dict]:
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import datetime
 import logging
 import nflapi.Client
@@ -12,6 +12,7 @@ class ScheduleManagerFacade(DataManagerFacade):
     def __init__(self, entityManager : EntityManager,
                  apiClient : nflapi.Client.Client = None):
         super(ScheduleManagerFacade, self).__init__("schedule", entityManager, apiClient)
+        self._process_date = datetime.datetime.today()
         self._min_season = 2017
 
     async def sync(self, all : bool = False) -> List[dict]:
@@ -20,8 +21,9 @@ class ScheduleManagerFacade(DataManagerFacade):
         aqf = await self._getAPIQueryFilter()
         if aqf is not None:
             logging.info("Retrieving schedules from NFL API...")
-            for f in aqf:
-                schedule = self._apiClient.getSchedule(**f)
+            def getSchedule(filters : List[dict]) -> List[dict]:
+                return self._apiClient.getSchedule(**filters[0])
+            async for _, schedule in self._iterAPI(getSchedule, aqf, 1):
                 schedules.extend(await self.save(schedule))
         return schedules
 
@@ -46,25 +48,13 @@ class ScheduleManagerFacade(DataManagerFacade):
         if qm is not None:
             recs = await super(ScheduleManagerFacade, self).find(qm=qm)
         elif last:
-            recs = await self.find(finished=True)
-            if len(recs) > 0:
-                recs = self._filterLastWeek(recs)
+            recs = await self._findWeek(finished=True)
         elif next:
-            recs = await self.find(finished=False)
-            if len(recs) > 0:
-                recs = self._filterFirstWeek(recs)
+            recs = await self._findWeek(finished=False)
         else:
             if finished is not None:
                 finished = [finished]
-            if weeks is not None and season_types is not None and season_types == ["postseason"]:
-                # we allow postseason weeks to be specified either
-                # in the range 1 to 4, or 18 to 22
-                for i in range(0, len(weeks)):
-                    if weeks[i] < 18:
-                        if weeks[i] == 4:
-                            weeks[i] = 22
-                        else:
-                            weeks[i] += 17
+            weeks = self._normalizeWeeks(season_types, weeks)
             recs = await super(ScheduleManagerFacade, self).find(teams=teams,
                                                                  seasons=seasons,
                                                                  season_types=season_types,
@@ -72,6 +62,23 @@ class ScheduleManagerFacade(DataManagerFacade):
                                                                  finished=finished)
         return recs
 
+    def stream(self, qm : QueryModel = None,
+               teams : List[str] = None,
+               seasons : List[int] = None,
+               season_types : List[str] = None,
+               weeks : List[int] = None,
+               finished : bool = None,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        if finished is not None:
+            finished = [finished]
+        return super(ScheduleManagerFacade, self).stream(qm=qm, teams=teams,
+                                                         seasons=seasons,
+                                                         season_types=season_types,
+                                                         weeks=self._normalizeWeeks(season_types, weeks),
+                                                         finished=finished,
+                                                         batchSize=batchSize,
+                                                         chunkSize=chunkSize)
+
     async def delete(self, teams : List[str] = None,
                      seasons : List[int] = None,
                      season_types : List[str] = None,
@@ -82,39 +89,30 @@ class ScheduleManagerFacade(DataManagerFacade):
                                                                weeks=weeks)
 
     async def _getAPIQueryFilter(self) -> List[dict]:
-        ufdata = await self.find(finished=False)
+        s = util.getSeason(self._process_date)
+        st = "postseason"
+        stats = await self._getSyncStatistics(s, st)
         qf = None
-        if len(ufdata) > 0:
+        if len(stats["unfinished"]) > 0:
             qf = []
-            qd = {}
-            for d in ufdata:
-                cd = qd
-                for k in ["season", "season_type", "week"]:
-                    if not d[k] in cd:
-                        cd[d[k]] = {}
-                    cd = cd[d[k]]
-            for s in qd:
-                for st in qd[s]:
-                    for w in qd[s][st]:
-                        if st == "postseason" and w > 17:
-                            if w == 22:
-                                w = 4
-                            else:
-                                w = w - 17
-                        qf.append({"season": s, "season_type": st, "week": w})
-        elif len(await self.find(finished=True)) == 0 or len(await self.find()) == 0:
-            qf = [{"season": s} for s in range(self._min_season, util.getSeason() + 1)]
-        elif len(await self.find(seasons=[util.getSeason()])) == 0:
+            for d in stats["unfinished"]:
+                w = d["week"]
+                if d["season_type"] == "postseason" and w > 17:
+                    if w == 22:
+                        w = 4
+                    else:
+                        w = w - 17
+                qf.append({"season": d["season"], "season_type": d["season_type"], "week": w})
+        elif not (stats["finished"] and stats["any"]):
+            qf = [{"season": ssn} for ssn in range(self._min_season, s + 1)]
+        elif not stats["season"]:
             # We don't have data for the current season so we need to query it
-            qf = [{"season": util.getSeason()}]
+            qf = [{"season": s}]
         else:
-            s = util.getSeason()
-            st = "postseason"
-            psrecs = await self.find(seasons=[s], season_types=[st])
-            if len(psrecs) < 11:
+            if stats["postseason_count"] < 11:
                 # more postseason games to come
                 qf = []
-                wks = set([r["week"] for r in psrecs])
+                wks = stats["postseason_weeks"]
                 mw = 1
                 if len(wks) > 0:
                     mw = min(wks) + 1
@@ -122,6 +120,64 @@ class ScheduleManagerFacade(DataManagerFacade):
                     qf.append({"season": s, "season_type": st, "week": w})
         return qf
 
+    async def _getSyncStatistics(self, season : int, seasonType : str) -> dict:
+        """Get the statistics used to plan a sync in one aggregation
+
+        Returns
+        -------
+        dict
+            unfinished: the season, season_type and week of the weeks
+                with unfinished games in chronological order
+            any: whether there is any schedule data
+            finished: whether there are any finished games
+            season: whether there is data for season
+            postseason_count: the number of seasonType games in season
+            postseason_weeks: the set of seasonType weeks in season
+        """
+        def exists(match : dict) -> list:
+            stages = []
+            if match is not None:
+                stages.append({"$match": match})
+            return stages + [{"$limit": 1}, {"$count": "n"}]
+        pipeline = [{"$facet": {
+            "unfinished": [
+                {"$match": {"finished": False}},
+                {"$group": {"_id": {"season": "$season", "season_type": "$season_type", "week": "$week"},
+                            "first_gsis_id": {"$min": "$gsis_id"}}},
+                {"$sort": {"first_gsis_id": 1}}
+            ],
+            "any": exists(None),
+            "finished": exists({"finished": True}),
+            "season": exists({"season": season}),
+            "postseason": [
+                {"$match": {"season": season, "season_type": seasonType}},
+                {"$group": {"_id": "$week", "n": {"$sum": 1}}}
+            ]
+        }}]
+        rslt = await self.aggregate(pipeline)
+        facets = rslt[0] if len(rslt) > 0 else {}
+        psweeks = facets.get("postseason", [])
+        return {
+            "unfinished": [d["_id"] for d in facets.get("unfinished", [])],
+            "any": len(facets.get("any", [])) > 0,
+            "finished": len(facets.get("finished", [])) > 0,
+            "season": len(facets.get("season", [])) > 0,
+            "postseason_count": sum([d["n"] for d in psweeks]),
+            "postseason_weeks": set([d["_id"] for d in psweeks])
+        }
+
+    def _normalizeWeeks(self, season_types : List[str], weeks : List[int]) -> List[int]:
+        if weeks is not None and season_types is not None and season_types == ["postseason"]:
+            # we allow postseason weeks to be specified either
+            # in the range 1 to 4, or 18 to 22
+            for i in range(0, len(weeks)):
+                if weeks[i] < 18:
+                    if weeks[i] == 4:
+                        weeks[i] = 22
+                    else:
+                        weeks[i] += 17
+        return weeks
+
     def _getQueryModel(self, **kwargs) -> QueryModel:
         qm = QueryModel()
         if kwargs["teams"] is not None:
@@ -137,18 +193,24 @@ class ScheduleManagerFacade(DataManagerFacade):
                 qm.cand(name, cmap[name], Operator.IN)
         return qm
 
-    def _filterLastWeek(self, recs : List[dict]) -> dict:
-        recs = self._sortSchedules(recs)
-        mrec = recs[len(recs)-1]
-        return [r for r in recs if r["season"]==mrec["season"] and r["season_type"]==mrec["season_type"] and r["week"]==mrec["week"]]
-
-    def _filterFirstWeek(self, recs : List[dict]) -> dict:
-        recs = self._sortSchedules(recs)
-        mrec = recs[0]
-        return [r for r in recs if r["season"]==mrec["season"] and r["season_type"]==mrec["season_type"] and r["week"]==mrec["week"]]
+    async def _findWeek(self, finished : bool) -> List[dict]:
+        """Get the games of the last finished or first unfinished week
 
-    def _sortSchedules(self, recs : List[dict]) -> List[dict]:
-        def skey(rec) -> float:
-            return int(rec["gsis_id"])
-        recs.sort(key=skey)
-        return recs
\ No newline at end of file
+        The boundary game is found with an indexed sort and limit on
+        gsis_id, which orders chronologically as the ids are fixed
+        width date based strings, and then only its week is read.
+        """
+        gqm = QueryModel()
+        gqm.cstart("finished", finished)
+        gqm.sinclude(["season", "season_type", "week"])
+        gqm.orderBy("gsis_id", ascending=not finished)
+        gqm.limit = 1
+        recs = await super(ScheduleManagerFacade, self).find(qm=gqm)
+        if len(recs) > 0:
+            wqm = QueryModel()
+            wqm.cstart("finished", finished)
+            for k in ["season", "season_type", "week"]:
+                wqm.cand(k, recs[0][k])
+            wqm.orderBy("gsis_id")
+            recs = await super(ScheduleManagerFacade, self).find(qm=wqm)
+        return recs
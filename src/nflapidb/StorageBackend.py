@@ -0,0 +1,35 @@
+from typing import Any
+import abc
+from abc import abstractmethod
+
+class StorageBackend(abc.ABC):
+    """Storage for an EntityManager other than a MongoDB server
+
+    EntityManager works with a database object. A MongoDB backed
+    EntityManager uses a motor AsyncIOMotorDatabase, and a backend
+    provides an object with the subset of that interface which
+    EntityManager relies on:
+
+    - list_collection_names(filter) and drop_collection(name)
+      coroutines, create_collection(name, **kwargs) and db[name]
+      to get a collection
+    - watch(pipeline), which may raise OperationFailure to make
+      CacheWatcher fall back to polling
+
+    and collections with the find (returning a cursor supporting
+    sort, limit, batch_size and async iteration), find_one_and_replace,
+    bulk_write of ReplaceOne requests, update_one, delete_many,
+    distinct, aggregate, count_documents, index_information,
+    create_indexes and drop_index methods, the coroutines among
+    them being those that are coroutines in motor.
+    """
+
+    @property
+    @abstractmethod
+    def database(self) -> Any:
+        """The database object"""
+        pass
+
+    def close(self):
+        """Release the resources of the backend"""
+        pass
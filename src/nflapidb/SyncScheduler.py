@@ -0,0 +1,99 @@
+from typing import List, Callable, Awaitable
+import asyncio
+import logging
+import time
+
+class SyncScheduler:
+    """Run named asynchronous stages in dependency order
+
+    Each stage is started as soon as all of the stages it depends
+    on have finished, with at most concurrency stages running at
+    once. A stage that fails causes the stages depending on it to
+    be skipped, while independent stages continue to run.
+    """
+
+    def __init__(self, concurrency : int = 4):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._concurrency = concurrency
+        self._stages = {}
+
+    def add(self, name : str, func : Callable[[], Awaitable], dependencies : List[str] = None):
+        """Add a stage
+
+        Parameters
+        ----------
+        name : str
+            The unique name of the stage
+        func : callable
+            A function returning the awaitable that performs the stage
+        dependencies : list of str
+            The names of the stages that must complete first
+        """
+        if name in self._stages:
+            raise ValueError("stage {} already added".format(name))
+        if dependencies is None:
+            dependencies = []
+        self._stages[name] = (func, list(dependencies))
+        return self
+
+    async def run(self) -> dict:
+        """Run all stages
+
+        Returns
+        -------
+        dict
+            A dict keyed by stage name with a dict value holding the
+            stage status (ok, failed or skipped), the elapsed seconds
+            and, for stages that did not complete, the error message
+        """
+        self._validate()
+        sem = asyncio.Semaphore(self._concurrency)
+        report = dict([(name, None) for name in self._stages])
+        tasks = {}
+
+        async def runStage(name : str):
+            func, deps = self._stages[name]
+            if len(deps) > 0:
+                await asyncio.gather(*[tasks[d] for d in deps])
+            failed = [d for d in deps if report[d]["status"] != "ok"]
+            if len(failed) > 0:
+                logging.info("Skipping {} sync; {} did not complete".format(name, ", ".join(failed)))
+                report[name] = {"status": "skipped", "elapsed": 0.0,
+                                "error": "dependency not complete: {}".format(", ".join(failed))}
+                return
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    await func()
+                    report[name] = {"status": "ok", "elapsed": time.perf_counter() - start}
+                except Exception as e:
+                    logging.exception("{} sync failed".format(name))
+                    report[name] = {"status": "failed", "elapsed": time.perf_counter() - start,
+                                    "error": str(e)}
+            logging.info("{} sync {} in {:.3f}s".format(name, report[name]["status"], report[name]["elapsed"]))
+
+        for name in self._stages:
+            tasks[name] = asyncio.ensure_future(runStage(name))
+        await asyncio.gather(*tasks.values())
+        return report
+
+    def _validate(self):
+        for name in self._stages:
+            for dep in self._stages[name][1]:
+                if dep not in self._stages:
+                    raise ValueError("stage {} depends on unknown stage {}".format(name, dep))
+        visiting = set()
+        visited = set()
+        def visit(name : str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError("stage dependencies contain a cycle at {}".format(name))
+            visiting.add(name)
+            for dep in self._stages[name][1]:
+                visit(dep)
+            visiting.remove(name)
+            visited.add(name)
+        for name in self._stages:
+            visit(name)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, AsyncIterator
 import logging
 import nflapi.Client
 from nflapidb.EntityManager import EntityManager
@@ -20,6 +20,12 @@ class TeamManagerFacade(DataManagerFacade):
     async def find(self, teams : List[str] = None) -> List[dict]:
         return await super(TeamManagerFacade, self).find(teams=teams)
 
+    def stream(self, teams : List[str] = None,
+               batchSize : int = None, chunkSize : int = None) -> AsyncIterator:
+        return super(TeamManagerFacade, self).stream(teams=teams,
+                                                     batchSize=batchSize,
+                                                     chunkSize=chunkSize)
+
     async def delete(self, teams : List[str] = None) -> List[dict]:
         return await super(TeamManagerFacade, self).delete(teams=teams)
 
@@ -31,7 +37,7 @@ class TeamManagerFacade(DataManagerFacade):
     
     async def _findNewTeams(self) -> List[dict]:
         logging.info("Retrieving teams from NFL API...")
-        teams = self._apiClient.getTeams(active_only=False)
+        teams = await self._callAPI(self._apiClient.getTeams, active_only=False)
         cteams = await self.find()
         if len(cteams) > 0:
             tdiffs = util.ddquery(cteams, teams)
@@ -1,4 +1,4 @@
-from typing import List, Tuple, Coroutine
+from typing import Any, List, Tuple, Coroutine
 import re
 import asyncio
 import datetime
@@ -6,6 +6,10 @@ import datetime
 def ddquery(q : List[dict], data : List[dict]) -> Tuple[List[dict]]:
     """Find items in data matching items in q
     
+    The q items are indexed by their key set, with the values
+    hashed via freeze, so each data item is matched with one
+    lookup per distinct q key set rather than a scan of q.
+
     Parameters
     ----------
     q : list of dict
@@ -23,24 +27,73 @@ def ddquery(q : List[dict], data : List[dict]) -> Tuple[List[dict]]:
     m = []
     nm = []
     if len(data) > 0 and len(q) > 0:
+        qindex = _ddqueryIndex(q)
         for item in data:
             if not isinstance(item, dict):
                 raise Exception("ParameterTypeException: data is not list of dict")
-            dk = set(item.keys())
-            mi = False
-            for qitem in q:
-                if not isinstance(qitem, dict):
-                    raise Exception("ParameterTypeException: q is not list of dict")
-                qk = set(qitem.keys())
-                if qk.issubset(dk):
-                    mi = all([item[k] == qitem[k] for k in qk])
-                    if mi:
-                        m.append(item)
-                        break
-            if not mi:
+            if _ddqueryMatch(qindex, item):
+                m.append(item)
+            else:
                 nm.append(item)
     return (m, nm,)
 
+def _ddqueryIndex(q : List[dict]) -> List[tuple]:
+    # Each entry is the key set, the keys in a fixed order, the set
+    # of frozen value tuples and the q items whose values could not
+    # be hashed, which are compared the slow way
+    groups = {}
+    for qitem in q:
+        if not isinstance(qitem, dict):
+            raise Exception("ParameterTypeException: q is not list of dict")
+        qk = frozenset(qitem.keys())
+        if qk not in groups:
+            groups[qk] = (qk, tuple(qitem.keys()), set(), [])
+        group = groups[qk]
+        try:
+            group[2].add(tuple([freeze(qitem[k]) for k in group[1]]))
+        except TypeError:
+            group[3].append(qitem)
+    return list(groups.values())
+
+def _ddqueryMatch(qindex : List[tuple], item : dict) -> bool:
+    dk = item.keys()
+    for qk, keys, values, unhashed in qindex:
+        if qk <= dk:
+            try:
+                if tuple([freeze(item[k]) for k in keys]) in values:
+                    return True
+            except TypeError:
+                pass
+            for qitem in unhashed:
+                if all([item[k] == qitem[k] for k in keys]):
+                    return True
+    return False
+
+def freeze(v : Any) -> Any:
+    """Get a hashable equivalent of v
+
+    Lists are converted to tuples and dicts to sorted tuples
+    of their items, recursively, so that values read from or
+    written to the database can be used as dict keys.
+    """
+    if isinstance(v, (list, tuple)):
+        return tuple([freeze(i) for i in v])
+    if isinstance(v, dict):
+        return tuple(sorted([(k, freeze(i)) for k, i in v.items()], key=lambda t: t[0]))
+    return v
+
+def chunk(data : List[Any], size : int = None) -> List[List[Any]]:
+    """Split data into lists of at most size items
+
+    If size is None the result is a single chunk holding
+    all of the data, and an empty list if data is empty.
+    """
+    if len(data) == 0:
+        return []
+    if size is None or size >= len(data):
+        return [data]
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
 def str2bool(v : str) -> bool:
     return not (v is None or v == "" or re.search(r"^(f(alse)*|no*)$", v, flags=re.IGNORECASE) is not None)
 
@@ -0,0 +1,14 @@
+from nflapidb.Entity import Entity, PrimaryKey, Column
+
+class game_sync(Entity):
+    @PrimaryKey
+    def entity_name(self):
+        return "str"
+
+    @PrimaryKey
+    def gsis_id(self):
+        return "str"
+
+    @Column
+    def sync_date(self):
+        return "datetime"
@@ -1,6 +1,10 @@
 from nflapidb.Entity import Entity, PrimaryKey, Column, Index
+from nflapidb.IndexSpec import IndexSpec
 
 class schedule(Entity):
+    # supports the last and next week lookups
+    indexes = [IndexSpec(["finished", "gsis_id"])]
+
     @PrimaryKey
     def gsis_id(self):
         return "str"
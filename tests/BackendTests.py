@@ -0,0 +1,146 @@
+import os
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError
+from nflapidb.EntityManager import EntityManager
+from nflapidb.StorageBackend import StorageBackend
+import nflapidb.Utilities as util
+
+class BackendTests:
+    """The behaviour every storage backend shares with MongoDB
+
+    Mixed into a unittest.TestCase per backend, which implements
+    makeBackend.
+    """
+
+    def makeBackend(self) -> StorageBackend:
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        self.entmgr = EntityManager(dbName="nflapidb_ut", entityDirPath=self.entcfgdp, backend=self.makeBackend())
+
+    def tearDown(self):
+        self.entmgr.dispose()
+
+    def test_save_find_delete(self):
+        ename = "ut_table1"
+        data = [{"column1": "A", "column2": 1, "column3": 1.0}, {"column1": "B", "column2": 2, "column3": 1.0}]
+        async def run():
+            await self.entmgr.save(ename, [dict(d) for d in data])
+            await self.entmgr.save(ename, [{"column1": "B", "column2": 2, "column3": 2.0}])
+            found = await self.entmgr.find(ename, projection={"_id": False})
+            deleted = await self.entmgr.delete(ename, {"column1": {"$in": ["A"]}})
+            remaining = await self.entmgr.find(ename, projection={"_id": False})
+            return found, deleted, remaining
+        found, deleted, remaining = util.runCoroutine(run())
+        self.assertEqual(found, [data[0], {"column1": "B", "column2": 2, "column3": 2.0}])
+        self.assertEqual(deleted, 1)
+        self.assertEqual(remaining, [{"column1": "B", "column2": 2, "column3": 2.0}])
+
+    def test_bulkSave_reread(self):
+        ename = "ut_table1"
+        data = [{"column1": c, "column2": i, "column3": 1.0} for c in ["A", "B"] for i in range(0, 3)]
+        async def run():
+            await self.entmgr.bulkSave(ename, [dict(d) for d in data])
+            urecs = [dict(data[1], column3=2.0), dict(data[4], column3=3.0)]
+            return await self.entmgr.bulkSave(ename, urecs, reread=True)
+        rslt = util.runCoroutine(run())
+        self.assertEqual((rslt["matched"], rslt["modified"], rslt["upserted"]), (2, 2, 0))
+        self.assertEqual([d["column3"] for d in rslt["data"]], [2.0, 3.0])
+        self.assertTrue(all(["_id" in d for d in rslt["data"]]))
+
+    def test_primary_key_index(self):
+        ename = "ut_table1"
+        async def run():
+            await self.entmgr.save(ename, [{"column1": "A", "column2": 1, "column3": 1.0}])
+            col = await self.entmgr._getCollection(ename)
+            info = await col.index_information()
+            pkey = await self.entmgr._getPrimaryKey(ename, col)
+            with self.assertRaises(DuplicateKeyError):
+                await col.insert_one({"column1": "A", "column2": 1})
+            return info, pkey
+        info, pkey = util.runCoroutine(run())
+        self.assertEqual(sorted(pkey), ["column1", "column2"])
+        self.assertTrue(any([ix.get("unique", False) for ix in info.values()]))
+
+    def test_index_lookup(self):
+        col = self.entmgr._database["ut_lookup"]
+        async def run():
+            await col.insert_one({"team": "NE", "season": 2018, "week": 1, "tags": ["NE"]})
+            await col.create_indexes([IndexModel([("team", 1)]), IndexModel([("tags", 1)]),
+                                      IndexModel([("season", 1), ("week", 1)])])
+            await col.insert_many([{"team": t, "season": 2019, "week": w, "tags": [t, "x"]}
+                                   for t in ["KC", "DEN", "LV"] for w in range(1, 4)])
+            byor = await col.find({"$or": [{"team": "KC"}, {"season": 2019, "week": {"$in": [2]}}]},
+                                  projection={"_id": False, "team": True, "week": True}).to_list()
+            bytag = await col.count_documents({"tags": {"$in": ["NE", "LV"]}})
+            return byor, bytag
+        byor, bytag = util.runCoroutine(run())
+        self.assertEqual(byor, [{"team": "KC", "week": 1}, {"team": "KC", "week": 2},
+                                {"team": "KC", "week": 3}, {"team": "DEN", "week": 2},
+                                {"team": "LV", "week": 2}])
+        self.assertEqual(bytag, 4)
+
+    def test_unique_index_null_and_array_keys(self):
+        col = self.entmgr._database["ut_unique"]
+        async def run():
+            await col.create_indexes([IndexModel([("a", 1), ("b", 1)], unique=True, name="a_1_b_1"),
+                                      IndexModel([("tags", 1)], unique=True, name="tags_1")])
+            await col.insert_one({"a": 1, "tags": ["x", "y"]})
+            # a missing b is the key null, as is a null b
+            with self.assertRaises(DuplicateKeyError):
+                await col.insert_one({"a": 1, "tags": "z"})
+            with self.assertRaises(DuplicateKeyError):
+                await col.insert_one({"a": 1, "b": None, "tags": "z"})
+            with self.assertRaises(DuplicateKeyError):
+                await col.insert_one({"a": 2, "tags": "y"})
+            await col.insert_one({"a": 2, "tags": ["z", "z"]})
+            with self.assertRaises(DuplicateKeyError):
+                await col.replace_one({"a": 2}, {"a": 2, "tags": ["w", "x"]})
+            return await col.count_documents({})
+        self.assertEqual(util.runCoroutine(run()), 2)
+
+    def test_unique_index_partial(self):
+        col = self.entmgr._database["ut_unique"]
+        async def run():
+            await col.insert_many([{"k": 1, "active": True}, {"k": 1, "active": False}])
+            await col.create_indexes([IndexModel([("k", 1)], unique=True, name="k_1",
+                                                 partialFilterExpression={"active": True})])
+            await col.insert_one({"k": 1, "active": False})
+            with self.assertRaises(DuplicateKeyError):
+                await col.insert_one({"k": 1, "active": True})
+            await col.insert_one({"k": 2, "active": True})
+            with self.assertRaises(DuplicateKeyError):
+                await col.create_indexes([IndexModel([("k", 1)], unique=True, name="k_all")])
+            return await col.count_documents({})
+        self.assertEqual(util.runCoroutine(run()), 4)
+
+    def test_aggregate_and_distinct(self):
+        ename = "ut_table1"
+        data = [{"column1": c, "column2": i, "column3": float(i)} for c in ["A", "B"] for i in range(0, 3)]
+        async def run():
+            await self.entmgr.save(ename, data)
+            agg = await self.entmgr.aggregate(ename, [{"$group": {"_id": "$column1", "total": {"$sum": "$column3"}}},
+                                                      {"$sort": {"_id": -1}}])
+            dist = await self.entmgr.distinct(ename, "column2", {"column1": "A"})
+            return agg, dist
+        agg, dist = util.runCoroutine(run())
+        self.assertEqual(agg, [{"_id": "B", "total": 3.0}, {"_id": "A", "total": 3.0}])
+        self.assertEqual(sorted(dist), [0, 1, 2])
+
+    def test_aggregate_leading_match(self):
+        col = self.entmgr._database["ut_lookup"]
+        exported = []
+        export = col._export
+        def countExport(doc : dict) -> dict:
+            exported.append(doc)
+            return export(doc)
+        async def run():
+            await col.create_indexes([IndexModel([("team", 1)])])
+            await col.insert_many([{"team": t, "week": w} for t in ["KC", "DEN", "LV"] for w in range(1, 4)])
+            col._export = countExport
+            return await col.aggregate([{"$match": {"team": "KC"}},
+                                        {"$match": {"week": {"$gt": 1}}},
+                                        {"$group": {"_id": "$team", "weeks": {"$sum": 1}}}]).to_list()
+        self.assertEqual(util.runCoroutine(run()), [{"_id": "KC", "weeks": 2}])
+        self.assertEqual(len(exported), 3)
@@ -0,0 +1,73 @@
+import unittest
+import os
+import json
+import tempfile
+from nflapidb.Entity import Entity, PrimaryKey, Column
+from nflapidb.ArrowExport import ArrowTableBuilder, ParquetPartitionWriter
+import nflapidb.ArrowExport as ArrowExport
+
+@unittest.skipIf(ArrowExport.pa is None, "pyarrow is not installed")
+class TestArrowExport(unittest.TestCase):
+
+    def _getPlays(self) -> list:
+        with open(os.path.join(os.path.dirname(__file__), "data", "game_play_2019_reg_13.json"), "rt") as fp:
+            return json.load(fp)
+
+    def test_builder_types(self):
+        pa = ArrowExport.pa
+        class MyEntity(Entity):
+            @PrimaryKey
+            def gsis_id(self):
+                return "str"
+            @Column
+            def sequence(self):
+                return "int"
+        builder = ArrowTableBuilder(MyEntity())
+        builder.add([{"gsis_id": "1", "sequence": 1, "stat_value": 1, "desc": "a"}])
+        builder.add([{"gsis_id": "2", "sequence": 2, "stat_value": 1.5, "note": "b"}])
+        tbl = builder.build()
+        self.assertEqual(tbl.num_rows, 2)
+        self.assertEqual(tbl.schema.field("gsis_id").type, pa.dictionary(pa.int32(), pa.string()))
+        self.assertEqual(tbl.schema.field("sequence").type, pa.int64())
+        self.assertEqual(tbl.schema.field("stat_value").type, pa.float64())
+        self.assertEqual(tbl.column("stat_value").to_pylist(), [1.0, 1.5])
+        self.assertEqual(tbl.column("desc").to_pylist(), ["a", None])
+        self.assertEqual(tbl.column("note").to_pylist(), [None, "b"])
+
+    def test_builder_conflicting_types_become_strings(self):
+        builder = ArrowTableBuilder()
+        builder.add([{"x": 1}])
+        builder.add([{"x": "a"}])
+        self.assertEqual(builder.build().column("x").to_pylist(), ["1", "a"])
+
+    def test_builder_plays(self):
+        plays = self._getPlays()
+        builder = ArrowTableBuilder()
+        for i in range(0, len(plays), 500):
+            builder.add(plays[i:i + 500])
+        tbl = builder.build()
+        self.assertEqual(tbl.num_rows, len(plays))
+        self.assertEqual(tbl.column("stat_desc").to_pylist(), [p["stat_desc"] for p in plays])
+        self.assertEqual(tbl.column("stat_also").to_pylist(), [p.get("stat_also") for p in plays])
+
+    def test_partition_writer(self):
+        pq = ArrowExport.pq
+        plays = self._getPlays()
+        for play in plays:
+            play["season"] = 2019
+            play["week"] = 13 if play["gsis_id"] < "2019120108" else 14
+        plays.sort(key=lambda p: p["gsis_id"])
+        with tempfile.TemporaryDirectory() as tdir:
+            writer = ParquetPartitionWriter(tdir, ["season", "week"])
+            for i in range(0, len(plays), 300):
+                writer.add(plays[i:i + 300])
+            writer.flush()
+            xfiles = [os.path.join(tdir, "season=2019", "week={}".format(w), "part-0.parquet")
+                      for w in sorted(set([p["week"] for p in plays]))]
+            self.assertEqual(writer.files, xfiles)
+            nrows = 0
+            for fpath in writer.files:
+                tbl = pq.read_table(fpath)
+                self.assertNotIn("season", tbl.column_names)
+                nrows += tbl.num_rows
+            self.assertEqual(nrows, len(plays))
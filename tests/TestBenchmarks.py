@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmarks.Measurement import Measurement, percentile, compare
+from benchmarks.Suite import Suite, FIXTURES
+from nflapidb.EntityManager import EntityManager
+from nflapidb.MemoryBackend import MemoryBackend
+from nflapidb.ReplayApiClient import ReplayApiClient
+import nflapidb.Utilities as util
+
+class TestBenchmarks(unittest.TestCase):
+
+    def _results(self, **stats) -> dict:
+        rslt = {"records_per_sec": 1000.0, "p95_ms": 10.0, "peak_traced_bytes": 4096}
+        rslt.update(stats)
+        return {"results": {"roster.save": rslt}}
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(percentile([4, 1, 3, 2], 0), 1)
+        self.assertEqual(percentile([4, 1, 3, 2], 100), 4)
+        self.assertAlmostEqual(percentile(list(range(1, 101)), 95), 95.05)
+
+    def test_summary(self):
+        m = Measurement("roster", "find")
+        async def find():
+            return [{}, {}]
+        util.runCoroutine(m.time(find()))
+        util.runCoroutine(m.time(find()))
+        s = m.summary()
+        self.assertEqual(m.key, "roster.find")
+        self.assertEqual((s["samples"], s["records"]), (2, 4))
+        self.assertEqual(s["p50_ms"], percentile(m.latencies, 50) * 1000.0)
+        self.assertIsNone(Measurement("roster", "find").summary()["p95_ms"])
+
+    def test_compare_within_tolerance(self):
+        base = self._results()
+        cur = self._results(records_per_sec=800.0, p95_ms=12.0, peak_traced_bytes=5000)
+        self.assertEqual(compare(base, cur), [])
+
+    def test_compare_regressions(self):
+        base = self._results()
+        cur = self._results(records_per_sec=500.0, p95_ms=20.0, peak_traced_bytes=8192)
+        rslt = compare(base, cur)
+        self.assertEqual([r.split(" ")[1] for r in rslt], ["records_per_sec", "p95_ms", "peak_traced_bytes"])
+        self.assertEqual(rslt[0], "roster.save records_per_sec 1000 -> 500 (-50%)")
+        self.assertEqual(compare(base, cur, tolerance=1.5), [])
+
+    def test_compare_improvements(self):
+        base = self._results()
+        cur = self._results(records_per_sec=5000.0, p95_ms=1.0, peak_traced_bytes=1024)
+        self.assertEqual(compare(base, cur), [])
+
+    def test_compare_skips_missing(self):
+        base = self._results(peak_traced_bytes=None, p95_ms=0)
+        cur = self._results(records_per_sec=None, p95_ms=50.0, peak_traced_bytes=8192)
+        cur["results"]["team.save"] = {"records_per_sec": 1.0}
+        self.assertEqual(compare(base, cur), [])
+
+    def test_suite_season(self):
+        apiClient = ReplayApiClient(os.path.join(os.path.dirname(__file__), "data"), files=FIXTURES)
+        entmgr = EntityManager(dbName="nflapidb_bench_ut", backend=MemoryBackend())
+        try:
+            suite = Suite(entmgr, apiClient, repeat=1, warmup=0, traceMemory=False, season=2018)
+            ms = util.runCoroutine(suite.run(["schedule"], ["sync"]))
+        finally:
+            entmgr.dispose()
+        seasons = [args["season"] for method, args in apiClient.requests if method == "getSchedule"]
+        self.assertEqual(seasons, [2017, 2018])
+        self.assertEqual(ms[0].records, len([r for r in apiClient.records("schedule") if r["season"] <= 2018]))
@@ -0,0 +1,161 @@
+import unittest
+import asyncio
+import logging
+from pymongo.errors import OperationFailure, PyMongoError
+from nflapidb.CacheWatcher import CacheWatcher, VERSION_COLLECTION
+from nflapidb.EntityManager import EntityManager
+from nflapidb.MemoryBackend import MemoryBackend
+import nflapidb.Utilities as util
+
+class TestCacheWatcher(unittest.TestCase):
+
+    def test_changestream_invalidates(self):
+        db = MockDatabase(changes=[{"ns": {"db": "x", "coll": "team"}},
+                                   {"ns": {"db": "x", "coll": "roster"}}])
+        changed = []
+        async def run():
+            watcher = CacheWatcher(db, changed.append, ["team", "roster"], pollInterval=0.01)
+            watcher.start()
+            await asyncio.sleep(0.05)
+            mode = watcher.mode
+            await watcher.stop()
+            return mode
+        self.assertEqual(util.runCoroutine(run()), "changestream")
+        # invalidated as it started, then by the changes
+        self.assertEqual(changed, ["team", "roster"] * 2)
+        self.assertEqual(db.pipeline[0]["$match"]["$or"][0], {"ns.coll": {"$in": ["team", "roster"]}})
+
+    def test_changestream_drop_invalidates_all(self):
+        db = MockDatabase(changes=[{"operationType": "dropDatabase", "ns": {"db": "x"}},
+                                   {"operationType": "invalidate"}], ends=True)
+        changed = []
+        async def run():
+            watcher = CacheWatcher(db, changed.append, ["team", "roster"], pollInterval=0.01)
+            watcher.start()
+            await asyncio.sleep(0.05)
+            watcher.cancel()
+            return watcher.running
+        self.assertFalse(util.runCoroutine(run()))
+        # started, dropped, invalidated, then the stream ended and was reopened
+        self.assertEqual(changed, ["team", "roster"] * 4)
+        self.assertEqual(db.watches, 2)
+
+    def test_falls_back_to_polling(self):
+        db = MockDatabase(changes=None)
+        db.versions = {"team": 1, "roster": 1}
+        changed = []
+        async def run():
+            watcher = CacheWatcher(db, changed.append, ["team", "roster", "schedule"], pollInterval=0.01)
+            watcher.start()
+            await asyncio.sleep(0.05)
+            self.assertEqual(changed, ["team", "roster", "schedule"])
+            db.versions = {"team": 2, "roster": 1, "schedule": 1}
+            await asyncio.sleep(0.05)
+            mode = watcher.mode
+            await watcher.stop()
+            return mode
+        self.assertEqual(util.runCoroutine(run()), "polling")
+        self.assertEqual(changed, ["team", "roster", "schedule", "team", "schedule"])
+
+    def test_polling_retries_first_read(self):
+        db = MockDatabase(changes=None)
+        db.versions = {"team": 1}
+        db.failedReads = 1
+        changed = []
+        async def run():
+            watcher = CacheWatcher(db, changed.append, ["team"], pollInterval=0.01, usePolling=True)
+            watcher.start()
+            await asyncio.sleep(0.05)
+            db.versions = {"team": 2}
+            await asyncio.sleep(0.05)
+            await watcher.stop()
+        util.runCoroutine(run())
+        self.assertEqual(db.failedReads, 0)
+        self.assertEqual(changed, ["team", "team"])
+
+    def test_polling_warns_without_versions(self):
+        db = MockDatabase(changes=None)
+        changed = []
+        async def run():
+            watcher = CacheWatcher(db, changed.append, ["team"], pollInterval=0.01, usePolling=True)
+            watcher.start()
+            await asyncio.sleep(0.05)
+            await watcher.stop()
+        with self.assertLogs(level=logging.WARNING) as cm:
+            util.runCoroutine(run())
+        self.assertEqual(len(cm.records), 1)
+        self.assertIn("trackVersions", cm.records[0].getMessage())
+        self.assertEqual(changed, ["team"])
+
+    def test_entity_manager_tracks_versions(self):
+        entmgr = EntityManager(dbName="nflapidb_ut", backend=MemoryBackend())
+        async def run():
+            self.assertFalse(entmgr.trackVersions)
+            entmgr.startWatcher(["team"], pollInterval=0.01, usePolling=True)
+            await entmgr.save("team", [{"team": "KC"}])
+            versions = await entmgr._database[VERSION_COLLECTION].find({}).to_list()
+            await entmgr.stopWatcher()
+            return versions
+        try:
+            versions = util.runCoroutine(run())
+        finally:
+            entmgr.dispose()
+        self.assertTrue(entmgr.trackVersions)
+        self.assertEqual(versions, [{"_id": "team", "version": 1}])
+
+class MockChangeStream:
+    def __init__(self, changes, ends):
+        self._changes = changes
+        self._ends = ends
+
+    async def __aenter__(self):
+        if self._changes is None:
+            raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for change in self._changes:
+            yield change
+        if not self._ends:
+            await asyncio.sleep(3600)
+
+class MockVersionCollection:
+    def __init__(self, db):
+        self._db = db
+
+    def find(self, query):
+        async def docs():
+            if self._db.failedReads > 0:
+                self._db.failedReads -= 1
+                raise PyMongoError("connection closed")
+            for name in query["_id"]["$in"]:
+                if name in self._db.versions:
+                    yield {"_id": name, "version": self._db.versions[name]}
+        return docs()
+
+class MockDatabase:
+    def __init__(self, changes, ends=False):
+        self._changes = changes
+        self._ends = ends
+        self.pipeline = None
+        self.versions = {}
+        self.failedReads = 0
+        self.watches = 0
+
+    def watch(self, pipeline):
+        self.pipeline = pipeline
+        self.watches += 1
+        if self.watches > 1 and self._changes is not None:
+            # a reopened stream only sees new changes
+            return MockChangeStream([], False)
+        return MockChangeStream(self._changes, self._ends)
+
+    def __getitem__(self, name):
+        assert name == VERSION_COLLECTION
+        return MockVersionCollection(self)
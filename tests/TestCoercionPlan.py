@@ -0,0 +1,50 @@
+import unittest
+import dateutil.parser
+from datetime import datetime, timezone, timedelta
+from nflapidb.Entity import Entity, PrimaryKey, Column
+from nflapidb.CoercionPlan import CoercionPlan, parseDatetime
+
+class MyEntity(Entity):
+    @PrimaryKey
+    def attr1(self):
+        return "str"
+    @Column
+    def attr2(self):
+        return "int"
+    @Column
+    def attr3(self):
+        return "float"
+    @Column
+    def attr4(self):
+        return "datetime"
+
+class TestCoercionPlan(unittest.TestCase):
+
+    def test_apply(self):
+        plan = CoercionPlan(MyEntity())
+        datum = {"attr1": "1", "attr2": "2", "attr3": "3.5", "attr4": "12/25/1990", "attr5": "5"}
+        self.assertEqual(plan.apply(datum), {"attr1": "1", "attr2": 2, "attr3": 3.5,
+                                             "attr4": datetime(1990, 12, 25), "attr5": "5"})
+
+    def test_apply_none_and_missing(self):
+        plan = CoercionPlan(MyEntity())
+        datum = {"attr1": "1", "attr2": None}
+        self.assertEqual(plan.apply(datum), {"attr1": "1", "attr2": None})
+
+    def test_applyAll(self):
+        plan = CoercionPlan(MyEntity())
+        data = [{"attr2": "1", "attr4": ""}, {"attr2": "2", "attr4": "2019-11-20 13:00 EST"}]
+        self.assertEqual(plan.applyAll(data), [
+            {"attr2": 1, "attr4": None},
+            {"attr2": 2, "attr4": datetime(2019, 11, 20, 13, 0, tzinfo=timezone(timedelta(hours=-5)))}
+        ])
+
+    def test_parseDatetime_mdy_matches_dateutil(self):
+        for dtstr in ["1/2/1990", "12/25/1990", "07/04/2001"]:
+            self.assertEqual(parseDatetime(dtstr), dateutil.parser.parse(dtstr), dtstr)
+
+    def test_parseDatetime_cached(self):
+        parseDatetime.cache_clear()
+        parseDatetime("2019-11-20 13:00 EST")
+        parseDatetime("2019-11-20 13:00 EST")
+        self.assertEqual(parseDatetime.cache_info().hits, 1)
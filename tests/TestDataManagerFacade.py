@@ -0,0 +1,82 @@
+import unittest
+import threading
+import asyncio
+from typing import List
+import nflapi.Client
+from nflapidb.DataManagerFacade import DataManagerFacade
+from nflapidb.EntityManager import EntityManager
+from nflapidb.QueryModel import QueryModel
+import nflapidb.Utilities as util
+
+class TestDataManagerFacade(unittest.TestCase):
+
+    def setUp(self):
+        self.entmgr = EntityManager()
+
+    def tearDown(self):
+        self.entmgr.dispose()
+
+    def test__callAPI_runs_in_executor(self):
+        apiClient = MockApiClient()
+        dmgr = MockDataManagerFacade(self.entmgr, apiClient)
+        tname = util.runCoroutine(dmgr._callAPI(apiClient.getThreadName))
+        self.assertNotEqual(tname, threading.current_thread().name, "api called on event loop thread")
+
+    def test__iterAPI_chunks_in_order(self):
+        apiClient = MockApiClient()
+        dmgr = MockDataManagerFacade(self.entmgr, apiClient)
+        async def collect():
+            return [(c, r) async for c, r in dmgr._iterAPI(apiClient.getItems, [1, 2, 3, 4, 5], 2)]
+        rslt = util.runCoroutine(collect())
+        self.assertEqual(rslt, [([1, 2], [10, 20]), ([3, 4], [30, 40]), ([5], [50])])
+        self.assertEqual(apiClient.getRequests(), [[1, 2], [3, 4], [5]])
+
+    def test__iterAPI_prefetches_next_chunk(self):
+        apiClient = MockApiClient()
+        dmgr = MockDataManagerFacade(self.entmgr, apiClient)
+        async def collect():
+            reqcnts = []
+            async for _ in dmgr._iterAPI(apiClient.getItems, [1, 2, 3], 1):
+                await asyncio.sleep(0.05)
+                reqcnts.append(len(apiClient.getRequests()))
+            return reqcnts
+        self.assertEqual(util.runCoroutine(collect()), [2, 3, 3])
+
+    def test__iterAPIChunks_bounds_requests_in_flight(self):
+        apiClient = MockApiClient()
+        dmgr = MockDataManagerFacade(self.entmgr, apiClient)
+        async def collect():
+            reqcnts = []
+            rslts = []
+            async for c, r in dmgr._iterAPIChunks(apiClient.getItems, [[1], [2], [3], [4], [5]], 3):
+                await asyncio.sleep(0.05)
+                reqcnts.append(len(apiClient.getRequests()))
+                rslts.append(r)
+            return reqcnts, rslts
+        reqcnts, rslts = util.runCoroutine(collect())
+        self.assertEqual(reqcnts, [4, 5, 5, 5, 5])
+        self.assertEqual(rslts, [[10], [20], [30], [40], [50]])
+
+class MockDataManagerFacade(DataManagerFacade):
+    def __init__(self, entityManager : EntityManager, apiClient : nflapi.Client.Client):
+        super(MockDataManagerFacade, self).__init__("ut_table1", entityManager, apiClient)
+
+    async def sync(self) -> List[dict]:
+        return []
+
+    def _getQueryModel(self, **kwargs) -> QueryModel:
+        return QueryModel()
+
+class MockApiClient(nflapi.Client.Client):
+    def __init__(self):
+        self._requests = []
+
+    def getThreadName(self) -> str:
+        return threading.current_thread().name
+
+    def getItems(self, items : List[int]) -> List[int]:
+        self._requests.append(items)
+        return [i * 10 for i in items]
+
+    def getRequests(self) -> List[List[int]]:
+        return self._requests
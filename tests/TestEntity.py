@@ -152,4 +152,34 @@ class TestEntity(unittest.TestCase):
 
         o = MyEntity()
         self.assertEqual(o.columnType("attr1"), "str", "attr1 type mismatch")
-        self.assertEqual(o.columnType("attr2"), "int", "attr2 type mismatch")
\ No newline at end of file
+        self.assertEqual(o.columnType("attr2"), "int", "attr2 type mismatch")
+
+    def test_schema_shared_by_instances(self):
+        class MyEntity(Entity):
+            @PrimaryKey
+            def attr2(self):
+                return "str"
+            @PrimaryKey
+            def attr1(self):
+                return "int"
+
+        o1 = MyEntity()
+        o2 = MyEntity()
+        self.assertIs(o1.schema, o2.schema)
+        self.assertEqual(o1.schema.primaryKey, ("attr2", "attr1"))
+        self.assertEqual(dict(o1.schema.columns), {"attr2": "str", "attr1": "int"})
+        with self.assertRaises(TypeError):
+            o1.schema.columns["attr3"] = "str"
+
+    def test_schema_not_inherited(self):
+        class MyEntity(Entity):
+            @Column
+            def attr1(self):
+                return "str"
+        class MySubEntity(MyEntity):
+            @Column
+            def attr2(self):
+                return "str"
+
+        self.assertEqual(MyEntity().columnNames, set(["attr1"]))
+        self.assertEqual(MySubEntity().columnNames, set(["attr2"]))
@@ -7,7 +7,11 @@ import importlib
 from datetime import datetime
 import pytz
 from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
 from nflapidb.EntityManager import EntityManager
+from nflapidb.MemoryBackend import MemoryBackend
+from nflapidb.EntitySchema import EntitySchema
+from nflapidb.IndexSpec import IndexSpec
 
 class TestEntityManager(unittest.TestCase):
 
@@ -92,6 +96,129 @@ class TestEntityManager(unittest.TestCase):
         self.entmgr = MockEntityManager()
         self.assertEqual(self._run(self.entmgr._primaryKey(mc)), ["x", "y"])
 
+    def test__getPrimaryKey_cached(self):
+        mc = unittest.mock.create_autospec(AsyncIOMotorCollection)
+        calls = []
+        async def ii():
+            calls.append(1)
+            return [
+                {"_id_": {"key": [("_id", 1)]}},
+                {"x_1": {"unique": True, "key": [("x", 1)]}}
+            ]
+        mc.index_information = ii
+        self.entmgr = MockEntityManager()
+        self.assertEqual(self._run(self.entmgr._getPrimaryKey("x", mc)), ["x"])
+        self.assertEqual(self._run(self.entmgr._getPrimaryKey("x", mc)), ["x"])
+        self.assertEqual(len(calls), 1, "index_information not cached")
+        self.entmgr._invalidateMetadata("x")
+        self.assertEqual(self._run(self.entmgr._getPrimaryKey("x", mc)), ["x"])
+        self.assertEqual(len(calls), 2, "index_information not reloaded")
+
+    def _mockIndexCollection(self, indexes : dict, ops : list, failCreate : bool = False):
+        mc = unittest.mock.create_autospec(AsyncIOMotorCollection)
+        async def ii():
+            return dict(indexes)
+        async def ci(models):
+            if failCreate:
+                raise DuplicateKeyError("E11000 duplicate key error")
+            ops.extend([("create", m.document) for m in models])
+            indexes.update([(m.document["name"], {"key": list(m.document["key"].items())}) for m in models])
+            return [m.document["name"] for m in models]
+        async def di(name):
+            ops.append(("drop", name))
+            del indexes[name]
+        mc.index_information = ii
+        mc.create_indexes = ci
+        mc.drop_index = di
+        return mc
+
+    def test_ensureIndexes(self):
+        ops = []
+        mc = self._mockIndexCollection({
+            "_id_": {"key": [("_id", 1)]},
+            "column1_1_column2_1": {"key": [("column3", 1)]}
+        }, ops)
+        async def gc(entityName):
+            return mc
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        self.entmgr = EntityManager(entityDirPath=entcfgdp)
+        self.entmgr._getCollection = gc
+        rpt = self._run(self.entmgr.ensureIndexes("ut_table1"))
+        self.assertEqual(rpt["ut_table1"], {"created": [], "stale": ["column1_1_column2_1"],
+                                            "dropped": [], "conflicts": ["column1_1_column2_1"]})
+        self.assertEqual(ops, [])
+        rpt = self._run(self.entmgr.ensureIndexes("ut_table1", dropStale=True))
+        self.assertEqual(rpt["ut_table1"]["created"], ["column1_1_column2_1"])
+        self.assertEqual(rpt["ut_table1"]["conflicts"], [])
+        self.assertEqual([op for op, _ in ops], ["drop", "create"])
+        created = ops[1][1]
+        self.assertEqual(list(created["key"].items()), [("column1", 1), ("column2", 1)])
+        self.assertTrue(created["unique"])
+        self.assertNotIn("background", created)
+
+    def test_ensureIndexes_builds_before_drop(self):
+        schema = EntitySchema(["column1", "column2"], {"column1": "str", "column2": "int", "column3": "float"}, [],
+                              [IndexSpec(["column1", "column2"], unique=True), IndexSpec(["column3"], name="c3"),
+                               IndexSpec(["column3", "column1"], name="c3_new")])
+        indexes = {
+            "_id_": {"key": [("_id", 1)]},
+            # the primary key index as built from a set of columns
+            "column2_1_column1_1": {"unique": True, "key": [("column2", 1), ("column1", 1)]},
+            "c3": {"key": [("column1", 1)]},
+            "old_1": {"unique": True, "key": [("old", 1)]}
+        }
+        self.entmgr = EntityManager()
+        async def gc(entityName):
+            return mc
+        self.entmgr._getCollection = gc
+        ops = []
+        mc = self._mockIndexCollection(dict(indexes), ops, failCreate=True)
+        with self.assertRaises(DuplicateKeyError):
+            self._run(self.entmgr._ensureEntityIndexes("x", schema, True))
+        self.assertEqual(ops, [], "stale indexes dropped before a failed build")
+        mc = self._mockIndexCollection(dict(indexes), ops)
+        rpt = self._run(self.entmgr._ensureEntityIndexes("x", schema, True))
+        self.assertEqual(rpt, {"created": ["c3_new", "c3"], "stale": ["c3", "old_1"],
+                               "dropped": ["c3", "old_1"], "conflicts": []})
+        self.assertEqual([(op, v["name"] if op == "create" else v) for op, v in ops],
+                         [("create", "c3_new"), ("drop", "c3"), ("drop", "old_1"), ("create", "c3")])
+
+    def test_ensureIndexes_existing_collections(self):
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        self.entmgr = EntityManager(entityDirPath=entcfgdp, backend=MemoryBackend())
+        async def run():
+            await self.entmgr.save("ut_table1", [{"column1": "A", "column2": 1}])
+            rpt = await self.entmgr.ensureIndexes()
+            return rpt, await self.entmgr._database.list_collection_names()
+        rpt, cnames = self._run(run())
+        self.assertEqual(list(rpt), ["ut_table1"])
+        self.assertNotIn("ut_table2", cnames)
+
+    def test_find_cached_until_delete(self):
+        mc = unittest.mock.create_autospec(AsyncIOMotorCollection)
+        finds = []
+        async def gc(entityName):
+            return mc
+        async def dm(query):
+            return unittest.mock.Mock(deleted_count=0)
+        async def cursor():
+            yield {"team": "KC"}
+        def cf(collection, query, projection, sort, limit):
+            finds.append(query)
+            return cursor()
+        mc.delete_many = dm
+        self.entmgr = MockEntityManager()
+        self.entmgr._getCollection = gc
+        self.entmgr._cursor = cf
+        self.entmgr.enableCache("team")
+        self.assertEqual(self._run(self.entmgr.find("team", {"team": "KC"})), [{"team": "KC"}])
+        self.assertEqual(self._run(self.entmgr.find("team", {"team": "KC"})), [{"team": "KC"}])
+        self.assertEqual(len(finds), 1, "cached result not used")
+        self._run(self.entmgr.delete("team", {"team": "PIT"}))
+        self._run(self.entmgr.find("team", {"team": "KC"}))
+        self.assertEqual(len(finds), 2, "cache not invalidated")
+        self.assertEqual(self.entmgr.cacheStats("team"), {"hits": 1, "misses": 2, "size": 1})
+
     def test__buildQuery__id_one_item(self):
         self.entmgr = MockEntityManager()
         data = [{"_id": 1, "col1": "A", "col2": 2}]
@@ -170,6 +297,74 @@ class TestEntityManager(unittest.TestCase):
                 await db.drop_collection(col)
         self._run(verify())
 
+    def test_bulkSave_inserts(self):
+        ename = "ut_table1"
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        self.entmgr = EntityManager(entityDirPath=entcfgdp)
+        data = [{"column1": "A", "column2": 1, "column3": 1.0}, {"column1": "B", "column2": 2, "column3": 1.0}]
+        rslt = self._run(self.entmgr.bulkSave(ename, data, reread=True))
+        async def verify():
+            db = self.entmgr._database
+            try:
+                col = db[ename]
+                self.assertEqual(rslt["upserted"], 2, "upserted count not expected")
+                self.assertEqual(rslt["matched"], 0, "matched count not expected")
+                dbdata = [_ async for _ in col.find()]
+                self.assertEqual(rslt["data"], dbdata, "returned data not expected")
+            except Exception as e:
+                self.assertTrue(False, f"Error during verification: {e}")
+            finally:
+                await db.drop_collection(col)
+        self._run(verify())
+
+    def test_bulkSave_updates_with_multikey(self):
+        ename = "ut_table1"
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        self.entmgr = EntityManager(entityDirPath=entcfgdp)
+        data = [{"column1": "A", "column2": 1, "column3": 1.0}, {"column1": "A", "column2": 2, "column3": 1.0},
+                {"column1": "B", "column2": 1, "column3": 1.0}, {"column1": "B", "column2": 2, "column3": 1.0}]
+        self._run(self.entmgr.bulkSave(ename, data, batchSize=3))
+        urecs = [data[1].copy(), data[3].copy(), data[3].copy()]
+        urecs[0]["column3"] = 2.0
+        urecs[1]["column3"] = 3.0
+        urecs[2]["column3"] = 2.0
+        rslt = self._run(self.entmgr.bulkSave(ename, urecs))
+        async def verify():
+            db = self.entmgr._database
+            try:
+                col = db[ename]
+                self.assertEqual(rslt["matched"], 3, "matched count not expected")
+                self.assertEqual(rslt["upserted"], 0, "upserted count not expected")
+                self.assertEqual(await col.count({}), 4, "document count not expected")
+                dbdata = [_ async for _ in col.find(projection={"_id": False})]
+                data[1]["column3"] = 2.0
+                data[3]["column3"] = 2.0
+                self.assertEqual(dbdata, data, "data not expected")
+            except Exception as e:
+                self.assertTrue(False, f"Error during verification: {e}")
+            finally:
+                await db.drop_collection(col)
+        self._run(verify())
+
+    def test_stream_chunks(self):
+        self.entmgr = EntityManager()
+        ename = "ut_table1"
+        data = [{"column1": c, "column2": i} for c in ["A", "B", "C"] for i in range(0, 3)]
+        db = self.entmgr._database
+        col = db[ename]
+        self._run(col.insert_many(data))
+        async def collect():
+            return [c async for c in self.entmgr.stream(ename, query={"column1": {"$in": ["A", "B"]}},
+                                                        projection={"_id": False},
+                                                        batchSize=2, chunkSize=4)]
+        try:
+            chunks = self._run(collect())
+            self.assertEqual([len(c) for c in chunks], [4, 2], "chunk lengths not expected")
+            self.assertEqual(chunks[0] + chunks[1], [{"column1": d["column1"], "column2": d["column2"]} for d in data[0:6]],
+                             "data not expected")
+        finally:
+            self._run(db.drop_collection(col))
+
     def test_entity_instantiation(self):
         try:
             ename = "ut_table1"
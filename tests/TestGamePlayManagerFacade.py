@@ -1,6 +1,8 @@
 import unittest
 import os
 import json
+import tempfile
+import unittest.mock
 from typing import List
 import nflapi.Client
 from nflapidb.ScheduleManagerFacade import ScheduleManagerFacade
@@ -8,7 +10,8 @@ from nflapidb.RosterManagerFacade import RosterManagerFacade
 from nflapidb.GamePlayManagerFacade import GamePlayManagerFacade
 from nflapidb.EntityManager import EntityManager
 import nflapidb.Utilities as util
-from nflapidb.QueryModel import QueryModel
+from nflapidb.QueryModel import QueryModel, Operator
+import nflapidb.ArrowExport as ArrowExport
 
 class TestGamePlayManagerFacade(unittest.TestCase):
 
@@ -19,6 +22,7 @@ class TestGamePlayManagerFacade(unittest.TestCase):
 
     def tearDown(self):
         util.runCoroutine(self.entmgr.drop(self.entityName))
+        util.runCoroutine(self.entmgr.drop("game_sync"))
         if self.rostmgr is not None:
             util.runCoroutine(self.entmgr.drop(self.rostmgr.entityName))
         self.entmgr.dispose()
@@ -80,6 +84,109 @@ class TestGamePlayManagerFacade(unittest.TestCase):
         self.assertEqual(len(apireqs), len(schdata), "api request record counts differ")
         self.assertEqual(apireqs, schdata, "api request records differ")
 
+    def test_sync_chunk_by_game(self):
+        schdata = self._getScheduleData()
+        gsdata = self._getGamePlayData()
+        gsmgr = self._getMockGamePlayManager(schdata, gsdata)
+        recs = util.runCoroutine(gsmgr.sync(chunkBy="game"))
+        self.assertEqual(len(recs), len(gsdata), "returned record counts differ")
+        dbrecs = util.runCoroutine(gsmgr.find())
+        self.assertEqual(len(dbrecs), len(recs), "db record counts differ")
+        apireqs = gsmgr._apiClient.getRequestedSchedules()
+        self.assertEqual(apireqs, schdata[-1:], "last api request differs")
+
+    def test_sync_chunk_by_week_no_collect(self):
+        schdata = self._getScheduleData()
+        gsdata = self._getGamePlayData()
+        gsmgr = self._getMockGamePlayManager(schdata, gsdata)
+        recs = util.runCoroutine(gsmgr.sync(chunkBy="week", collect=False))
+        self.assertEqual(len(recs), 0, "returned record counts differ")
+        dbrecs = util.runCoroutine(gsmgr.find())
+        self.assertEqual(len(dbrecs), len(gsdata), "db record counts differ")
+
+    def test_sync_resumes_unmarked_game(self):
+        schdata = self._getScheduleData([13])
+        gsdata = self._getGamePlayData([13])
+        gsmgr = self._getMockGamePlayManager(schdata, gsdata)
+        util.runCoroutine(gsmgr.sync(chunkBy="game", collect=False))
+        # as if the sync was interrupted while saving the first game
+        gsid = schdata[0]["gsis_id"]
+        util.runCoroutine(self.entmgr.delete("game_sync", {"gsis_id": gsid}))
+        gsmgr = self._getMockGamePlayManager(schdata, gsdata)
+        recs = util.runCoroutine(gsmgr.sync(chunkBy="game"))
+        self.assertEqual(len(recs), len([r for r in gsdata if r["gsis_id"] == gsid]), "returned record counts differ")
+        self.assertEqual(gsmgr._apiClient.getRequestedSchedules(), schdata[:1], "api request records differ")
+        recs = util.runCoroutine(gsmgr.sync(chunkBy="game"))
+        self.assertEqual(len(recs), 0, "marked games requested again")
+
+    def test_sync_marks_data_saved_unmarked(self):
+        schdata = self._getScheduleData()
+        reqsch = []
+        for r in schdata:
+            if not r["finished"]:
+                r["finished"] = True
+                reqsch.append(r)
+        gsdata1 = self._getGamePlayData([13])
+        gsmgr = self._getMockGamePlayManager(schdata, gsdata1 + self._getGamePlayData([14]))
+        # as if saved by a version that did not mark the synced games
+        util.runCoroutine(gsmgr.save(gsdata1))
+        recs = util.runCoroutine(gsmgr.sync())
+        self.assertEqual(gsmgr._apiClient.getRequestedSchedules(), reqsch, "api request records differ")
+        self.assertEqual(len(recs), len(self._getGamePlayData([14])), "returned record counts differ")
+        mgsids = util.runCoroutine(self.entmgr.distinct("game_sync", "gsis_id", {"entity_name": self.entityName}))
+        self.assertEqual(sorted(mgsids), sorted([r["gsis_id"] for r in schdata]), "games not marked")
+
+    def _getExportManager(self):
+        # two games of the week as if one was a preseason game of week
+        # 1 and one a regular season game of week 1
+        schdata = self._getScheduleData([13])
+        schdata[0].update({"season_type": "preseason", "week": 1})
+        schdata[1].update({"week": 1})
+        gsmgr = self._getMockGamePlayManager(schdata, self._getGamePlayData([13]))
+        util.runCoroutine(gsmgr.sync(collect=False))
+        return gsmgr, schdata
+
+    @unittest.skipIf(ArrowExport.pa is None, "pyarrow is not installed")
+    def test_toArrow(self):
+        gsmgr, schdata = self._getExportManager()
+        qm = QueryModel()
+        qm.cstart("gsis_id", schdata[0]["gsis_id"])
+        tbl = util.runCoroutine(gsmgr.toArrow(qm=qm))
+        self.assertEqual(tbl.num_rows, len(util.runCoroutine(gsmgr.find(qm=qm))))
+        self.assertEqual(set(tbl.column("season_type").to_pylist()), {"preseason"})
+        self.assertEqual(set(tbl.column("week").to_pylist()), {1})
+
+    @unittest.skipIf(ArrowExport.pa is None, "pyarrow is not installed")
+    def test_exportParquet(self):
+        gsmgr, schdata = self._getExportManager()
+        qm = QueryModel()
+        qm.cstart("gsis_id", [r["gsis_id"] for r in schdata[:2]], Operator.IN)
+        with tempfile.TemporaryDirectory() as tdir:
+            files = util.runCoroutine(gsmgr.exportParquet(tdir, qm=qm))
+            self.assertIsNone(qm.ordering, "caller query model ordered")
+            self.assertEqual(sorted([os.path.relpath(f, tdir) for f in files]),
+                             [os.path.join("season=2019", "season_type={}".format(st), "week=1", "part-0.parquet")
+                              for st in ["preseason", "regular_season"]])
+            for fpath, sch in zip(sorted(files), schdata[:2]):
+                tbl = ArrowExport.pq.read_table(fpath)
+                self.assertEqual(set(tbl.column("gsis_id").to_pylist()), {sch["gsis_id"]})
+
+    def test_export_requires_arrow(self):
+        gsmgr = self._getMockGamePlayManager(self._getScheduleData([13]), [])
+        with unittest.mock.patch.object(ArrowExport, "pa", None):
+            with self.assertRaises(ImportError):
+                util.runCoroutine(gsmgr.exportParquet(tempfile.gettempdir()))
+            with self.assertRaises(ImportError):
+                util.runCoroutine(gsmgr.toArrow())
+
+    def test_save_indexes_saved_teams_only(self):
+        gsmgr = self._getMockGamePlayManager(self._getScheduleData(), [])
+        rindex = util.runCoroutine(gsmgr._buildRosterIndex(["LA"]))
+        self.assertEqual(list(rindex._team_recs), ["LA"])
+        gpdata = [r for r in self._getGamePlayData([13]) if r.get("team") == "LA"]
+        recs = util.runCoroutine(gsmgr.save(gpdata))
+        self.assertGreater(len([r for r in recs if "profile_id" in r]), 0, "no profile_ids added")
+
     def test_sync_no_new_finished_noop(self):
         schdata = self._getScheduleData()
         gsdata = self._getGamePlayData([13])
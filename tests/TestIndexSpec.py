@@ -0,0 +1,62 @@
+import unittest
+from pymongo import ASCENDING, DESCENDING
+from nflapidb.IndexSpec import IndexSpec
+from nflapidb.Entity import Entity, PrimaryKey, Column, Index
+
+class TestIndexSpec(unittest.TestCase):
+
+    def test_default_name(self):
+        spec = IndexSpec(["team", ("gsis_id", DESCENDING)])
+        self.assertEqual(spec.name, "team_1_gsis_id_-1")
+        self.assertEqual(spec.key, (("team", ASCENDING), ("gsis_id", DESCENDING)))
+        self.assertEqual(spec.columnNames, ("team", "gsis_id"))
+
+    def test_toIndexModel(self):
+        spec = IndexSpec(["profile_id"], name="profile_id_partial", unique=True,
+                         partialFilterExpression={"profile_id": {"$exists": True}})
+        doc = spec.toIndexModel().document
+        self.assertEqual(list(doc["key"].items()), [("profile_id", ASCENDING)])
+        self.assertEqual(doc["name"], "profile_id_partial")
+        self.assertTrue(doc["unique"])
+        self.assertEqual(doc["partialFilterExpression"], {"profile_id": {"$exists": True}})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            IndexSpec([])
+        with self.assertRaises(ValueError):
+            IndexSpec([("team", 2)])
+
+    def test_entity_indexSpecs(self):
+        class MyEntity(Entity):
+            indexes = [IndexSpec(["attr3", "attr1"], name="attr3_attr1")]
+            @PrimaryKey
+            def attr1(self):
+                return "str"
+            @PrimaryKey
+            def attr2(self):
+                return "int"
+            @Index
+            def attr3(self):
+                return "str"
+            @Index
+            def attr4(self):
+                return "str"
+            @Column
+            def attr5(self):
+                return "str"
+
+        specs = MyEntity().schema.indexSpecs
+        self.assertEqual(specs, (IndexSpec(["attr1", "attr2"], unique=True),
+                                 IndexSpec(["attr3"]),
+                                 IndexSpec(["attr4"]),
+                                 IndexSpec(["attr3", "attr1"], name="attr3_attr1")))
+
+    def test_entity_duplicate_index_names(self):
+        class MyEntity(Entity):
+            indexes = [IndexSpec(["attr1"])]
+            @Index
+            def attr1(self):
+                return "str"
+
+        with self.assertRaises(ValueError):
+            MyEntity()
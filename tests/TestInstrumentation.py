@@ -0,0 +1,138 @@
+import unittest
+import os
+import json
+import logging
+from pymongo.errors import OperationFailure
+from nflapidb.EntityManager import EntityManager
+from nflapidb.MemoryBackend import MemoryBackend
+import nflapidb.Instrumentation as instr
+import nflapidb.Utilities as util
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = instr.MetricsRegistry(buckets=(0.1, 1.0))
+
+    def tearDown(self):
+        instr.setSink(None)
+
+    def test_disabled_records_nothing(self):
+        self.assertFalse(instr.enabled())
+        with instr.span("op", entity="e") as s:
+            instr.count("docs_read", 3)
+        self.assertIs(s, instr.span("other"))
+        instr.setSink(self.registry)
+        self.assertTrue(instr.enabled())
+        self.assertEqual(self.registry.snapshot(), {"counters": [], "spans": []})
+
+    def test_registry_aggregates(self):
+        instr.setSink(self.registry)
+        instr.count("docs_read", 2, entity="a")
+        instr.count("docs_read", 3, entity="a")
+        instr.count("docs_read", 5, entity="b")
+        with self.assertRaises(KeyError):
+            with instr.span("op", entity="a"):
+                raise KeyError("k")
+        self.assertEqual(self.registry.counter("docs_read", entity="a"), 5)
+        self.assertEqual(self.registry.counter("docs_read"), 10)
+        spans = self.registry.snapshot()["spans"]
+        self.assertEqual(len(spans), 1)
+        self.assertEqual(spans[0]["tags"], {"entity": "a", "error": "KeyError"})
+        self.assertEqual(spans[0]["count"], 1)
+        self.assertEqual(spans[0]["buckets"], [1, 0])
+        self.registry.reset()
+        self.assertEqual(self.registry.counter("docs_read"), 0)
+
+    def test_prometheus_text(self):
+        self.registry.recordCount("docs_read", 4, {"entity": "roster"})
+        self.registry.recordSpan("db.find", 0.5, {"entity": "roster"})
+        self.registry.recordSpan("db.find", 2.0, {"entity": "roster"})
+        self.assertEqual(instr.toPrometheusText(self.registry).splitlines(), [
+            '# TYPE nflapidb_docs_read_total counter',
+            'nflapidb_docs_read_total{entity="roster"} 4',
+            '# TYPE nflapidb_db_find_seconds histogram',
+            'nflapidb_db_find_seconds_bucket{entity="roster",le="0.1"} 0',
+            'nflapidb_db_find_seconds_bucket{entity="roster",le="1.0"} 1',
+            'nflapidb_db_find_seconds_bucket{entity="roster",le="+Inf"} 2',
+            'nflapidb_db_find_seconds_sum{entity="roster"} 2.5',
+            'nflapidb_db_find_seconds_count{entity="roster"} 2'
+        ])
+
+    def test_log_sink(self):
+        logger = logging.getLogger("nflapidb.metrics.ut")
+        with self.assertLogs(logger, level=logging.INFO) as cm:
+            instr.setSink(instr.TeeSink([self.registry, instr.LogSink(logger)]))
+            instr.count("api_requests", entity="team")
+        self.assertEqual(json.loads(cm.records[0].getMessage()),
+                         {"metric": "api_requests", "type": "count", "value": 1, "entity": "team"})
+        self.assertEqual(self.registry.counter("api_requests"), 1)
+
+    def test_entity_manager_counters(self):
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        entmgr = EntityManager(dbName="nflapidb_ut", entityDirPath=entcfgdp, backend=MemoryBackend())
+        ename = "ut_table1"
+        data = [{"column1": c, "column2": i, "column3": 1.0} for c in ["A", "B"] for i in range(0, 3)]
+        instr.setSink(self.registry)
+        async def run():
+            await entmgr.bulkSave(ename, data)
+            entmgr.enableCache(ename)
+            await entmgr.find(ename, {"column1": "A"})
+            await entmgr.find(ename, {"column1": "A"})
+        try:
+            util.runCoroutine(run())
+        finally:
+            entmgr.dispose()
+        reg = self.registry
+        self.assertEqual(reg.counter("docs_written", entity=ename), 6)
+        self.assertEqual(reg.counter("docs_read", entity=ename), 3)
+        self.assertEqual(reg.counter("round_trips", entity=ename, op="bulk_write"), 1)
+        self.assertEqual(reg.counter("round_trips", entity=ename, op="find"), 1)
+        self.assertEqual(reg.counter("cache_misses", entity=ename), 1)
+        self.assertEqual(reg.counter("cache_hits", entity=ename), 1)
+        names = set([s["name"] for s in reg.snapshot()["spans"]])
+        self.assertTrue({"db.bulk_save", "db.bulk_write", "db.find"}.issubset(names))
+
+    def test_save_counts_completed_writes(self):
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        entmgr = EntityManager(dbName="nflapidb_ut", entityDirPath=entcfgdp, backend=MemoryBackend())
+        ename = "ut_table1"
+        instr.setSink(self.registry)
+        async def run():
+            col = await entmgr._getCollection(ename)
+            replace = col.find_one_and_replace
+            async def failSecond(*args, **kwargs):
+                if len(calls) == 1:
+                    raise OperationFailure("interrupted")
+                calls.append(args)
+                return await replace(*args, **kwargs)
+            calls = []
+            col.find_one_and_replace = failSecond
+            await entmgr.save(ename, [{"column1": c, "column2": 1, "column3": 1.0} for c in ["A", "B", "C"]])
+        try:
+            with self.assertRaises(OperationFailure):
+                util.runCoroutine(run())
+        finally:
+            entmgr.dispose()
+        self.assertEqual(self.registry.counter("docs_written", entity=ename), 1)
+        self.assertEqual(self.registry.counter("round_trips", entity=ename, op="save"), 1)
+
+    def test_stream_counts_batches(self):
+        entcfgdp = os.path.join(os.path.relpath(os.path.dirname(__file__)), "data", "entities")
+        entmgr = EntityManager(dbName="nflapidb_ut", entityDirPath=entcfgdp, backend=MemoryBackend())
+        ename = "ut_table1"
+        data = [{"column1": c, "column2": i, "column3": 1.0} for c in ["A", "B"] for i in range(0, 5)]
+        async def run():
+            await entmgr.bulkSave(ename, data)
+            instr.setSink(self.registry)
+            n = len([d async for d in entmgr.stream(ename, batchSize=3)])
+            n += len([d async for d in entmgr.stream(ename)])
+            n += len([d async for d in entmgr.stream(ename, query={"column1": "C"}, batchSize=3)])
+            return n
+        try:
+            self.assertEqual(util.runCoroutine(run()), 20)
+        finally:
+            entmgr.dispose()
+        # 4 batches of at most 3, 1 for the default batch size, and 1
+        # for the query matching nothing
+        self.assertEqual(self.registry.counter("round_trips", entity=ename, op="stream"), 6)
+        self.assertEqual(self.registry.counter("docs_read", entity=ename), 20)
@@ -0,0 +1,26 @@
+import unittest
+from pymongo import IndexModel
+from nflapidb.MemoryBackend import MemoryBackend
+import nflapidb.Utilities as util
+from BackendTests import BackendTests
+
+class TestMemoryBackend(BackendTests, unittest.TestCase):
+
+    def makeBackend(self) -> MemoryBackend:
+        return MemoryBackend()
+
+    def test_index_lookup_keys(self):
+        col = self.entmgr._database["ut_lookup"]
+        async def run():
+            await col.create_indexes([IndexModel([("team", 1)]), IndexModel([("season", 1), ("week", 1)])])
+            await col.insert_many([{"team": t, "season": 2019, "week": w} for t in ["KC", "DEN", "LV"] for w in range(1, 4)])
+        util.runCoroutine(run())
+        self.assertEqual(len(col._matchKeys({"team": {"$in": ["KC", "LV"]}})), 6)
+        self.assertEqual(len(col._matchKeys({"$or": [{"team": "KC"}, {"season": 2019, "week": 2}]})), 5)
+        self.assertIsNone(col._matchKeys({"team": {"$regex": "^K"}}))
+
+    def test_shared_database(self):
+        b1 = MemoryBackend.shared("nflapidb_shared_ut")
+        b2 = MemoryBackend.shared("nflapidb_shared_ut")
+        self.assertIs(b1.database, b2.database)
+        self.assertIsNot(MemoryBackend("nflapidb_shared_ut").database, b1.database)
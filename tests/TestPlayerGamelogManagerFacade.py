@@ -54,6 +54,22 @@ class TestPlayerGamelogManagerFacade(unittest.TestCase):
         self._compareGL(dbrecs, recs)
         self.assertEqual(rmgr._apiClient.getRequestedRosters(), rstdata, "requested rosters differs")
 
+    def test_sync_no_collect_saves_all_seasons(self):
+        with open(os.path.join(os.path.dirname(__file__), "data", "roster_kc.json"), "rt") as fp:
+            rstdata = json.load(fp)
+        with open(os.path.join(os.path.dirname(__file__), "data", "player_gamelog_kc.json"), "rt") as fp:
+            srcdata = json.load(fp)
+        rmgr = self._getMockPlayerGamelogManager(rosterData=rstdata, gamelogData=srcdata)
+        rmgr.seasonConcurrency = 2
+        recs = util.runCoroutine(rmgr.sync(collect=False))
+        self.assertEqual(len(recs), 0, "sync returned record count differs")
+        dbrecs = util.runCoroutine(self.entmgr.find(self.entityName, projection={"_id": False}))
+        # records with the same key replace one another
+        xkeys = set([(r["profile_id"], r["season"], r["season_type"], r["wk"]) for r in srcdata])
+        self.assertEqual(len(dbrecs), len(xkeys), "db record count differs")
+        xseasons = set(range(rmgr._min_season, rmgr._currentSeason + 1))
+        self.assertEqual(rmgr._apiClient.getRequestedSeasons(), xseasons, "requested seasons differs")
+
     def test_sync_initializes_collection_two_teams(self):
         with open(os.path.join(os.path.dirname(__file__), "data", "roster_kc.json"), "rt") as fp:
             rstdata = json.load(fp)
@@ -0,0 +1,56 @@
+import unittest
+import unittest.mock
+from nflapidb.QueryCache import QueryCache
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_get_miss_then_hit(self):
+        cache = QueryCache()
+        key = QueryCache.makeKey({"team": "KC"})
+        self.assertEqual(cache.get(key), (False, None))
+        cache.put(key, [{"team": "KC"}])
+        self.assertEqual(cache.get(key), (True, [{"team": "KC"}]))
+        self.assertEqual(cache.stats, {"hits": 1, "misses": 1, "size": 1})
+
+    def test_get_returns_copy(self):
+        cache = QueryCache()
+        data = [{"team": "KC"}]
+        cache.put("k", data)
+        data[0]["team"] = "PIT"
+        _, rslt = cache.get("k")
+        rslt[0]["team"] = "DEN"
+        self.assertEqual(cache.get("k"), (True, [{"team": "KC"}]))
+
+    def test_makeKey_canonical(self):
+        self.assertEqual(QueryCache.makeKey({"a": 1, "b": {"$in": [1]}}, {"_id": False}),
+                         QueryCache.makeKey({"b": {"$in": [1]}, "a": 1}, {"_id": False}))
+        self.assertNotEqual(QueryCache.makeKey({"a": 1}), QueryCache.makeKey({"a": 1}, limit=1))
+
+    def test_lru_eviction(self):
+        cache = QueryCache(maxSize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("b"), (False, None))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+    def test_ttl(self):
+        cache = QueryCache(ttl=10)
+        with unittest.mock.patch("time.monotonic", return_value=100.0):
+            cache.put("a", 1)
+        with unittest.mock.patch("time.monotonic", return_value=105.0):
+            self.assertEqual(cache.get("a"), (True, 1))
+        with unittest.mock.patch("time.monotonic", return_value=111.0):
+            self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.stats["size"], 0)
+
+    def test_put_stale_generation_ignored(self):
+        cache = QueryCache()
+        gen = cache.generation
+        cache.clear()
+        cache.put("a", 1, gen)
+        self.assertEqual(cache.get("a"), (False, None))
+        cache.put("a", 1, cache.generation)
+        self.assertEqual(cache.get("a"), (True, 1))
@@ -0,0 +1,69 @@
+import unittest
+import re
+import nflapidb.QueryEvaluator as qe
+
+class TestQueryEvaluator(unittest.TestCase):
+
+    def _filter(self, query : dict, docs : list) -> list:
+        pred = qe.compileFilter(query)
+        return [d for d in docs if pred(d)]
+
+    def test_compileFilter_equality_and_arrays(self):
+        docs = [{"team": "KC", "previous_teams": ["DEN", "LV"]},
+                {"team": "DEN", "previous_teams": ["KC"]},
+                {"team": "LV"}]
+        self.assertEqual(self._filter({"team": "KC"}, docs), docs[0:1])
+        self.assertEqual(self._filter({"previous_teams": "KC"}, docs), docs[1:2])
+        self.assertEqual(self._filter({"previous_teams": ["DEN", "LV"]}, docs), docs[0:1])
+        self.assertEqual(self._filter({"previous_teams": None}, docs), docs[2:3])
+
+    def test_compileFilter_in_regex_exists(self):
+        docs = [{"last_name": "Mahomes", "team": "KC"},
+                {"last_name": "Kelce", "team": "KC", "jersey": 87},
+                {"last_name": "Lock", "team": "DEN"}]
+        self.assertEqual(self._filter({"team": {"$in": ["DEN", "LV"]}}, docs), docs[2:3])
+        self.assertEqual(self._filter({"last_name": {"$regex": "^m", "$options": "i"}}, docs), docs[0:1])
+        self.assertEqual(self._filter({"last_name": re.compile("^L")}, docs), docs[2:3])
+        self.assertEqual(self._filter({"last_name": {"$in": [re.compile("^K"), "Lock"]}}, docs), docs[1:3])
+        self.assertEqual(self._filter({"jersey": {"$exists": True}}, docs), docs[1:2])
+        self.assertEqual(self._filter({"jersey": {"$exists": False}}, docs), [docs[0], docs[2]])
+
+    def test_compileFilter_logical(self):
+        docs = [{"a": 1, "b": 1}, {"a": 1, "b": 2}, {"a": 2, "b": 2}]
+        self.assertEqual(self._filter({"$and": [{"a": 1}, {"b": 2}]}, docs), docs[1:2])
+        self.assertEqual(self._filter({"$or": [{"a": 2}, {"b": 1}]}, docs), [docs[0], docs[2]])
+        self.assertEqual(self._filter({"$nor": [{"a": 2}, {"b": 1}]}, docs), docs[1:2])
+        self.assertEqual(self._filter({"b": {"$not": {"$gt": 1}}}, docs), docs[0:1])
+
+    def test_compileFilter_comparison_by_type(self):
+        docs = [{"v": 1}, {"v": "2"}, {"v": True}, {"v": 3.5}]
+        self.assertEqual(self._filter({"v": {"$gte": 1}}, docs), [docs[0], docs[3]])
+        self.assertEqual(self._filter({"v": 1}, docs), docs[0:1])
+        self.assertEqual(self._filter({"v": {"$ne": 1}}, docs), docs[1:])
+
+    def test_compileFilter_unsupported(self):
+        with self.assertRaises(ValueError):
+            qe.compileFilter({"a": {"$where": "x"}})
+
+    def test_equalityConstraints(self):
+        q = {"team": "KC", "week": {"$in": [1, 2]}, "name": {"$regex": "^M"},
+             "$and": [{"season": 2019}, {"team": "DEN"}], "$or": [{"x": 1}]}
+        self.assertEqual(qe.equalityConstraints(q),
+                         {"team": ["KC"], "week": [1, 2], "season": [2019]})
+
+    def test_project_and_sort(self):
+        docs = [{"_id": 1, "a": 2, "b": "x"}, {"_id": 2, "a": 1, "b": "y"}, {"_id": 3, "b": "z"}]
+        self.assertEqual(qe.project(docs[0], {"_id": False, "a": True}), {"a": 2})
+        self.assertEqual(qe.project(docs[0], {"b": False}), {"_id": 1, "a": 2})
+        self.assertEqual([d["_id"] for d in qe.sortDocuments(docs, [("a", 1)])], [3, 2, 1])
+        self.assertEqual([d["_id"] for d in qe.sortDocuments(docs, [("a", -1)])], [1, 2, 3])
+
+    def test_aggregate(self):
+        docs = [{"season": 2019, "week": 1}, {"season": 2019, "week": 2},
+                {"season": 2018, "week": 17}]
+        rslt = qe.aggregate(docs, [{"$group": {"_id": "$season", "max_week": {"$max": "$week"},
+                                               "n": {"$sum": 1}}},
+                                   {"$sort": {"_id": 1}}])
+        self.assertEqual(rslt, [{"_id": 2018, "max_week": 17, "n": 1},
+                                {"_id": 2019, "max_week": 2, "n": 2}])
+        self.assertEqual(qe.aggregate(docs, [{"$match": {"season": 2020}}, {"$count": "n"}]), [])
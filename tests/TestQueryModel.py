@@ -118,3 +118,18 @@ class TestQueryModel(unittest.TestCase):
                          {"$and": [{"$or": [{"column1": {"$eq": "hello"}},
                                             {"column2": {"$eq": 1}} ] },
                                    {"column3": {"$eq": 1.0}} ] })
+
+    def test_ordering_default(self):
+        qmodel = QueryModel()
+        self.assertEqual(qmodel.ordering, None)
+        self.assertEqual(qmodel.limit, None)
+
+    def test_ordering_two_columns(self):
+        qmodel = QueryModel()
+        qmodel.orderBy("column1").orderBy("column2", ascending=False)
+        self.assertEqual(qmodel.ordering, [("column1", 1), ("column2", -1)])
+
+    def test_limit(self):
+        qmodel = QueryModel()
+        qmodel.limit = 1
+        self.assertEqual(qmodel.limit, 1)
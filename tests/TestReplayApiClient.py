@@ -0,0 +1,109 @@
+import unittest
+import os
+import json
+import time
+import tempfile
+from typing import Callable, List, Tuple
+import nflapi.Client
+from nflapidb.ReplayApiClient import ReplayApiClient, RecordingApiClient
+
+class TestReplayApiClient(unittest.TestCase):
+
+    def setUp(self):
+        self.datadp = os.path.join(os.path.dirname(__file__), "data")
+        self.files = {
+            "schedule": ["schedule_2019.json"],
+            "roster": ["roster_kc.json", "roster_pit.json"],
+            "game_play": ["game_play_2019_reg_13.json"]
+        }
+
+    def _load(self, fname : str) -> List[dict]:
+        with open(os.path.join(self.datadp, fname), "rt") as fp:
+            return json.load(fp)
+
+    def test_filters_by_request(self):
+        client = ReplayApiClient(self.datadp, files=self.files)
+        rosters = client.getRoster(["KC"])
+        self.assertEqual(rosters, self._load("roster_kc.json"))
+        sched = self._load("schedule_2019.json")
+        wk13 = [r for r in sched if r["week"] == 13]
+        self.assertEqual(client.getSchedule(season=2019, season_type="regular_season", week=13), wk13)
+        self.assertEqual(client.getSchedule(season=2018), [])
+        gsid = wk13[0]["gsis_id"]
+        plays = client.getGamePlay([wk13[0]])
+        self.assertEqual(plays, [r for r in self._load("game_play_2019_reg_13.json") if r["gsis_id"] == gsid])
+        self.assertEqual([m for m, _ in client.requests], ["getRoster", "getSchedule", "getSchedule", "getGamePlay"])
+
+    def test_postseason_weeks(self):
+        client = ReplayApiClient(self.datadp, files={"schedule": ["schedule_2018.json"]})
+        post = [r for r in self._load("schedule_2018.json") if r["season_type"] == "postseason"]
+        for week, nflwk in [(2, 19), (3, 20), (4, 22)]:
+            sched = client.getSchedule(season=2018, season_type="postseason", week=week)
+            self.assertGreater(len(sched), 0)
+            self.assertEqual(sched, [r for r in post if r["week"] == nflwk])
+        self.assertEqual(client.getSchedule(season=2018, season_type="regular_season", week=2),
+                         [r for r in self._load("schedule_2018.json")
+                          if r["season_type"] == "regular_season" and r["week"] == 2])
+
+    def test_returns_copies(self):
+        client = ReplayApiClient(self.datadp, files=self.files)
+        client.getRoster(["KC"])[0]["_id"] = 1
+        self.assertNotIn("_id", client.getRoster(["KC"])[0])
+
+    def test_teams_from_schedules(self):
+        client = ReplayApiClient(self.datadp, files=self.files)
+        teams = [r["team"] for r in client.getTeams()]
+        self.assertIn("KC", teams)
+        self.assertEqual(teams, sorted(set(teams)))
+
+    def _timed(self, request : Callable[[], List[dict]]) -> Tuple[int, float]:
+        start = time.perf_counter()
+        n = len(request())
+        return n, time.perf_counter() - start
+
+    def test_latency(self):
+        client = ReplayApiClient(self.datadp, files=self.files, latency=0.05)
+        _, secs = self._timed(lambda: client.getRoster(["KC"]))
+        self.assertGreaterEqual(secs, 0.05)
+        _, secs = self._timed(lambda: client.getSchedule(season=2018))
+        self.assertGreaterEqual(secs, 0.05)
+
+    def test_record_latency(self):
+        client = ReplayApiClient(self.datadp, files=self.files, recordLatency=0.001)
+        n1, secs1 = self._timed(lambda: client.getRoster(["KC"]))
+        n2, secs2 = self._timed(lambda: client.getRoster(["KC", "PIT"]))
+        self.assertEqual(n2, 2 * n1)
+        self.assertGreaterEqual(secs1, 0.001 * n1)
+        self.assertGreaterEqual(secs2, 0.001 * n2)
+        self.assertGreater(secs2, secs1)
+        _, secs = self._timed(lambda: client.getSchedule(season=2018))
+        self.assertLess(secs, 0.001 * n1)
+
+    def test_latency_jitter_seed(self):
+        def delays(seed : int) -> List[float]:
+            client = ReplayApiClient(self.datadp, files=self.files, latency=0.05, jitter=0.8, seed=seed)
+            return [self._timed(lambda: client.getSchedule(season=2018))[1] for _ in range(0, 4)]
+        d1 = delays(1)
+        d2 = delays(1)
+        for s1, s2 in zip(d1, d2):
+            self.assertGreaterEqual(s1, 0.05 * 0.2)
+            self.assertAlmostEqual(s1, s2, delta=0.015)
+        self.assertGreater(max(d1) - min(d1), 0.015)
+
+    def test_record_then_replay(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            recorder = RecordingApiClient(MockApiClient(self._load("roster_kc.json")), tmpdir)
+            recs = recorder.getRoster(["KC"])
+            recorder.getRoster(["KC"])
+            counts = recorder.save()
+            self.assertEqual(counts, {"roster": len(recs)})
+            client = ReplayApiClient(tmpdir)
+            self.assertEqual(client.getRoster(["KC"]), recs)
+            self.assertEqual(client.getRoster(["PIT"]), [])
+
+class MockApiClient(nflapi.Client.Client):
+    def __init__(self, rosterData : List[dict]):
+        self._roster_data = rosterData
+
+    def getRoster(self, teams : List[str]) -> List[dict]:
+        return [r for r in self._roster_data if r["team"] in teams]
@@ -0,0 +1,46 @@
+import unittest
+from nflapidb.RosterIndex import RosterIndex
+
+class TestRosterIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.rosters = [
+            {"profile_id": 1, "team": "KC", "first_name": "Patrick", "last_name": "Mahomes"},
+            {"profile_id": 2, "team": "KC", "first_name": "Travis", "last_name": "Kelce"},
+            {"profile_id": 3, "team": "KC", "first_name": "Tyreek", "last_name": "Hill"},
+            {"profile_id": 4, "team": "PIT", "first_name": "JuJu", "last_name": "Smith-Schuster"},
+            {"profile_id": 5, "team": "NE", "first_name": "Chris", "last_name": "Wollam Jr.", "previous_teams": ["KC"]},
+            {"profile_id": 6, "team": "PIT", "first_name": "Terry", "last_name": "Hill", "previous_teams": ["KC", "PIT"]}
+        ]
+
+    def _pids(self, recs):
+        return [r["profile_id"] for r in recs]
+
+    def test_find_by_team(self):
+        ridx = RosterIndex(self.rosters)
+        self.assertEqual(self._pids(ridx.find("KC", "P.Mahomes")), [1])
+        self.assertEqual(self._pids(ridx.find("KC", "p mahomes")), [1])
+        self.assertEqual(self._pids(ridx.find("PIT", "P.Mahomes")), [])
+
+    def test_find_suffix(self):
+        ridx = RosterIndex(self.rosters)
+        self.assertEqual(self._pids(ridx.find("NE", "C.Wollam Jr.")), [5])
+
+    def test_find_previous_teams(self):
+        ridx = RosterIndex(self.rosters)
+        self.assertEqual(self._pids(ridx.find("KC", "C.Wollam")), [])
+        self.assertEqual(self._pids(ridx.find("KC", "C.Wollam", include_previous_teams=True)), [5])
+
+    def test_find_ambiguous(self):
+        ridx = RosterIndex(self.rosters)
+        self.assertEqual(self._pids(ridx.find("KC", "T.Hill")), [3])
+        self.assertEqual(self._pids(ridx.find("KC", "T.Hill", include_previous_teams=True)), [3, 6])
+        self.assertEqual(self._pids(ridx.find("PIT", "T.Hill", include_previous_teams=True)), [6])
+
+    def test_find_last_name_only(self):
+        ridx = RosterIndex(self.rosters)
+        self.assertEqual(self._pids(ridx.find("KC", "Kelce")), [2])
+
+    def test_find_empty_abbreviation_matches_team(self):
+        ridx = RosterIndex(self.rosters)
+        self.assertEqual(self._pids(ridx.find("PIT", "")), [4, 6])
@@ -0,0 +1,61 @@
+import unittest
+import os
+import datetime
+import tempfile
+from pymongo import IndexModel
+from nflapidb.EntityManager import EntityManager
+from nflapidb.SQLiteBackend import SQLiteBackend
+import nflapidb.Utilities as util
+from BackendTests import BackendTests
+
+class TestSQLiteBackend(BackendTests, unittest.TestCase):
+
+    def makeBackend(self) -> SQLiteBackend:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dbpath = os.path.join(self.tmpdir.name, "nflapidb_ut.sqlite3")
+        return SQLiteBackend(self.dbpath)
+
+    def tearDown(self):
+        super(TestSQLiteBackend, self).tearDown()
+        self.tmpdir.cleanup()
+
+    def test_persisted(self):
+        ename = "ut_table1"
+        util.runCoroutine(self.entmgr.save(ename, [{"column1": "A", "column2": 1, "column3": 1.0}]))
+        entmgr = EntityManager(dbName="nflapidb_ut", entityDirPath=self.entcfgdp, backend=SQLiteBackend(self.dbpath))
+        try:
+            rslt = util.runCoroutine(entmgr.find(ename, projection={"_id": False}))
+        finally:
+            entmgr.dispose()
+        self.assertEqual(rslt, [{"column1": "A", "column2": 1, "column3": 1.0}])
+
+    def test_index_query_plan(self):
+        col = self.entmgr._database["ut_lookup"]
+        util.runCoroutine(col.create_indexes([IndexModel([("team", 1)])]))
+        where, params, _ = col._plan({"team": "KC"})[0]
+        plan = col._conn.execute("EXPLAIN QUERY PLAN SELECT _seq, doc FROM \"ut_lookup\" WHERE " + where, params).fetchall()
+        self.assertTrue(any(["ut_lookup$team_1" in r[-1] for r in plan]))
+        self.assertIsNone(col._plan({"team": {"$regex": "^K"}}))
+
+    def test_datetime_values(self):
+        col = self.entmgr._database["ut_dates"]
+        dt = datetime.datetime(2019, 9, 8, 17, 0, 0, 123456, tzinfo=datetime.timezone(datetime.timedelta(hours=-4)))
+        async def run():
+            await col.create_indexes([IndexModel([("gametime", 1)])])
+            await col.insert_one({"gametime": dt})
+            return await col.find_one({"gametime": dt}, projection={"_id": False})
+        rslt = util.runCoroutine(run())
+        self.assertEqual(rslt, {"gametime": datetime.datetime(2019, 9, 8, 21, 0, 0, 123000)})
+
+    def test_drop_collection(self):
+        db = self.entmgr._database
+        async def run():
+            await db["ut_drop"].insert_one({"a": 1})
+            before = await db.list_collection_names()
+            await db.drop_collection("ut_drop")
+            after = await db.list_collection_names()
+            return before, after, await db["ut_drop"].count_documents({})
+        before, after, n = util.runCoroutine(run())
+        self.assertIn("ut_drop", before)
+        self.assertNotIn("ut_drop", after)
+        self.assertEqual(n, 0)
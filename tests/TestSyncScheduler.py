@@ -0,0 +1,61 @@
+import unittest
+import asyncio
+from nflapidb.SyncScheduler import SyncScheduler
+import nflapidb.Utilities as util
+
+class TestSyncScheduler(unittest.TestCase):
+
+    def _stage(self, name : str, log : list, delay : float = 0.01, fail : bool = False):
+        async def run():
+            log.append(("start", name))
+            await asyncio.sleep(delay)
+            if fail:
+                raise Exception("{} failed".format(name))
+            log.append(("end", name))
+        return run
+
+    def test_run_honors_dependencies(self):
+        log = []
+        sched = SyncScheduler()
+        sched.add("a", self._stage("a", log))
+        sched.add("b", self._stage("b", log), ["a"])
+        sched.add("c", self._stage("c", log), ["a", "b"])
+        report = util.runCoroutine(sched.run())
+        self.assertEqual(log, [("start", "a"), ("end", "a"), ("start", "b"),
+                               ("end", "b"), ("start", "c"), ("end", "c")])
+        self.assertEqual(set([r["status"] for r in report.values()]), set(["ok"]))
+
+    def test_run_independent_concurrently(self):
+        log = []
+        sched = SyncScheduler(concurrency=2)
+        sched.add("a", self._stage("a", log))
+        sched.add("b", self._stage("b", log))
+        util.runCoroutine(sched.run())
+        self.assertEqual(log[0:2], [("start", "a"), ("start", "b")])
+
+    def test_run_limits_concurrency(self):
+        log = []
+        sched = SyncScheduler(concurrency=1)
+        sched.add("a", self._stage("a", log))
+        sched.add("b", self._stage("b", log))
+        util.runCoroutine(sched.run())
+        self.assertEqual(log, [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")])
+
+    def test_run_failure_skips_dependants_only(self):
+        log = []
+        sched = SyncScheduler()
+        sched.add("a", self._stage("a", log, fail=True))
+        sched.add("b", self._stage("b", log), ["a"])
+        sched.add("c", self._stage("c", log))
+        report = util.runCoroutine(sched.run())
+        self.assertEqual(report["a"]["status"], "failed")
+        self.assertEqual(report["b"]["status"], "skipped")
+        self.assertEqual(report["c"]["status"], "ok")
+        self.assertFalse(("start", "b") in log, "dependant stage was run")
+
+    def test_run_cycle_raises(self):
+        sched = SyncScheduler()
+        sched.add("a", self._stage("a", []), ["b"])
+        sched.add("b", self._stage("b", []), ["a"])
+        with self.assertRaises(ValueError):
+            util.runCoroutine(sched.run())
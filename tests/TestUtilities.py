@@ -40,6 +40,27 @@ class TestUtilities(unittest.TestCase):
         d = [{"col1": "a", "col2": 1}]
         self.assertEqual(util.ddquery(q, d), ([], d,))
 
+    def test_ddquery_list_values(self):
+        q = [{"col1": "a", "col2": [1, 2]}, {"col1": "b", "col2": {"x": [3]}}]
+        d = [{"col1": "a", "col2": [1, 2]}, {"col1": "a", "col2": [2, 1]}, {"col1": "b", "col2": {"x": [3]}}]
+        self.assertEqual(util.ddquery(q, d), ([d[0], d[2]], [d[1]],))
+
+    def test_ddquery_mixed_q_keys(self):
+        q = [{"col1": "a"}, {"col2": 2, "col3": "c"}]
+        d = [{"col1": "b", "col2": 2, "col3": "c"}, {"col1": "a"}, {"col1": "b", "col2": 2}]
+        self.assertEqual(util.ddquery(q, d), ([d[0], d[1]], [d[2]],))
+
+    def test_ddquery_unhashable_values(self):
+        q = [{"col1": {1: "a", "b": 2}}]
+        d = [{"col1": {1: "a", "b": 2}}, {"col1": {1: "a", "b": 3}}]
+        self.assertEqual(util.ddquery(q, d), ([d[0]], [d[1]],))
+
+    def test_chunk(self):
+        self.assertEqual(util.chunk([1, 2, 3, 4, 5], 2), [[1, 2], [3, 4], [5]])
+        self.assertEqual(util.chunk([1, 2, 3], None), [[1, 2, 3]])
+        self.assertEqual(util.chunk([1, 2, 3], 5), [[1, 2, 3]])
+        self.assertEqual(util.chunk([], 2), [])
+
     def test_parseNameAbbreviation(self):
         abbr = "C.Wollam"
         self.assertEqual(util.parseNameAbbreviation(abbr), ("^c.*", "^wollam"), abbr)